@@ -0,0 +1,131 @@
+"""
+Canonical IDs for titles that exist on several providers
+Every (provider, anime_id) pair learned from search results and info payloads
+is linked to one canonical ID, so any alias can be answered from whichever
+provider's entry is already cached. Dubbed releases get a canonical ID of
+their own: a dub is never answered with the subbed entry or the reverse.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from similarity import canonical_title, is_dub
+
+logger = logging.getLogger(__name__)
+
+Alias = Tuple[str, str]  # (provider, anime_id)
+
+
+def canonical_id_for(title: str, dub: Optional[bool] = None) -> Optional[str]:
+    """Canonical ID derived from a title, or None for titles with no usable text
+
+    dub defaults to whether the title itself carries a dub tag.
+    """
+    form = canonical_title(title)
+    if not form:
+        return None
+    if dub is None:
+        dub = is_dub(title)
+    return f"title:{form}:dub" if dub else f"title:{form}"
+
+
+class AliasMap:
+    """Persistent provider ID -> canonical ID mapping in the anime_alias table"""
+
+    def __init__(self, get_db):
+        self._get_db = get_db
+        self._lock = threading.Lock()  # serializes group merges
+        self.links = 0
+        self.merges = 0
+
+    def link(self, title: str, members: Iterable[Alias], dub: Optional[bool] = None) -> Optional[str]:
+        """Record that every member is the same show; returns the canonical ID used
+
+        Members already mapped keep their group: groups that meet through a
+        shared member are merged into the oldest canonical ID among them.
+        """
+        members = [(str(p), str(i)) for p, i in members if p and i]
+        candidate = canonical_id_for(title, dub)
+        if not members or candidate is None:
+            return None
+        now = time.time()
+        with self._lock, self._get_db().connection() as conn:
+            placeholders = ', '.join(['(?, ?)'] * len(members))
+            params = [value for member in members for value in member]
+            known = [row[0] for row in conn.execute(
+                f"SELECT canonical_id FROM anime_alias WHERE (provider, anime_id) IN (VALUES {placeholders}) "
+                f"ORDER BY created_at, canonical_id", params
+            )]
+            # An existing group under the title's own canonical ID joins new members; members
+            # already grouped stay put (info titles often drop the dub tag search titles carry)
+            row = conn.execute("SELECT MIN(created_at) FROM anime_alias WHERE canonical_id = ?",
+                               (candidate,)).fetchone()
+            if row[0] is not None and not known:
+                known.append(candidate)
+            target = known[0] if known else candidate
+            for other in set(known) - {target}:
+                conn.execute("UPDATE anime_alias SET canonical_id = ? WHERE canonical_id = ?", (target, other))
+                self.merges += 1
+            conn.executemany("""
+                INSERT INTO anime_alias (provider, anime_id, canonical_id, title, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (provider, anime_id) DO UPDATE SET
+                    canonical_id = excluded.canonical_id,
+                    updated_at = excluded.updated_at
+            """, [(provider, anime_id, target, title, now, now) for provider, anime_id in members])
+        self.links += len(members)
+        return target
+
+    def learn(self, results: Iterable[Dict]) -> int:
+        """Link search results, using the 'providers' list of merged results when present
+
+        Merged results keep dubbed and subbed releases together; they are linked as two groups.
+        """
+        linked = 0
+        for result in results:
+            title = result.get('title') or ''
+            sources = result.get('providers') or \
+                [{'provider': result.get('provider'), 'id': result.get('id'), 'dub': is_dub(title)}]
+            for dub in (False, True):
+                members = [(p.get('provider'), p.get('id')) for p in sources if bool(p.get('dub')) == dub]
+                if members and self.link(title, members, dub):
+                    linked += len(members)
+        return linked
+
+    def canonical(self, provider: str, anime_id: str) -> Optional[str]:
+        with self._get_db().connection() as conn:
+            row = conn.execute("SELECT canonical_id FROM anime_alias WHERE provider = ? AND anime_id = ?",
+                               (provider, str(anime_id))).fetchone()
+        return row[0] if row else None
+
+    def aliases(self, provider: str, anime_id: str) -> List[Alias]:
+        """Every (provider, anime_id) sharing a canonical ID with the given one, itself included"""
+        with self._get_db().connection() as conn:
+            rows = conn.execute("""
+                SELECT a.provider, a.anime_id FROM anime_alias a
+                JOIN anime_alias self ON self.canonical_id = a.canonical_id
+                WHERE self.provider = ? AND self.anime_id = ?
+                ORDER BY a.created_at, a.provider
+            """, (provider, str(anime_id))).fetchall()
+        return [(row[0], row[1]) for row in rows] or [(provider, str(anime_id))]
+
+    def providers(self, anime_id: str) -> List[str]:
+        """Providers known to use an anime ID, oldest link first"""
+        with self._get_db().connection() as conn:
+            rows = conn.execute("SELECT provider FROM anime_alias WHERE anime_id = ? ORDER BY created_at, provider",
+                                (str(anime_id),)).fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self) -> Dict:
+        with self._get_db().connection() as conn:
+            aliases, titles = conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT canonical_id) FROM anime_alias"
+            ).fetchone()
+        return {
+            'aliases': aliases,
+            'canonical_titles': titles,
+            'links': self.links,
+            'merges': self.merges,
+        }
@@ -6,16 +6,38 @@ Fixed version without async issues - Working synchronous implementation
 
 import os
 import sys
-import json
 import time
 import requests
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
-from urllib.parse import quote, unquote
-from flask import Flask, request, jsonify, render_template, send_from_directory
-import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Tuple
+from urllib.parse import quote, urlencode
+from flask.json.provider import JSONProvider
+from flask import Flask, Response, request, jsonify, render_template, send_from_directory, g, has_request_context
 import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+
+from upstream import UpstreamClient, FAILURE_OUTCOMES, RETRY_OUTCOMES, status_outcome
+from ratelimit import RateLimiter, RateLimitExceeded
+from memcache import MemoryCache
+from singleflight import SingleFlight, FlightTimeout
+from db import Database
+from migrations import migrate
+from maintenance import CacheMaintenance
+from codec import encode_payload, decode_payload
+from jsonbackend import get_backend
+from metrics import Registry, clear_snapshots, fold_snapshot, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from search_index import SearchIndex
+from suggest import SuggestIndex
+from similarity import merge_results
+from aliases import AliasMap
+from health import ProviderHealth
+from hedging import Hedger
+from hlsproxy import (SegmentCache, RangeNotSatisfiable, PLAYLIST_CONTENT_TYPE, sign, verify, is_playlist,
+                      is_public_url, rewrite_playlist, segment_headers, cached_segment_plan, iter_file)
+from warmer import CacheWarmer, WarmBudget
+from httpcache import validator_headers, not_modified
+from compression import StaticAssets, compress_body, is_compressible
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -28,14 +50,64 @@ STATIC_DIR = os.path.join(BASE_DIR, 'src')
 # Initialize Flask app
 app = Flask(__name__, static_folder=STATIC_DIR, template_folder=STATIC_DIR)
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Observe the request's latency by route; registered first so it runs after the other hooks"""
+    started = g.get('request_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_latency.observe(time.perf_counter() - started, request.method, route, str(response.status_code))
+    return response
+
 # Enable CORS for all domains on all routes
 @app.after_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE')
+    cache_status = g.get('cache_status')
+    if cache_status:
+        response.headers['X-Cache-Status'] = cache_status
     return response
 
+@app.after_request
+def compress_response(response):
+    """Compress large API bodies with the best coding the client accepts"""
+    if (not request.path.startswith('/api/') or response.status_code != 200 or response.direct_passthrough
+            or response.is_streamed or 'Content-Encoding' in response.headers):
+        return response
+    body = response.get_data()
+    if len(body) < Config.COMPRESS_MIN_BYTES or not is_compressible(response.content_type):
+        return response
+    response.vary.add('Accept-Encoding')
+    compressed = compress_body(body, response.content_type, request.headers.get('Accept-Encoding'),
+                               Config.COMPRESS_MIN_BYTES, Config.COMPRESS_GZIP_LEVEL, Config.COMPRESS_BROTLI_QUALITY)
+    if compressed:
+        coding, body = compressed
+        response.set_data(body)
+        response.headers['Content-Encoding'] = coding
+        # The strong validator names the uncompressed bytes; If-None-Match compares weakly anyway
+        etag = response.headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            response.headers['ETag'] = 'W/' + etag
+    return response
+
+def conditional_json(payload: Dict, max_age: int, body: Optional[bytes] = None) -> Response:
+    """JSON response with ETag, Last-Modified and Cache-Control; an empty 304 when the client's copy matches
+
+    body, when given, is payload already serialized (a cached entry's bytes) and is sent as is.
+    """
+    if body is None:
+        body = encode_json(payload)
+    validators = validator_headers(body, max_age, Config.CACHE_STALE_GRACE, g.get('cache_updated'))
+    if not_modified(request.headers, validators):
+        return Response(status=304, headers=validators)
+    return Response(body, mimetype='application/json', headers=validators)
+
 # Configuration
 class Config:
     # API URLs
@@ -46,139 +118,708 @@ class Config:
     DEFAULT_PROVIDER = "gogoanime"
     BACKUP_PROVIDERS = ["zoro", "9anime", "animepahe"]
     
-    # Rate limiting
-    CONSUMET_RATE_LIMIT = 0.5  # seconds between requests
+    # Rate limiting (per upstream token buckets)
+    CONSUMET_RATE_LIMIT = 0.5  # seconds between requests, per provider
     JIKAN_RATE_LIMIT = 0.3
+    CONSUMET_BURST = 3  # requests allowed back-to-back
+    JIKAN_BURST = 3
+    RATE_LIMIT_MAX_WAIT = 10  # seconds a request may queue for a token
+    RATE_LIMIT_SHARED_DIR = None  # directory of bucket files (and metrics snapshots) shared by worker processes (prefork sets one up)
+    
+    # Provider health (circuit breakers and health-ordered routing)
+    TRENDING_PROVIDERS = ["gogoanime", "zoro"]  # providers with a top-airing list
+    PROVIDER_HEALTH_WINDOW = 50  # recent calls kept per provider and endpoint kind
+    CIRCUIT_FAILURE_THRESHOLD = 5  # consecutive failures that open a circuit
+    CIRCUIT_ERROR_RATE = 0.5  # windowed error rate that opens a circuit
+    CIRCUIT_MIN_SAMPLES = 10  # calls needed before error rate or timeouts adapt
+    CIRCUIT_OPEN_SECONDS = 30  # cool-down before a half-open probe
+    PROVIDER_TIMEOUT_MULTIPLIER = 3  # read timeout = observed p99 latency x this
+    
+    # Hedged streaming-link requests
+    WATCH_HEDGING = False  # race a second provider when the first is slow to return links
+    WATCH_HEDGE_PERCENTILE = 90  # hedge after the primary's p90 watch latency
+    WATCH_HEDGE_DELAY = 1.0  # seconds to wait before hedging a provider with no samples
+    WATCH_HEDGE_MIN_DELAY = 0.05  # never hedge sooner than this
+    WATCH_HEDGE_RATE = 0.2  # hedges per second allowed per provider
+    WATCH_HEDGE_BURST = 2  # hedges allowed back-to-back per provider
+    HEDGE_WORKERS = 8  # threads running hedged attempts
+    
+    # Streaming proxy (/api/stream)
+    STREAM_PROXY = True  # add a proxyUrl to every watch source and subtitle
+    STREAM_PROXY_SECRET = None  # HMAC key for proxy URLs; a random key per start when unset
+    STREAM_CHUNK_SIZE = 64 * 1024  # bytes relayed per chunk
+    STREAM_READ_TIMEOUT = 30  # seconds between bytes from the CDN
+    STREAM_USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0'  # sent to CDNs
+    STREAM_ALLOW_PRIVATE_HOSTS = False  # proxy loopback/private CDN addresses too (local testing only)
+    SEGMENT_CACHE_DIR = "segment_cache"
+    SEGMENT_CACHE_MAX_BYTES = 1024 * 1024 * 1024  # LRU eviction above this many bytes on disk
+    SEGMENT_CACHE_MAX_ITEM_BYTES = 32 * 1024 * 1024  # larger segments are relayed, not cached
+    
+    # Upstream HTTP client (keep-alive pools per host)
+    HTTP_POOL_CONNECTIONS = 4  # hosts kept warm
+    HTTP_POOL_MAXSIZE = 16  # connections per host
+    HTTP_CONNECT_TIMEOUT = 3.05  # seconds
+    HTTP_READ_TIMEOUT = 15  # seconds
+    HTTP_MAX_RETRIES = 2  # retries after a 5xx or connection error, each with its own rate-limit token
+    HTTP_RETRY_BACKOFF = 0.3  # seconds, doubled per retry
+    HTTP_REQUEST_DEADLINE = 20  # seconds one upstream call may take over all attempts and rate-limit waits
+    
+    # Search fan-out
+    SEARCH_WORKERS = 8  # concurrent provider searches across all requests
+    SEARCH_PROVIDER_TIMEOUT = 8  # seconds each provider gets to answer
+    SEARCH_EARLY_RESULTS = 0  # return once this many results are in (0 waits for all)
+    SEARCH_MODE = "remote"  # remote, local (index only) or merge (remote plus local index)
+    DEDUPE_THRESHOLD = 0.7  # title n-gram similarity at which provider results are merged
+    
+    # Typeahead
+    SUGGEST_MAX_BYTES = 16 * 1024 * 1024  # memory ceiling for the prefix index
+    SUGGEST_LIMIT = 8  # default suggestions returned
+    SUGGEST_TRENDING_WEIGHT = 5  # popularity boost for titles seen in trending lists
     
     # Cache settings
     CACHE_DURATION = 3600  # 1 hour for anime info
     EPISODE_CACHE_DURATION = 1800  # 30 minutes for episodes
+    LIST_CACHE_DURATION = 300  # 5 minutes for trending and recent-episode lists
+    MEMORY_CACHE_ENTRIES = 2048  # decoded entries kept in process
+    MEMORY_CACHE_BYTES = 32 * 1024 * 1024  # estimated size held: decoded object plus its JSON body
+    CACHE_STALE_GRACE = 300  # seconds an expired entry is served while refreshing in background
+    CACHE_STALE_IF_ERROR = 86400  # seconds an expired entry may be served when the upstream fails
+    REVALIDATE_WORKERS = 2  # background refresh threads
+    CACHE_MAX_DB_BYTES = 256 * 1024 * 1024  # LRU eviction once anime_cache + streaming_cache exceed this size
+    CACHE_MAINTENANCE_INTERVAL = 600  # seconds between expiry/vacuum passes
+    CACHE_MAINTENANCE_BATCH = 500  # rows deleted per statement
+    CACHE_CODEC = "auto"  # json, zlib or zstd; auto prefers zstd when installed
+    CACHE_COMPRESS_MIN_BYTES = 1024  # smaller payloads are stored as plain JSON
+    JSON_BACKEND = "auto"  # json, ujson or orjson; auto prefers orjson, then ujson, when installed
+    
+    # Metrics
+    METRICS_ENABLED = True  # record request/upstream/cache/rate-limit metrics for /metrics
+    METRICS_PUBLISH_INTERVAL = 5  # seconds between prefork workers' snapshots for /metrics
+    EPISODE_PAGE_SIZE = 100  # default episodes per page
+    EPISODE_PAGE_MAX = 500  # largest page a client may ask for
+    
+    # Browser and proxy caching of API responses
+    HTTP_MAX_AGE = 300  # Cache-Control max-age for titles and searches
+    HTTP_MAX_AGE_LISTS = 60  # and for trending/recent lists, which clients poll
+    
+    # Compression
+    COMPRESS_MIN_BYTES = 1024  # smaller API bodies are sent as is
+    COMPRESS_GZIP_LEVEL = 6  # per-request gzip level for API bodies
+    COMPRESS_BROTLI_QUALITY = 5  # per-request brotli quality (with the optional brotli package)
+    STATIC_MEMORY_MAX_BYTES = 4 * 1024 * 1024  # larger static files are sent from disk, uncompressed
+    
+    # Cache warming
+    CACHE_WARMING = True  # refresh popular entries in the background before they expire
+    WARM_TICK = 5  # seconds between checks for due warming jobs
+    WARM_AHEAD = 120  # refresh entries expiring within this many seconds
+    WARM_LISTS_INTERVAL = 60  # seconds between trending/recent list checks
+    WARM_WATCHLIST_INTERVAL = 300  # seconds between watchlist passes
+    WARM_TRENDING_INTERVAL = 600  # seconds between passes over the top trending titles
+    WARM_TRENDING_TITLES = 5  # top trending titles kept warm
+    WARM_EPISODES_AHEAD = 2  # watchlist episodes warmed from current_episode on
+    WARM_RATE = 0.2  # warming requests per second, across all upstreams
+    WARM_BURST = 10  # warming requests allowed back-to-back
+    WARM_RATE_HEADROOM = 2  # tokens an upstream bucket must keep free for user requests
+    
+    # Request coalescing
+    SINGLE_FLIGHT_TIMEOUT = 30  # seconds a caller waits on another's in-flight fetch
+    
+    # Async serving mode
+    ASYNC_DB_THREADS = 8  # threads for SQLite work so the event loop never blocks on disk
+    
+    # Pre-fork serving mode
+    WORKERS = 0  # worker processes, 0 sizes to the CPU count
+    WORKER_MAX_REQUESTS = 0  # recycle a worker after this many requests (0 never)
+    WORKER_MAX_REQUESTS_JITTER = 0  # random extra requests so workers don't recycle together
+    WORKER_GRACEFUL_TIMEOUT = 30  # seconds a draining worker gets to finish its requests
     
     # Database
     DATABASE_PATH = "animeverse.db"
+    DB_POOL_SIZE = 8  # idle connections kept open
+    DB_BUSY_TIMEOUT = 5  # seconds to wait on a locked database
+    DB_CACHE_SIZE_KB = 16384  # page cache per connection
+    DB_MMAP_SIZE = 64 * 1024 * 1024  # bytes memory-mapped per connection
+    DB_SYNCHRONOUS = "NORMAL"  # safe with WAL, skips fsync per commit
+
+# Prometheus-style metrics, exposed on /metrics
+metrics = Registry(enabled=lambda: Config.METRICS_ENABLED)
+request_latency = metrics.histogram('animeverse_http_request_duration_seconds',
+                                    'Time to produce a response by method, route and status',
+                                    ('method', 'route', 'status'))
+upstream_latency = metrics.histogram('animeverse_upstream_request_duration_seconds',
+                                     'Upstream calls by upstream and outcome, rate-limit waits excluded '
+                                     '(stream relays until the response headers)', ('upstream', 'outcome'))
+rate_limit_wait = metrics.histogram('animeverse_rate_limit_wait_seconds',
+                                    'Time spent waiting for an upstream rate-limit token', ('upstream',))
+rate_limit_rejected = metrics.counter('animeverse_rate_limit_rejected_total',
+                                      'Upstream calls refused a token within RATE_LIMIT_MAX_WAIT', ('upstream',))
+cache_lookups = metrics.counter('animeverse_cache_lookups_total',
+                                'Cache lookups by table and result (hit, stale, miss)', ('table', 'result'))
+cache_read_latency = metrics.histogram('animeverse_cache_read_duration_seconds',
+                                       'Cache reads by table and tier (memory, sqlite)', ('table', 'tier'))
+cache_write_latency = metrics.histogram('animeverse_cache_write_duration_seconds',
+                                        'Cache writes (encode and SQLite upsert) by table', ('table',))
+serialize_latency = metrics.histogram('animeverse_json_serialize_duration_seconds',
+                                      'JSON encoding of API responses (cached bodies sent as is are not encoded)')
+
+# JSON serialization for responses and cache rows
+json_backend = get_backend(Config.JSON_BACKEND)
+
+def encode_json(payload: Any) -> bytes:
+    """Serialize an API response body"""
+    started = time.perf_counter()
+    body = json_backend.dumps(payload)
+    serialize_latency.observe(time.perf_counter() - started)
+    return body
+
+class BackendJSONProvider(JSONProvider):
+    """jsonify and request.get_json on the configured JSON backend"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return json_backend.dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        return json_backend.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(encode_json(obj), mimetype='application/json')
+
+app.json = BackendJSONProvider(app)
 
 # Global cache
-cache_db_lock = threading.Lock()
-last_request_time = 0
+database = None
+database_lock = threading.Lock()
+
+def get_db() -> Database:
+    """Shared connection pool for Config.DATABASE_PATH"""
+    global database
+    db = database
+    if db is None or db.path != Config.DATABASE_PATH:
+        with database_lock:
+            if database is None or database.path != Config.DATABASE_PATH:
+                if database is not None:
+                    database.close()
+                database = Database(
+                    Config.DATABASE_PATH,
+                    pool_size=Config.DB_POOL_SIZE,
+                    busy_timeout=Config.DB_BUSY_TIMEOUT,
+                    cache_size_kb=Config.DB_CACHE_SIZE_KB,
+                    mmap_size=Config.DB_MMAP_SIZE,
+                    synchronous=Config.DB_SYNCHRONOUS
+                )
+            db = database
+    return db
+
+# L1 in-memory tier in front of the SQLite cache tables
+memory_cache = MemoryCache(max_entries=Config.MEMORY_CACHE_ENTRIES, max_bytes=Config.MEMORY_CACHE_BYTES)
+
+# Shared upstream client used by every Consumet and Jikan helper
+http_client = UpstreamClient(
+    pool_connections=Config.HTTP_POOL_CONNECTIONS,
+    pool_maxsize=Config.HTTP_POOL_MAXSIZE,
+    connect_timeout=Config.HTTP_CONNECT_TIMEOUT,
+    read_timeout=Config.HTTP_READ_TIMEOUT,
+    headers={
+        'Accept': 'application/json',
+        'User-Agent': 'AnimeVerse/3.0 (https://github.com/DarrylClay2005/animeverse-app)'
+    }
+)
+
+# Separate pools for the /api/stream relay: CDNs get a neutral Accept and browser User-Agent,
+# and a failed segment is never re-fetched behind the player's back
+stream_client = UpstreamClient(
+    pool_connections=Config.HTTP_POOL_CONNECTIONS,
+    pool_maxsize=Config.HTTP_POOL_MAXSIZE,
+    connect_timeout=Config.HTTP_CONNECT_TIMEOUT,
+    read_timeout=Config.STREAM_READ_TIMEOUT,
+    headers={
+        'Accept': '*/*',
+        'User-Agent': Config.STREAM_USER_AGENT
+    }
+)
 
 # Database initialization
 def init_database():
-    """Initialize SQLite database for caching"""
-    with sqlite3.connect(Config.DATABASE_PATH) as conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS anime_cache (
-                id TEXT PRIMARY KEY,
-                provider TEXT,
-                data TEXT,
-                cached_at TIMESTAMP,
-                expires_at TIMESTAMP
-            )
-        """)
-        
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS episode_cache (
-                anime_id TEXT,
-                provider TEXT,
-                episode_number INTEGER,
-                data TEXT,
-                cached_at TIMESTAMP,
-                expires_at TIMESTAMP,
-                PRIMARY KEY (anime_id, provider, episode_number)
-            )
-        """)
-        
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS streaming_cache (
-                episode_id TEXT PRIMARY KEY,
-                provider TEXT,
-                data TEXT,
-                cached_at TIMESTAMP,
-                expires_at TIMESTAMP
-            )
-        """)
-        
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS user_watchlist (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                anime_id TEXT,
-                title TEXT,
-                image TEXT,
-                current_episode INTEGER DEFAULT 1,
-                total_episodes INTEGER,
-                status TEXT DEFAULT 'watching',
-                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        logger.info("Database initialized successfully")
+    """Initialize SQLite database for caching, migrating existing files in place"""
+    with get_db().connection() as conn:
+        version = migrate(conn)
+        logger.info(f"Database initialized successfully (schema v{version})")
+    
+    search_index.reset()
+    if search_index.available() and search_index.count() == 0:
+        backfill_search_index()
+    load_suggestions()
 
 # Cache management
+def cache_retention() -> int:
+    """Seconds past expiry a row is kept around for stale serving"""
+    return max(Config.CACHE_STALE_GRACE, Config.CACHE_STALE_IF_ERROR, 0)
+
+# Background expiry sweeps, size cap and incremental vacuum for the cache tables
+cache_maintenance = CacheMaintenance(
+    get_db, ['anime_cache', 'streaming_cache'], cache_retention,
+    expiry_only_tables=['episode_cache'],
+    max_bytes=Config.CACHE_MAX_DB_BYTES,
+    batch_size=Config.CACHE_MAINTENANCE_BATCH,
+    interval=Config.CACHE_MAINTENANCE_INTERVAL
+)
+
+def read_cache(key: str, table: str = "anime_cache") -> Tuple[Optional[dict], float, float]:
+    """Return (data, expires_at, cached_at epochs) for a cached row, including expired rows still within retention
+
+    An expired memory entry is checked against SQLite first: another worker may have refreshed the row.
+    """
+    started = time.perf_counter()
+    cached = memory_cache.get((table, key))
+    if cached is not None and cached[1] > time.time():
+        cache_maintenance.tracker.touch(table, key)
+        cache_read_latency.observe(time.perf_counter() - started, table, 'memory')
+        return cached[:3]
+    return read_cache_from_disk(key, table, cached, started)
+
+def read_cache_from_disk(key: str, table: str, cached: Optional[Tuple], started: float) -> Tuple[Optional[dict], float, float]:
+    """read_cache past the memory tier: the SQLite row, else cached (the expired memory entry, if any)"""
+    try:
+        row = read_cache_row(key, table)
+        return cached[:3] if row[0] is None and cached is not None else row
+    finally:
+        cache_read_latency.observe(time.perf_counter() - started, table, 'sqlite')
+
+def read_cache_row(key: str, table: str) -> Tuple[Optional[dict], float, float]:
+    """read_cache from SQLite, filling the memory tier"""
+    with get_db().connection() as conn:
+        cursor = conn.execute(f"SELECT data, expires_at, codec, cached_at FROM {table} WHERE id = ?", (key,))
+        result = cursor.fetchone()
+    if result:
+        expires_at = result[1] or 0
+        retain_until = expires_at + cache_retention()
+        if retain_until <= time.time():
+            return None, 0, 0
+        try:
+            body = decode_payload(result[0], result[2])
+            data = json_backend.loads(body)
+        except:
+            return None, 0, 0
+        cached = (data, expires_at, result[3] or 0, body)
+        memory_cache.set((table, key), cached, retain_until)
+        cache_maintenance.tracker.touch(table, key)
+        return cached[:3]
+    return None, 0, 0
+
+def lookup_cache(key: str, table: str = "anime_cache") -> Tuple[Optional[dict], float]:
+    """Return (data, expires_at epoch) for a cached row, noting its age for Last-Modified"""
+    data, expires_at, cached_at = read_cache(key, table)
+    if data is not None:
+        note_cache_time(cached_at)
+    count_cache_lookup(table, data, expires_at)
+    return data, expires_at
+
+def count_cache_lookup(table: str, data: Optional[dict], expires_at: float):
+    """Count a lookup as a hit, a stale hit (expired, within retention) or a miss"""
+    result = 'miss' if data is None else 'hit' if expires_at > time.time() else 'stale'
+    cache_lookups.inc(table, result)
+
+def cached_body(data: Optional[dict], key: str, table: str = "anime_cache") -> Optional[bytes]:
+    """The serialized JSON of a cache entry, when data is that entry's object; None otherwise"""
+    cached = memory_cache.peek((table, key))
+    if data is not None and cached is not None and cached[0] is data:
+        return cached[3]
+    return None
+
 def get_from_cache(key: str, table: str = "anime_cache") -> Optional[dict]:
     """Retrieve data from cache if not expired"""
-    with sqlite3.connect(Config.DATABASE_PATH) as conn:
-        cursor = conn.execute(
-            f"SELECT data FROM {table} WHERE id = ? AND expires_at > datetime('now')",
-            (key,)
-        )
-        result = cursor.fetchone()
-        if result:
-            try:
-                return json.loads(result[0])
-            except:
-                return None
+    data, expires_at = lookup_cache(key, table)
+    if data is not None and expires_at > time.time():
+        return data
     return None
 
 def save_to_cache(key: str, data: dict, table: str = "anime_cache", duration: int = Config.CACHE_DURATION):
     """Save data to cache with expiration"""
-    expires_at = datetime.now() + timedelta(seconds=duration)
-    with sqlite3.connect(Config.DATABASE_PATH) as conn:
+    started = time.perf_counter()
+    now = time.time()
+    expires_at = now + duration
+    body = json_backend.dumps(data)
+    codec, payload = encode_payload(body, Config.CACHE_CODEC, Config.CACHE_COMPRESS_MIN_BYTES)
+    memory_cache.invalidate((table, key))
+    with get_db().connection() as conn:
         conn.execute(
-            f"INSERT OR REPLACE INTO {table} (id, provider, data, cached_at, expires_at) VALUES (?, ?, ?, datetime('now'), ?)",
-            (key, data.get('provider', 'unknown'), json.dumps(data), expires_at.isoformat())
+            f"INSERT OR REPLACE INTO {table} (id, provider, data, codec, cached_at, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, data.get('provider', 'unknown'), payload, codec, now, expires_at, now)
+        )
+    memory_cache.set((table, key), (data, expires_at, now, body), expires_at + cache_retention())
+    cache_write_latency.observe(time.perf_counter() - started, table)
+    
+    if table == "anime_cache":
+        try:
+            search_index.index_payload(key, data)
+            if key.startswith('search_'):
+                suggest_index.add(data.get('results') or [], data.get('provider'))
+            elif key.startswith('info_'):
+                suggest_index.add([data], data.get('provider'))
+                alias_map.link(data.get('title') or '', [(data.get('provider'), data.get('id'))])
+        except Exception as e:
+            logger.error(f"Search indexing failed for {key}: {str(e)}")
+
+# Local search index over cached search results and info payloads
+search_index = SearchIndex(get_db)
+
+# Provider IDs linked to one canonical ID per title
+alias_map = AliasMap(get_db)
+
+# In-memory typeahead over every known title
+suggest_index = SuggestIndex(max_bytes=Config.SUGGEST_MAX_BYTES)
+
+def load_suggestions() -> int:
+    """Seed the typeahead index from the search catalog"""
+    with get_db().connection() as conn:
+        rows = conn.execute("SELECT provider, anime_id, title, english_title, image FROM anime_catalog").fetchall()
+    return suggest_index.add(
+        {'provider': row[0], 'id': row[1], 'title': row[2], 'english_title': row[3], 'image': row[4]}
+        for row in rows
+    )
+
+def backfill_search_index() -> int:
+    """Index every search/info payload already in anime_cache"""
+    with get_db().connection() as conn:
+        rows = conn.execute(
+            "SELECT id, data, codec FROM anime_cache WHERE id GLOB 'search_*' OR id GLOB 'info_*'"
+        ).fetchall()
+    indexed = 0
+    for key, blob, codec in rows:
+        try:
+            indexed += search_index.index_payload(key, json_backend.loads(decode_payload(blob, codec)))
+        except Exception as e:
+            logger.error(f"Could not index cached {key}: {str(e)}")
+    if indexed:
+        logger.info(f"Search index backfilled with {indexed} titles")
+    return indexed
+
+# Episode storage
+def save_episodes(provider: str, anime_id: str, episodes: List[Dict], duration: int = Config.CACHE_DURATION) -> int:
+    """Replace the stored episode rows for a show; returns how many were stored"""
+    now = time.time()
+    rows = []
+    for index, episode in enumerate(episodes):
+        try:
+            number = float(episode.get('number', index + 1))
+        except (TypeError, ValueError):
+            number = float(index + 1)
+        rows.append((provider, anime_id, number, episode.get('id', ''), episode.get('title'),
+                     episode.get('url'), now, now + duration))
+    with get_db().connection() as conn:
+        conn.execute("DELETE FROM episode_cache WHERE provider = ? AND anime_id = ?", (provider, anime_id))
+        conn.executemany(
+            "INSERT OR REPLACE INTO episode_cache (provider, anime_id, number, episode_id, title, url, cached_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
         )
+    return len(rows)
+
+def episode_number(number: float):
+    """Whole episode numbers as ints, specials like 5.5 as floats"""
+    return int(number) if number == int(number) else number
+
+def get_episodes(provider: str, anime_id: str, offset: int = 0, limit: int = Config.EPISODE_PAGE_SIZE,
+                 after: Optional[float] = None) -> Tuple[List[Dict], int]:
+    """Page of stored episodes ordered by number, plus the total count"""
+    with get_db().connection() as conn:
+        total = conn.execute(
+            "SELECT COUNT(*) FROM episode_cache WHERE provider = ? AND anime_id = ?", (provider, anime_id)
+        ).fetchone()[0]
+        query = "SELECT number, episode_id, title, url FROM episode_cache WHERE provider = ? AND anime_id = ?"
+        params = [provider, anime_id]
+        if after is not None:
+            query += " AND number > ?"
+            params.append(after)
+        query += " ORDER BY number LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+        rows = conn.execute(query, params).fetchall()
+    episodes = [{'id': row[1], 'number': episode_number(row[0]), 'title': row[2], 'url': row[3]} for row in rows]
+    return episodes, total
 
 # Rate limiting
-def rate_limit():
-    """Simple rate limiting"""
-    global last_request_time
-    current_time = time.time()
-    if current_time - last_request_time < Config.CONSUMET_RATE_LIMIT:
-        time.sleep(Config.CONSUMET_RATE_LIMIT - (current_time - last_request_time))
-    last_request_time = time.time()
+def rate_limit_config(key: str):
+    """Token rate and burst capacity for an upstream key"""
+    if key == 'jikan':
+        interval, burst = Config.JIKAN_RATE_LIMIT, Config.JIKAN_BURST
+    else:
+        interval, burst = Config.CONSUMET_RATE_LIMIT, Config.CONSUMET_BURST
+    return (1.0 / interval if interval > 0 else 0), burst
+
+rate_limiter = RateLimiter(rate_limit_config, max_wait=Config.RATE_LIMIT_MAX_WAIT,
+                           shared_dir=Config.RATE_LIMIT_SHARED_DIR)
+
+def upstream_key(url: str) -> str:
+    """Rate-limit budget for a URL: 'jikan' or 'consumet:<provider>'"""
+    if url.startswith(Config.JIKAN_BASE_URL):
+        return 'jikan'
+    path = url[len(Config.CONSUMET_BASE_URL):] if url.startswith(Config.CONSUMET_BASE_URL) else url
+    parts = [p for p in path.split('/') if p]
+    provider = parts[1] if len(parts) > 1 and parts[0] == 'anime' else 'default'
+    # Never one bucket (or health entry, or metric series) per made-up name
+    return f"consumet:{provider if known_provider(provider) else 'default'}"
+
+def rate_limit(url: str, max_wait: Optional[float] = None):
+    """Wait for a token from the upstream's own bucket"""
+    key = upstream_key(url)
+    try:
+        wait = rate_limiter.acquire(key, max_wait)
+    except RateLimitExceeded:
+        rate_limit_rejected.inc(key)
+        raise
+    rate_limit_wait.observe(wait, key)
+    return wait
 
 # HTTP Request helper
-def make_request(url: str, params: Dict = None, timeout: int = 30) -> Optional[Dict]:
-    """Make HTTP request with error handling"""
+def request_timeouts(timeout) -> Tuple[float, float]:
+    """(connect, read) seconds from a read timeout, a (connect, read) pair or None"""
+    if isinstance(timeout, tuple):
+        return timeout
+    return Config.HTTP_CONNECT_TIMEOUT, timeout or Config.HTTP_READ_TIMEOUT
+
+def request_once(url: str, params: Optional[Dict], timeout: Tuple[float, float],
+                 deadline: float) -> Tuple[Optional[Dict], str]:
+    """One GET attempt with its own rate-limit token; returns (data, outcome)
+
+    outcome is ok, client_error, throttled (429), server_error, timeout, error (connection
+    or parse failure) or rate_limited (no token before the deadline, nothing sent).
+    """
+    remaining = deadline - time.monotonic()
     try:
-        rate_limit()
-        headers = {
-            'Accept': 'application/json',
-            'User-Agent': 'AnimeVerse/3.0 (https://github.com/DarrylClay2005/animeverse-app)'
-        }
-        response = requests.get(url, params=params, headers=headers, timeout=timeout)
-        if response.status_code == 200:
-            return response.json()
-        else:
+        rate_limit(url, max(0.0, min(rate_limiter.max_wait, remaining)))
+    except RateLimitExceeded as e:
+        logger.error(f"Rate limited {url}: {str(e)}")
+        return None, 'rate_limited'
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        logger.error(f"Timeout for {url}")
+        return None, 'timeout'
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        response = http_client.get(url, params=params,
+                                   timeout=(min(timeout[0], remaining), min(timeout[1], remaining)))
+        if response.status_code != 200:
             logger.error(f"HTTP {response.status_code} for {url}")
-            return None
+            outcome = status_outcome(response.status_code)
+            return None, outcome
+        data = json_backend.loads(response.content)
+        outcome = 'ok'
+        return data, outcome
     except requests.exceptions.Timeout:
         logger.error(f"Timeout for {url}")
-        return None
+        outcome = 'timeout'
+        return None, outcome
     except Exception as e:
         logger.error(f"Request failed for {url}: {str(e)}")
+        return None, outcome
+    finally:
+        upstream_latency.observe(time.perf_counter() - started, upstream_key(url), outcome)
+
+def request_deadline(deadline: Optional[float] = None) -> float:
+    """Monotonic deadline for one upstream call: HTTP_REQUEST_DEADLINE, or the caller's if sooner"""
+    limit = time.monotonic() + Config.HTTP_REQUEST_DEADLINE
+    return limit if deadline is None else min(deadline, limit)
+
+def fetch_json(url: str, params: Dict = None, timeout=None,
+               deadline: Optional[float] = None) -> Tuple[Optional[Dict], str]:
+    """GET JSON, retrying 5xx and connection errors within HTTP_REQUEST_DEADLINE; returns (data, outcome)
+
+    Every attempt takes a fresh rate-limit token. 429s and timeouts are not retried. deadline
+    (time.monotonic()) caps the token waits, the attempts and the retries when it comes sooner.
+    """
+    deadline = request_deadline(deadline)
+    timeout = request_timeouts(timeout)
+    for attempt in range(Config.HTTP_MAX_RETRIES + 1):
+        data, outcome = request_once(url, params, timeout, deadline)
+        if outcome not in RETRY_OUTCOMES or attempt == Config.HTTP_MAX_RETRIES:
+            break
+        backoff = Config.HTTP_RETRY_BACKOFF * (2 ** attempt)
+        if time.monotonic() + backoff >= deadline:
+            break
+        time.sleep(backoff)
+    return data, outcome
+
+def make_request(url: str, params: Dict = None, timeout=None) -> Optional[Dict]:
+    """Make HTTP request with error handling"""
+    return fetch_json(url, params, timeout)[0]
+
+# Rolling latency/error stats and circuit breakers per provider and endpoint kind
+provider_health = ProviderHealth(
+    window=Config.PROVIDER_HEALTH_WINDOW,
+    failure_threshold=Config.CIRCUIT_FAILURE_THRESHOLD,
+    error_rate=Config.CIRCUIT_ERROR_RATE,
+    min_samples=Config.CIRCUIT_MIN_SAMPLES,
+    open_seconds=Config.CIRCUIT_OPEN_SECONDS
+)
+
+def provider_request(provider: str, kind: str, url: str, params: Dict = None,
+                     timeout: Optional[float] = None, deadline: Optional[float] = None) -> Optional[Dict]:
+    """make_request through the provider's circuit breaker, recording latency and outcome"""
+    if not provider_health.allow(provider, kind):
+        logger.warning(f"Circuit open for {provider} {kind}, skipping {url}")
         return None
+    read_timeout = provider_health.timeout(provider, kind, timeout or Config.HTTP_READ_TIMEOUT,
+                                           Config.PROVIDER_TIMEOUT_MULTIPLIER)
+    started = time.monotonic()
+    data, outcome = None, 'error'
+    try:
+        data, outcome = fetch_json(url, params, (Config.HTTP_CONNECT_TIMEOUT, read_timeout), deadline)
+    finally:
+        record_provider_outcome(provider, kind, time.monotonic() - started, outcome)
+    return data
+
+def record_provider_outcome(provider: str, kind: str, latency: float, outcome: str):
+    """Feed one provider call's outcome to its breaker
+
+    Only 5xx, timeouts and connection errors are failures; a 4xx is the provider working.
+    A call the rate limiter stopped never reached the provider and is not recorded.
+    """
+    if outcome == 'rate_limited':
+        provider_health.release(provider, kind)
+        return
+    provider_health.record(provider, kind, latency, outcome not in FAILURE_OUTCOMES)
+
+def provider_priority() -> List[str]:
+    """Configured providers, default first"""
+    return [Config.DEFAULT_PROVIDER] + [p for p in Config.BACKUP_PROVIDERS if p != Config.DEFAULT_PROVIDER]
+
+def known_provider(provider: str) -> bool:
+    """A configured streaming provider or jikan; anything else in a URL is rejected"""
+    return provider == 'jikan' or provider in provider_priority() or provider in Config.TRENDING_PROVIDERS
+
+def unknown_provider_reply(provider: str) -> Tuple[int, Dict]:
+    return 404, {'error': f"Unknown provider: {provider}"}
+
+# Request coalescing: one upstream fetch per cache key at a time
+upstream_flight = SingleFlight(timeout=Config.SINGLE_FLIGHT_TIMEOUT)
+
+def coalesced_fetch(cache_key: str, fetch, default=None, deadline: Optional[float] = None):
+    """Run fetch once per cache key; concurrent cache misses share its result
+
+    A caller with a deadline (time.monotonic()) waits on another caller's fetch only until then.
+    """
+    wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+    try:
+        return upstream_flight.do(cache_key, fetch, wait)
+    except FlightTimeout as e:
+        logger.error(f"Coalesced fetch timed out: {str(e)}")
+        return default
+
+# Stale-while-revalidate
+revalidate_executor = ThreadPoolExecutor(max_workers=Config.REVALIDATE_WORKERS, thread_name_prefix='revalidate')
+revalidating = set()
+revalidating_lock = threading.Lock()
+
+# Worst status wins when a request touches several cache entries
+CACHE_STATUS_RANK = {'fresh': 0, 'stale': 1, 'revalidated': 2, 'miss': 3}
+
+# Cache notes taken on worker threads (no request context), handed back to the request by the caller
+cache_notes = threading.local()
+
+def note_cache_status(status: str):
+    """Record how the current request was served for the X-Cache-Status header"""
+    notes = g if has_request_context() else getattr(cache_notes, 'current', None)
+    if notes is None:
+        return
+    current = notes.get('cache_status')
+    if current is None or CACHE_STATUS_RANK[status] > CACHE_STATUS_RANK[current]:
+        notes.cache_status = status
+
+def note_cache_time(cached_at: float):
+    """Record when the newest cache entry behind the current request was stored, for Last-Modified"""
+    notes = g if has_request_context() else getattr(cache_notes, 'current', None)
+    if notes is None:
+        return
+    if cached_at > notes.get('cache_updated', 0):
+        notes.cache_updated = cached_at
+
+class CacheNotes:
+    """X-Cache-Status and Last-Modified notes taken off the request thread"""
+
+    def __init__(self):
+        self.cache_status = None
+        self.cache_updated = 0
+
+    def get(self, name: str, default=None):
+        value = getattr(self, name)
+        return default if value is None else value
+
+    def apply(self):
+        """Merge into the current request's notes"""
+        if self.cache_status:
+            note_cache_status(self.cache_status)
+        note_cache_time(self.cache_updated)
+
+def with_cache_notes(fn, *args):
+    """Run fn on a worker thread; returns (result, CacheNotes) for the request thread to apply"""
+    notes = cache_notes.current = CacheNotes()
+    try:
+        return fn(*args), notes
+    finally:
+        cache_notes.current = None
+
+def schedule_revalidation(cache_key: str, fetch):
+    """Refresh an expired entry in the background, at most once at a time per key"""
+    with revalidating_lock:
+        if cache_key in revalidating:
+            return
+        revalidating.add(cache_key)
+    
+    def refresh():
+        try:
+            coalesced_fetch(cache_key, fetch)
+        except Exception as e:
+            logger.error(f"Revalidation failed for {cache_key}: {str(e)}")
+        finally:
+            with revalidating_lock:
+                revalidating.discard(cache_key)
+    
+    revalidate_executor.submit(refresh)
+
+def cached_fetch(cache_key: str, table: str, fetch, deadline: Optional[float] = None) -> Optional[Dict]:
+    """Serve from cache, returning stale data while revalidating or when the upstream fails"""
+    data, expires_at = lookup_cache(cache_key, table)
+    now = time.time()
+    if data is not None:
+        if now < expires_at:
+            note_cache_status('fresh')
+            return data
+        if now < expires_at + Config.CACHE_STALE_GRACE:
+            schedule_revalidation(cache_key, fetch)
+            note_cache_status('stale')
+            return data
+    
+    result = coalesced_fetch(cache_key, fetch, deadline=deadline)
+    if not result and data is not None and now < expires_at + Config.CACHE_STALE_IF_ERROR:
+        logger.warning(f"Serving stale {cache_key} after upstream failure")
+        note_cache_status('stale')
+        return data
+    note_cache_status('miss' if data is None else 'revalidated')
+    if result:
+        note_cache_time(time.time())
+    return result
 
 # Consumet API functions
-def search_anime_consumet(query: str, provider: str = Config.DEFAULT_PROVIDER) -> List[Dict]:
-    """Search anime using Consumet API"""
+def search_anime_consumet(query: str, provider: str = Config.DEFAULT_PROVIDER,
+                          timeout: Optional[float] = None, deadline: Optional[float] = None) -> List[Dict]:
+    """Search anime using Consumet API, giving up at deadline (time.monotonic()) when one is set"""
     cache_key = f"search_{provider}_{query.lower()}"
-    cached = get_from_cache(cache_key)
-    if cached:
-        return cached.get('results', [])
-    
+    data = cached_fetch(cache_key, "anime_cache",
+                        lambda: fetch_search_consumet(cache_key, query, provider, timeout, deadline),
+                        deadline)
+    return data.get('results', []) if data else []
+
+def fetch_search_consumet(cache_key: str, query: str, provider: str,
+                          timeout: Optional[float] = None, deadline: Optional[float] = None) -> Optional[Dict]:
+    """Fetch a provider search from Consumet and cache it"""
     url = f"{Config.CONSUMET_BASE_URL}/anime/{provider}/{quote(query)}"
-    data = make_request(url)
-    
+    data = provider_request(provider, 'search', url, timeout=timeout, deadline=deadline)
+    return store_search_results(cache_key, provider, data)
+
+def store_search_results(cache_key: str, provider: str, data: Optional[Dict]) -> Optional[Dict]:
+    """Clean a Consumet search response and cache it"""
     if data and 'results' in data:
         # Process and clean results
         results = []
@@ -199,21 +840,57 @@ def search_anime_consumet(query: str, provider: str = Config.DEFAULT_PROVIDER) -
         cache_data = {'results': results, 'provider': provider}
         save_to_cache(cache_key, cache_data, duration=1800)  # 30 min cache for searches
         
-        return results
+        return cache_data
     
-    return []
+    return None
 
 def get_anime_info_consumet(anime_id: str, provider: str = Config.DEFAULT_PROVIDER) -> Optional[Dict]:
     """Get detailed anime information from Consumet"""
     cache_key = f"info_{provider}_{anime_id}"
-    cached = get_from_cache(cache_key)
-    if cached:
-        return cached
+    return cached_fetch(cache_key, "anime_cache",
+                        lambda: fetch_anime_info_consumet(cache_key, anime_id, provider))
+
+def info_candidates(anime_id: str, provider: str) -> List[Tuple[str, str]]:
+    """The requested (provider, anime_id) first, then its other aliases in priority and health order"""
+    requested = (provider, str(anime_id))
+    priority = provider_priority()
+    others = sorted((a for a in alias_map.aliases(provider, anime_id) if a != requested and a[0] != 'jikan'),
+                    key=lambda a: priority.index(a[0]) if a[0] in priority else len(priority))
+    candidates = [requested] if provider != 'jikan' else []
+    return candidates + provider_health.rank(others, 'info', key=lambda a: a[0])
+
+def get_anime_info(anime_id: str, provider: str = Config.DEFAULT_PROVIDER) -> Optional[Dict]:
+    """Info for any alias of a title: fresh cached info first (the requested ID's own before
+    an alias's), then the requested provider, then the other aliases healthiest first"""
+    candidates = info_candidates(anime_id, provider)
+    for alias_provider, alias_id in candidates:
+        cached = get_from_cache(f"info_{alias_provider}_{alias_id}")
+        if cached:
+            note_cache_status('fresh')
+            return cached
     
+    for alias_provider, alias_id in candidates:
+        info = get_anime_info_consumet(alias_id, alias_provider)
+        if info:
+            return info
+    return None
+
+def alias_list(provider: str, anime_id: str) -> List[Dict]:
+    """Every known provider ID for the same title"""
+    return [{'provider': p, 'id': i} for p, i in alias_map.aliases(provider, anime_id)]
+
+def fetch_anime_info_consumet(cache_key: str, anime_id: str, provider: str) -> Optional[Dict]:
+    """Fetch anime information from Consumet and cache it"""
     url = f"{Config.CONSUMET_BASE_URL}/anime/{provider}/info/{anime_id}"
-    data = make_request(url)
-    
+    data = provider_request(provider, 'info', url)
+    return store_anime_info(cache_key, anime_id, provider, data)
+
+def store_anime_info(cache_key: str, anime_id: str, provider: str, data: Optional[Dict]) -> Optional[Dict]:
+    """Clean a Consumet info response, store its episode rows and cache it"""
     if data:
+        episodes = data.get('episodes') or []
+        numbers = [e.get('number') for e in episodes if isinstance(e.get('number'), (int, float))]
+        
         # Clean and structure the data
         info = {
             'id': data.get('id', ''),
@@ -221,32 +898,134 @@ def get_anime_info_consumet(anime_id: str, provider: str = Config.DEFAULT_PROVID
             'english_title': data.get('title', ''),
             'synopsis': data.get('description', ''),
             'genres': data.get('genres', []),
-            'episodes': len(data.get('episodes', [])),
+            'episodes': len(episodes),
             'totalEpisodes': data.get('totalEpisodes', 0),
             'year': data.get('releaseDate', '').split('-')[0] if data.get('releaseDate') else 'Unknown',
             'score': data.get('rating', 0),
             'image': data.get('image', ''),
             'status': data.get('status', 'Unknown'),
             'type': data.get('type', 'Unknown'),
-            'episodes_list': data.get('episodes', []),
+            'latestEpisode': episode_number(max(numbers)) if numbers else 0,
+            'episodes_cursor': f"/api/anime/{provider}/{quote(anime_id)}/episodes?offset=0&limit={Config.EPISODE_PAGE_SIZE}",
             'provider': provider
         }
         
+        # Episodes go to their own rows first so the info row never points at missing episodes
+        save_episodes(provider, anime_id, episodes)
         save_to_cache(cache_key, info)
         return info
     
     return None
 
+def episode_source(provider: str, episode_id: str) -> Optional[Tuple[str, float]]:
+    """(anime_id, number) of a stored provider episode"""
+    with get_db().connection() as conn:
+        return conn.execute("SELECT anime_id, number FROM episode_cache WHERE provider = ? AND episode_id = ?",
+                            (provider, episode_id)).fetchone()
+
+def episode_at(provider: str, anime_id: str, number: float) -> Optional[str]:
+    """Stored episode ID for an episode number of a show"""
+    with get_db().connection() as conn:
+        row = conn.execute(
+            "SELECT episode_id FROM episode_cache WHERE provider = ? AND anime_id = ? AND number = ?",
+            (provider, anime_id, number)
+        ).fetchone()
+    return row[0] if row and row[0] else None
+
+def episode_title_aliases(provider: str, episode_id: str) -> List[Tuple[str, str]]:
+    """The other streaming providers' IDs for the title a stored episode belongs to"""
+    row = episode_source(provider, episode_id)
+    if not row:
+        return []
+    return [(alias_provider, alias_id) for alias_provider, alias_id in alias_map.aliases(provider, row[0])
+            if alias_provider not in (provider, 'jikan')]
+
+def episode_alternatives(provider: str, episode_id: str) -> List[Tuple[str, str]]:
+    """(provider, episode_id) of the same episode number on the title's other providers
+
+    Only aliases with stored episode rows are found; loading an alias's info stores its rows.
+    """
+    row = episode_source(provider, episode_id)
+    if not row:
+        return []
+    alternatives = []
+    for alias_provider, alias_id in episode_title_aliases(provider, episode_id):
+        match = episode_at(alias_provider, alias_id, row[1])
+        if match:
+            alternatives.append((alias_provider, match))
+    return alternatives
+
+# Hedged watch requests: a backup provider races a slow primary within a per-provider budget
+hedge_executor = ThreadPoolExecutor(max_workers=Config.HEDGE_WORKERS, thread_name_prefix='hedge')
+
+def hedge_budget_config(provider: str):
+    return Config.WATCH_HEDGE_RATE, Config.WATCH_HEDGE_BURST
+
+def hedge_can_send(provider: str) -> bool:
+    """Hedge only into spare rate limit: a hedge that queues for a token can't win"""
+    return rate_limiter.bucket(f"consumet:{provider}").available() >= 1
+
+watch_hedger = Hedger(hedge_executor, hedge_budget_config, hedge_can_send)
+
+def hedge_delay(provider: str) -> float:
+    """Seconds the primary gets before a hedge is sent: its watch latency percentile"""
+    observed = provider_health.latency(provider, 'watch', Config.WATCH_HEDGE_PERCENTILE)
+    return max(Config.WATCH_HEDGE_MIN_DELAY, Config.WATCH_HEDGE_DELAY if observed is None else observed)
+
+def resolve_streaming_links(episode_id: str, provider: str = Config.DEFAULT_PROVIDER) -> Optional[Dict]:
+    """Streaming links from any provider carrying the episode, healthiest first (hedged if enabled)"""
+    candidates = [(provider, episode_id)] + episode_alternatives(provider, episode_id)
+    for candidate_provider, candidate_id in candidates:
+        cached = get_from_cache(f"stream_{candidate_provider}_{candidate_id}", "streaming_cache")
+        if cached:
+            note_cache_status('fresh')
+            return cached
+    
+    ranked = provider_health.rank(candidates, 'watch', key=lambda c: c[0])
+    tried = set(ranked)
+    if Config.WATCH_HEDGING and len(ranked) > 1:
+        attempts = [(p, lambda p=p, e=e: hedged_streaming_links(e, p)) for p, e in ranked]
+        winner, _ = watch_hedger.run(attempts[0], attempts[1:], hedge_delay(ranked[0][0]))
+        if winner:
+            links, notes = winner
+            notes.apply()
+            return links
+        note_cache_status('miss')
+    else:
+        for candidate in ranked:
+            links = get_episode_streaming_links(candidate[1], candidate[0])
+            if links:
+                return links
+    
+    # Every known copy failed: load the aliases' info (storing their episode rows) and look again
+    for alias_provider, alias_id in episode_title_aliases(provider, episode_id):
+        get_anime_info_consumet(alias_id, alias_provider)
+    for candidate in episode_alternatives(provider, episode_id):
+        if candidate not in tried:
+            links = get_episode_streaming_links(candidate[1], candidate[0])
+            if links:
+                return links
+    return None
+
+def hedged_streaming_links(episode_id: str, provider: str) -> Optional[Tuple[Dict, CacheNotes]]:
+    """One hedged watch attempt: (links, cache notes) on success, None so the hedger tries another"""
+    links, notes = with_cache_notes(get_episode_streaming_links, episode_id, provider)
+    return (links, notes) if links else None
+
 def get_episode_streaming_links(episode_id: str, provider: str = Config.DEFAULT_PROVIDER) -> Optional[Dict]:
     """Get streaming links for specific episode"""
     cache_key = f"stream_{provider}_{episode_id}"
-    cached = get_from_cache(cache_key, "streaming_cache")
-    if cached:
-        return cached
-    
+    return cached_fetch(cache_key, "streaming_cache",
+                        lambda: fetch_episode_streaming_links(cache_key, episode_id, provider))
+
+def fetch_episode_streaming_links(cache_key: str, episode_id: str, provider: str) -> Optional[Dict]:
+    """Fetch streaming links from Consumet and cache them"""
     url = f"{Config.CONSUMET_BASE_URL}/anime/{provider}/watch/{episode_id}"
-    data = make_request(url)
-    
+    data = provider_request(provider, 'watch', url)
+    return store_streaming_links(cache_key, provider, data)
+
+def store_streaming_links(cache_key: str, provider: str, data: Optional[Dict]) -> Optional[Dict]:
+    """Structure a Consumet watch response and cache it"""
     if data:
         # Structure streaming data
         streaming_info = {
@@ -254,6 +1033,7 @@ def get_episode_streaming_links(episode_id: str, provider: str = Config.DEFAULT_
             'subtitles': data.get('subtitles', []),
             'intro': data.get('intro', {}),
             'outro': data.get('outro', {}),
+            'headers': data.get('headers', {}),
             'provider': provider
         }
         
@@ -262,45 +1042,100 @@ def get_episode_streaming_links(episode_id: str, provider: str = Config.DEFAULT_
     
     return None
 
-def search_with_fallback(query: str) -> List[Dict]:
-    """Search across multiple providers as fallback"""
-    all_results = []
-    
-    # Try default provider first
-    results = search_anime_consumet(query, Config.DEFAULT_PROVIDER)
-    if results:
-        all_results.extend(results)
+# Bounded pool shared by every search so concurrent requests can't spawn unbounded threads
+search_executor = ThreadPoolExecutor(max_workers=Config.SEARCH_WORKERS, thread_name_prefix='search')
+
+def search_with_fallback(query: str, min_results: int = None) -> List[Dict]:
+    """Search all providers concurrently and merge healthiest provider first"""
+    if min_results is None:
+        min_results = Config.SEARCH_EARLY_RESULTS
+    providers = provider_health.rank(provider_priority(), 'search')
+    timeout = Config.SEARCH_PROVIDER_TIMEOUT
+    # One deadline for the whole search, down to token waits and retries, so a slow provider
+    # frees its search thread when the search gives up on it
+    deadline = time.monotonic() + timeout
+    futures = {
+        search_executor.submit(with_cache_notes, search_anime_consumet, query, provider, timeout, deadline): provider
+        for provider in providers
+    }
     
-    # If we don't have enough results, try backup providers
-    if len(all_results) < 10:
-        for provider in Config.BACKUP_PROVIDERS:
+    # Collect as providers finish; stragglers past the deadline are ignored
+    results_by_provider = {}
+    collected = 0
+    try:
+        for future in as_completed(futures, timeout=max(0.0, deadline - time.monotonic())):
+            provider = futures[future]
             try:
-                backup_results = search_anime_consumet(query, provider)
-                all_results.extend(backup_results)
-                time.sleep(Config.CONSUMET_RATE_LIMIT)  # Rate limiting
+                results_by_provider[provider], notes = future.result()
+                notes.apply()
             except Exception as e:
-                logger.error(f"Backup provider {provider} failed: {str(e)}")
+                logger.error(f"Provider {provider} failed: {str(e)}")
                 continue
+            collected += len(results_by_provider[provider])
+            if min_results and collected >= min_results:
+                break
+    except FuturesTimeout:
+        pending = [p for f, p in futures.items() if not f.done()]
+        logger.warning(f"Search providers timed out: {', '.join(pending)}")
     
-    # Remove duplicates based on title similarity
-    seen_titles = set()
-    unique_results = []
-    for result in all_results:
-        title_key = result['title'].lower().strip()
-        if title_key not in seen_titles:
-            seen_titles.add(title_key)
-            unique_results.append(result)
+    # Drop anything still queued; running searches stop at the deadline at the latest
+    for future in futures:
+        future.cancel()
+    
+    return merge_provider_results(providers, results_by_provider)
+
+def merge_provider_results(providers: List[str], results_by_provider: Dict[str, List[Dict]]) -> List[Dict]:
+    """Provider results in ranked order with near-duplicate titles merged, learning the aliases they show"""
+    all_results = []
+    for provider in providers:
+        all_results.extend(results_by_provider.get(provider, []))
+    
+    # Merge near-duplicate titles across providers, keeping every provider ID
+    unique_results = merge_results(all_results, Config.DEDUPE_THRESHOLD)
+    try:
+        alias_map.learn(unique_results)
+    except Exception as e:
+        logger.error(f"Alias learning failed: {str(e)}")
     
     return unique_results[:20]  # Limit to 20 results
 
+def merge_local_results(results: List[Dict], local: List[Dict]) -> List[Dict]:
+    """source=merge: local index hits the remote results don't already carry, merged in"""
+    local = [r for r in local
+             if not any(p['provider'] == r['provider'] and p['id'] == r['id']
+                        for m in results for p in m.get('providers', []))]
+    return merge_results(results + local, Config.DEDUPE_THRESHOLD)[:20]
+
 # Jikan API fallback functions
 def search_jikan_fallback(query: str) -> List[Dict]:
     """Fallback search using Jikan API"""
     try:
-        url = f"{Config.JIKAN_BASE_URL}/anime"
-        params = {'q': query, 'limit': 20, 'order_by': 'score', 'sort': 'desc'}
-        data = make_request(url, params)
-        
+        cache_key = f"jikan_search_{query.lower()}"
+        data = cached_fetch(cache_key, "anime_cache", lambda: fetch_search_jikan(cache_key, query))
+        return data.get('results', []) if data else []
+    except Exception as e:
+        logger.error(f"Jikan fallback failed: {str(e)}")
+    
+    return []
+
+def fetch_search_jikan(cache_key: str, query: str) -> Optional[Dict]:
+    """Fetch a Jikan search and cache it"""
+    url = f"{Config.JIKAN_BASE_URL}/anime"
+    params = {'q': query, 'limit': 20, 'order_by': 'score', 'sort': 'desc'}
+    return store_jikan_search(cache_key, make_request(url, params))
+
+def store_jikan_search(cache_key: str, data: Optional[Dict]) -> Optional[Dict]:
+    """Cache the results of a Jikan /anime response"""
+    results = jikan_search_results(data)
+    if results:
+        cache_data = {'results': results, 'provider': 'jikan'}
+        save_to_cache(cache_key, cache_data, duration=1800)
+        return cache_data
+    return None
+
+def jikan_search_results(data: Optional[Dict]) -> List[Dict]:
+    """Search results from a Jikan /anime response"""
+    try:
         if data and 'data' in data:
             results = []
             for item in data['data']:
@@ -317,120 +1152,533 @@ def search_jikan_fallback(query: str) -> List[Dict]:
                 results.append(result)
             return results
     except Exception as e:
-        logger.error(f"Jikan fallback failed: {str(e)}")
+        logger.error(f"Jikan results parsing failed: {str(e)}")
     
     return []
 
+def jikan_anime_info(data: Optional[Dict]) -> Optional[Dict]:
+    """Info from a Jikan /anime/<id> response, linked to the title's other provider IDs"""
+    if data and 'data' in data:
+        item = data['data']
+        info = {
+            'id': str(item.get('mal_id', '')),
+            'title': item.get('title', ''),
+            'english_title': item.get('title_english', ''),
+            'synopsis': item.get('synopsis', ''),
+            'genres': [g.get('name', '') for g in item.get('genres', [])],
+            'episodes': item.get('episodes', 0),
+            'totalEpisodes': item.get('episodes', 0),
+            'year': item.get('aired', {}).get('from', '').split('-')[0] if item.get('aired', {}).get('from') else 'Unknown',
+            'score': item.get('score', 0),
+            'image': item.get('images', {}).get('jpg', {}).get('large_image_url', ''),
+            'status': item.get('status', 'Unknown'),
+            'type': item.get('type', 'Unknown'),
+            'provider': 'jikan'
+        }
+        alias_map.link(info['title'], [('jikan', info['id'])])
+        return info
+    return None
+
+def get_jikan_anime_info(anime_id: str) -> Optional[Dict]:
+    """Jikan metadata for a MAL ID, cached like provider info"""
+    cache_key = f"jikan_info_{anime_id}"
+    return cached_fetch(cache_key, "anime_cache", lambda: fetch_jikan_anime_info(cache_key, anime_id))
+
+def fetch_jikan_anime_info(cache_key: str, anime_id: str) -> Optional[Dict]:
+    url = f"{Config.JIKAN_BASE_URL}/anime/{anime_id}"
+    return store_jikan_anime_info(cache_key, make_request(url))
+
+def store_jikan_anime_info(cache_key: str, data: Optional[Dict]) -> Optional[Dict]:
+    info = jikan_anime_info(data)
+    if info:
+        save_to_cache(cache_key, info)
+    return info
+
+# Request parsing and payloads shared by the threaded and async servers
+SEARCH_MODES = ('remote', 'local', 'merge')
+
+def search_request_error(query: str, mode: str) -> Optional[str]:
+    """Why a search request can't be served, or None"""
+    if not query or len(query) < 2:
+        return 'Query must be at least 2 characters'
+    if mode not in SEARCH_MODES:
+        return 'source must be remote, local or merge'
+    return None
+
+def search_payload(results: List[Dict], query: str, source: str) -> Dict:
+    return {'results': results, 'total': len(results), 'query': query, 'source': source}
+
+def episode_page_params(arg) -> Tuple[int, int, Optional[float]]:
+    """(offset, limit, after) from a request-args getter called like arg(name, default, type=...)"""
+    offset = max(0, arg('offset', 0, type=int))
+    limit = min(max(1, arg('limit', Config.EPISODE_PAGE_SIZE, type=int)), Config.EPISODE_PAGE_MAX)
+    return offset, limit, arg('after', None, type=float)
+
+def episodes_payload(episodes: List[Dict], total: int, offset: int, limit: int,
+                     provider: str, anime_id: str) -> Dict:
+    """One page of episodes with the cursor for the next"""
+    next_cursor = None
+    if len(episodes) == limit:
+        next_cursor = f"/api/anime/{provider}/{quote(anime_id)}/episodes?after={episodes[-1]['number']}&limit={limit}"
+    return {
+        'episodes': episodes,
+        'total': total,
+        'offset': offset,
+        'limit': limit,
+        'next_cursor': next_cursor,
+        'provider': provider,
+        'anime_id': anime_id
+    }
+
+def health_payload(coalescing: Dict) -> Dict:
+    """/api/health body; coalescing is the serving mode's single-flight stats"""
+    return {
+        'status': 'healthy',
+        'timestamp': datetime.now().isoformat(),
+        'version': '3.0.0',
+        'rate_limits': rate_limiter.stats(),
+        'memory_cache': memory_cache.stats(),
+        'coalescing': coalescing,
+        'providers': provider_health.stats(),
+        'hedging': dict(watch_hedger.stats(), enabled=Config.WATCH_HEDGING),
+        'database': get_db().stats()
+    }
+
+def cache_stats_payload(coalescing: Dict) -> Dict:
+    """/api/cache/stats body; coalescing is the serving mode's single-flight stats"""
+    return {
+        'memory': memory_cache.stats(),
+        'database': cache_maintenance.stats(),
+        'search_index': search_index.stats(),
+        'aliases': alias_map.stats(),
+        'suggest_index': suggest_index.stats(),
+        'coalescing': coalescing,
+        'segments': segment_cache().stats(),
+        'warming': cache_warmer.stats(),
+        'static': static_assets().stats()
+    }
+
+# Route handlers shared by the threaded and async servers: (status, JSON payload)
+def json_reply(reply: Tuple[int, Dict]):
+    """A shared handler's reply as a Flask response"""
+    status, payload = reply
+    return jsonify(payload), status
+
+def suggest_reply(arg) -> Tuple[int, Dict]:
+    """Typeahead suggestions served from memory; arg reads a query parameter like request.args.get"""
+    query = arg('q', '').strip()
+    limit = min(max(1, arg('limit', Config.SUGGEST_LIMIT, type=int)), 50)
+    if not query:
+        return 200, {'suggestions': [], 'total': 0, 'query': query}
+    suggestions = suggest_index.suggest(query, limit)
+    return 200, {'suggestions': suggestions, 'total': len(suggestions), 'query': query}
+
+def cache_stats_reply(coalescing: Dict) -> Tuple[int, Dict]:
+    try:
+        return 200, cache_stats_payload(coalescing)
+    except Exception as e:
+        logger.error(f"Cache stats error: {str(e)}")
+        return 500, {'error': 'Failed to read cache stats'}
+
 # Flask routes
 @app.route('/')
 def index():
     """Serve main application"""
-    return render_template('index.html')
+    response = static_response('index.html')
+    return response if response is not None else render_template('index.html')
 
 @app.route('/api/search')
 def api_search():
     """API endpoint for anime search"""
     query = request.args.get('q', '').strip()
-    if not query or len(query) < 2:
-        return jsonify({'error': 'Query must be at least 2 characters'}), 400
+    mode = request.args.get('source', Config.SEARCH_MODE)
+    error = search_request_error(query, mode)
+    if error:
+        return jsonify({'error': error}), 400
     
     try:
-        # Try Consumet first
-        results = search_with_fallback(query)
+        source = mode
+        if mode == 'local':
+            results = search_index.search(query)
+        else:
+            # Try Consumet first
+            results = search_with_fallback(query)
+            
+            if mode == 'merge':
+                results = merge_local_results(results, search_index.search(query))
+            
+            # Upstreams slow or rate limited: answer from the local index
+            if not results:
+                results = search_index.search(query)
+                source = 'local'
         
         # If no results, try Jikan as fallback
-        if not results:
+        if not results and mode != 'local':
             results = search_jikan_fallback(query)
+            source = 'jikan'
         
-        return jsonify({
-            'results': results,
-            'total': len(results),
-            'query': query
-        })
+        return conditional_json(search_payload(results, query, source), Config.HTTP_MAX_AGE)
     except Exception as e:
         logger.error(f"Search error: {str(e)}")
         return jsonify({'error': 'Search failed'}), 500
 
+@app.route('/api/suggest')
+def api_suggest():
+    """Typeahead suggestions served from memory"""
+    return json_reply(suggest_reply(request.args.get))
+
 @app.route('/api/anime/<provider>/<anime_id>')
 def api_anime_info(provider, anime_id):
     """Get detailed anime information"""
+    if not known_provider(provider):
+        return json_reply(unknown_provider_reply(provider))
     try:
         if provider == 'jikan':
+            # A streaming provider's cached entry for the same title beats Jikan metadata
+            info = get_anime_info(anime_id, provider)
+            if info:
+                return conditional_json(dict(info, aliases=alias_list(provider, anime_id)), Config.HTTP_MAX_AGE)
+            
             # Handle Jikan API differently
-            url = f"{Config.JIKAN_BASE_URL}/anime/{anime_id}"
-            data = make_request(url)
-            if data and 'data' in data:
-                item = data['data']
-                info = {
-                    'id': str(item.get('mal_id', '')),
-                    'title': item.get('title', ''),
-                    'english_title': item.get('title_english', ''),
-                    'synopsis': item.get('synopsis', ''),
-                    'genres': [g.get('name', '') for g in item.get('genres', [])],
-                    'episodes': item.get('episodes', 0),
-                    'totalEpisodes': item.get('episodes', 0),
-                    'year': item.get('aired', {}).get('from', '').split('-')[0] if item.get('aired', {}).get('from') else 'Unknown',
-                    'score': item.get('score', 0),
-                    'image': item.get('images', {}).get('jpg', {}).get('large_image_url', ''),
-                    'status': item.get('status', 'Unknown'),
-                    'type': item.get('type', 'Unknown'),
-                    'episodes_list': [],
-                    'provider': 'jikan'
-                }
-                return jsonify(info)
+            info = get_jikan_anime_info(anime_id)
+            if info:
+                return conditional_json(dict(info, aliases=alias_list('jikan', anime_id)), Config.HTTP_MAX_AGE)
         else:
-            info = get_anime_info_consumet(anime_id, provider)
+            info = get_anime_info(anime_id, provider)
             if info:
-                return jsonify(info)
+                return conditional_json(dict(info, aliases=alias_list(provider, anime_id)), Config.HTTP_MAX_AGE)
         
         return jsonify({'error': 'Anime not found'}), 404
     except Exception as e:
         logger.error(f"Info error: {str(e)}")
         return jsonify({'error': 'Failed to fetch anime info'}), 500
 
+@app.route('/api/anime/<provider>/<anime_id>/episodes')
+def api_anime_episodes(provider, anime_id):
+    """Paginated episode list (offset/limit, or after=<episode number>)"""
+    if not known_provider(provider):
+        return json_reply(unknown_provider_reply(provider))
+    offset, limit, after = episode_page_params(request.args.get)
+    
+    try:
+        info = get_anime_info(anime_id, provider)
+        if info:
+            # Fetching (or revalidating) the info stores the episode rows; an alias may answer
+            provider, anime_id = info.get('provider') or provider, info.get('id') or anime_id
+            episodes, total = get_episodes(provider, anime_id, offset, limit, after)
+        elif provider == 'jikan':
+            episodes, total = [], 0
+        else:
+            return jsonify({'error': 'Anime not found'}), 404
+        
+        return jsonify(episodes_payload(episodes, total, offset, limit, provider, anime_id))
+    except Exception as e:
+        logger.error(f"Episodes error: {str(e)}")
+        return jsonify({'error': 'Failed to fetch episodes'}), 500
+
 @app.route('/api/watch/<provider>/<episode_id>')
 def api_watch_episode(provider, episode_id):
     """Get streaming links for episode"""
+    if not known_provider(provider):
+        return json_reply(unknown_provider_reply(provider))
     try:
-        streaming_info = get_episode_streaming_links(episode_id, provider)
+        streaming_info = resolve_streaming_links(episode_id, provider)
         if streaming_info:
-            return jsonify(streaming_info)
+            return jsonify(with_proxy_urls(streaming_info))
         else:
             return jsonify({'error': 'Episode not found'}), 404
     except Exception as e:
         logger.error(f"Streaming error: {str(e)}")
         return jsonify({'error': 'Failed to fetch streaming links'}), 500
 
+# Streaming proxy
+stream_proxy_key = os.urandom(32)  # signs proxy URLs when Config.STREAM_PROXY_SECRET is unset
+stream_cache = None
+stream_cache_lock = threading.Lock()
+
+def segment_cache() -> SegmentCache:
+    """Shared disk segment cache for Config.SEGMENT_CACHE_DIR"""
+    global stream_cache
+    cache = stream_cache
+    if cache is None or cache.directory != Config.SEGMENT_CACHE_DIR:
+        with stream_cache_lock:
+            if stream_cache is None or stream_cache.directory != Config.SEGMENT_CACHE_DIR:
+                stream_cache = SegmentCache(
+                    Config.SEGMENT_CACHE_DIR,
+                    max_bytes=Config.SEGMENT_CACHE_MAX_BYTES,
+                    max_item_bytes=Config.SEGMENT_CACHE_MAX_ITEM_BYTES
+                )
+            cache = stream_cache
+    return cache
+
+static_files = None
+static_files_lock = threading.Lock()
+
+def static_assets() -> StaticAssets:
+    """Static files of the frontend, loaded and precompressed on first use"""
+    global static_files
+    if static_files is None:
+        with static_files_lock:
+            if static_files is None:
+                static = StaticAssets(app.static_folder, max_file_bytes=Config.STATIC_MEMORY_MAX_BYTES)
+                static.build()
+                static_files = static
+    return static_files
+
+def static_response(path: str) -> Optional[Response]:
+    """An in-memory static file in the coding the client prefers, None when it isn't held in memory"""
+    reply = static_assets().respond(path, request.headers)
+    if reply is None:
+        return None
+    status, headers, body = reply
+    return Response(body, status=status, headers=headers)
+
+def stream_secret() -> bytes:
+    return Config.STREAM_PROXY_SECRET.encode('utf-8') if Config.STREAM_PROXY_SECRET else stream_proxy_key
+
+def stream_host_allowed(url: str) -> bool:
+    """Whether the proxy may sign and fetch url: public hosts only, unless configured otherwise"""
+    return Config.STREAM_ALLOW_PRIVATE_HOSTS or is_public_url(url)
+
+def stream_proxy_url(url: str, referer: str = '') -> Optional[str]:
+    """Signed /api/stream URL for an upstream playlist, segment or subtitle; None for a host it won't fetch"""
+    if not stream_host_allowed(url):
+        return None
+    query = urlencode({'u': url, 'r': referer, 's': sign(stream_secret(), url, referer)})
+    return f"/api/stream?{query}"
+
+def with_proxy_urls(streaming_info: Dict) -> Dict:
+    """Copy of a watch response whose sources and subtitles also carry a proxyUrl"""
+    if not Config.STREAM_PROXY:
+        return streaming_info
+    referer = (streaming_info.get('headers') or {}).get('Referer', '')
+    info = dict(streaming_info)
+    for field in ('sources', 'subtitles'):
+        items = []
+        for item in streaming_info.get(field) or []:
+            proxy_url = stream_proxy_url(item['url'], referer) if item.get('url') else None
+            items.append(dict(item, proxyUrl=proxy_url) if proxy_url else item)
+        info[field] = items
+    return info
+
+def stream_request_headers(referer: str, range_header: Optional[str]) -> Dict[str, str]:
+    """Headers for a CDN request: the Referer it expects, the client's Range, no compression"""
+    headers = {'Accept-Encoding': 'identity'}
+    if referer:
+        headers['Referer'] = referer
+    if range_header:
+        headers['Range'] = range_header
+    return headers
+
+def open_stream(url: str, referer: str, range_header: Optional[str]) -> Optional[requests.Response]:
+    """Start a streamed CDN GET, recording its latency; None when the request failed outright"""
+    started = time.perf_counter()
+    try:
+        upstream = stream_client.get(url, headers=stream_request_headers(referer, range_header), stream=True,
+                                   timeout=(Config.HTTP_CONNECT_TIMEOUT, Config.STREAM_READ_TIMEOUT))
+    except requests.RequestException as e:
+        logger.error(f"Stream proxy error for {url}: {str(e)}")
+        upstream_latency.observe(time.perf_counter() - started, 'stream', 'error')
+        return None
+    upstream_latency.observe(time.perf_counter() - started, 'stream',
+                             'ok' if upstream.status_code in (200, 206) else status_outcome(upstream.status_code))
+    return upstream
+
+# One whole-segment fetch per URL at a time, for ranged requests that missed the disk cache
+segment_flight = SingleFlight()
+
+def fetch_whole_segment(url: str, referer: str) -> bool:
+    """Download a segment without Range into the disk cache; False when it could not be kept"""
+    upstream = open_stream(url, referer, None)
+    if upstream is None:
+        return False
+    try:
+        if upstream.status_code != 200 or is_playlist(url, upstream.headers.get('Content-Type')):
+            return False
+        length = upstream.headers.get('Content-Length', '')
+        writer = segment_cache().writer(url, int(length) if length.isdigit() else None)
+        if writer is None:
+            return False
+        completed = False
+        try:
+            for chunk in upstream.iter_content(Config.STREAM_CHUNK_SIZE):
+                writer.write(chunk)
+            completed = True
+        finally:
+            if completed:
+                writer.commit()
+            else:
+                writer.abort()
+        return True
+    except requests.RequestException as e:
+        logger.error(f"Stream proxy error for {url}: {str(e)}")
+        return False
+    finally:
+        upstream.close()
+
+def cache_whole_segment(url: str, referer: str):
+    """(open file, size) of a segment fetched whole into the disk cache, None when it can't be cached
+
+    Ranged misses land here, so the range is answered from the cached copy and later ranges are hits.
+    """
+    try:
+        fetched = segment_flight.do(url, lambda: fetch_whole_segment(url, referer), Config.STREAM_READ_TIMEOUT)
+    except FlightTimeout:
+        return None
+    return segment_cache().lookup(url) if fetched else None
+
+def cached_segment_response(url: str, f, size: int, range_header: Optional[str]):
+    """Serve a segment from the disk cache, honouring a single byte range"""
+    try:
+        status, headers, start, length = cached_segment_plan(url, size, range_header)
+    except RangeNotSatisfiable:
+        f.close()
+        return Response(status=416, headers={'Content-Range': f"bytes */{size}"})
+    note_cache_status('fresh')
+    return Response(iter_file(f, start, length, Config.STREAM_CHUNK_SIZE), status=status,
+                    headers=headers, direct_passthrough=True)
+
+def relay_segment(url: str, upstream: requests.Response):
+    """Stream an upstream segment through in chunks, teeing full bodies into the disk cache"""
+    headers = segment_headers(url, upstream.headers)
+    writer = None
+    if upstream.status_code == 200:
+        length = upstream.headers.get('Content-Length', '')
+        writer = segment_cache().writer(url, int(length) if length.isdigit() else None)
+
+    def generate():
+        completed = False
+        try:
+            for chunk in upstream.iter_content(Config.STREAM_CHUNK_SIZE):
+                if writer:
+                    writer.write(chunk)
+                yield chunk
+            completed = True
+        finally:
+            upstream.close()
+            if writer:
+                if completed:
+                    writer.commit()
+                else:
+                    writer.abort()
+
+    note_cache_status('miss')
+    return Response(generate(), status=upstream.status_code, headers=headers, direct_passthrough=True)
+
+@app.route('/api/stream')
+def api_stream():
+    """Proxy an HLS playlist, segment or subtitle issued by /api/watch"""
+    url = request.args.get('u', '')
+    referer = request.args.get('r', '')
+    if not url.startswith(('http://', 'https://')) or \
+            not verify(stream_secret(), url, referer, request.args.get('s', '')):
+        return jsonify({'error': 'Invalid stream URL'}), 403
+
+    if not stream_host_allowed(url):
+        logger.warning(f"Refusing to proxy non-public host: {url}")
+        return jsonify({'error': 'Invalid stream URL'}), 403
+
+    playlist = is_playlist(url)
+    range_header = None if playlist else request.headers.get('Range')
+    if not playlist:
+        cached = segment_cache().lookup(url)
+        if cached is None and range_header:
+            cached = cache_whole_segment(url, referer)
+            if cached:
+                note_cache_status('miss')
+        if cached:
+            return cached_segment_response(url, *cached, range_header)
+
+    # Playlists, whole-segment misses and ranges that could not be cached are relayed as they arrive
+    upstream = open_stream(url, referer, range_header)
+    if upstream is None:
+        return jsonify({'error': 'Stream unavailable'}), 502
+    if upstream.status_code not in (200, 206):
+        upstream.close()
+        logger.error(f"HTTP {upstream.status_code} for stream {url}")
+        status = upstream.status_code if upstream.status_code in (403, 404, 416) else 502
+        return jsonify({'error': f"Upstream returned HTTP {upstream.status_code}"}), status
+
+    if playlist or is_playlist(url, upstream.headers.get('Content-Type')):
+        try:
+            text = upstream.text
+        finally:
+            upstream.close()
+        body = rewrite_playlist(text, upstream.url or url, lambda target: stream_proxy_url(target, referer))
+        return Response(body, mimetype=PLAYLIST_CONTENT_TYPE,
+                        headers={'Cache-Control': 'no-cache', 'X-Content-Type-Options': 'nosniff'})
+    return relay_segment(url, upstream)
+
+def trending_results(data: Optional[Dict], provider: str) -> List[Dict]:
+    """Top 20 of a Consumet top-airing response, tagged with the provider"""
+    if data and data.get('results'):
+        return [dict(item, provider=provider) for item in data['results'][:20]]
+    return []
+
+def jikan_trending_results(data: Optional[Dict]) -> List[Dict]:
+    """Top 20 of a Jikan /seasons/now response"""
+    results = []
+    if data and 'data' in data:
+        for item in data['data'][:20]:
+            result = {
+                'id': str(item.get('mal_id', '')),
+                'title': item.get('title', ''),
+                'image': item.get('images', {}).get('jpg', {}).get('large_image_url', ''),
+                'status': item.get('status', 'Unknown'),
+                'provider': 'jikan'
+            }
+            results.append(result)
+    return results
+
+TRENDING_CACHE_KEY = 'trending'
+RECENT_CACHE_KEY = 'recent_gogoanime'
+
+def fetch_trending() -> Optional[Dict]:
+    """Fetch the trending list, healthiest provider with a top-airing list first, and cache it"""
+    results, source = [], None
+    for provider in provider_health.rank(Config.TRENDING_PROVIDERS, 'trending'):
+        url = f"{Config.CONSUMET_BASE_URL}/anime/{provider}/top-airing"
+        results = trending_results(provider_request(provider, 'trending', url), provider)
+        if results:
+            source = provider
+            break
+    
+    if not results:
+        # Fallback to Jikan
+        url = f"{Config.JIKAN_BASE_URL}/seasons/now"
+        results = jikan_trending_results(make_request(url))
+    return store_trending(results, source)
+
+def store_trending(results: List[Dict], source: Optional[str]) -> Optional[Dict]:
+    """Cache a trending list and feed its titles to the typeahead"""
+    if not results:
+        return None
+    suggest_index.add(results, source, Config.SUGGEST_TRENDING_WEIGHT)
+    data = {'results': results, 'total': len(results)}
+    save_to_cache(TRENDING_CACHE_KEY, data, duration=Config.LIST_CACHE_DURATION)
+    return data
+
+def fetch_recent() -> Optional[Dict]:
+    """Fetch the recent-episodes list and cache it"""
+    url = f"{Config.CONSUMET_BASE_URL}/anime/gogoanime/recent-episodes"
+    return store_recent(make_request(url))
+
+def store_recent(data: Optional[Dict]) -> Optional[Dict]:
+    """Top 20 of a Consumet recent-episodes response, cached"""
+    if data and data.get('results'):
+        results = data['results'][:20]
+        recent = {'results': results, 'total': len(results)}
+        save_to_cache(RECENT_CACHE_KEY, recent, duration=Config.LIST_CACHE_DURATION)
+        return recent
+    return None
+
 @app.route('/api/trending')
 def api_trending():
     """Get trending anime"""
     try:
-        # Try Consumet first
-        url = f"{Config.CONSUMET_BASE_URL}/anime/gogoanime/top-airing"
-        data = make_request(url)
-        
-        if data and 'results' in data:
-            results = data['results'][:20]  # Limit to top 20
-        else:
-            # Fallback to Jikan
-            url = f"{Config.JIKAN_BASE_URL}/seasons/now"
-            data = make_request(url)
-            results = []
-            if data and 'data' in data:
-                for item in data['data'][:20]:
-                    result = {
-                        'id': str(item.get('mal_id', '')),
-                        'title': item.get('title', ''),
-                        'image': item.get('images', {}).get('jpg', {}).get('large_image_url', ''),
-                        'status': item.get('status', 'Unknown'),
-                        'provider': 'jikan'
-                    }
-                    results.append(result)
-        
-        return jsonify({
-            'results': results,
-            'total': len(results)
-        })
+        data = cached_fetch(TRENDING_CACHE_KEY, "anime_cache", fetch_trending)
+        return conditional_json(data or {'results': [], 'total': 0}, Config.HTTP_MAX_AGE_LISTS,
+                                cached_body(data, TRENDING_CACHE_KEY))
     except Exception as e:
         logger.error(f"Trending error: {str(e)}")
         return jsonify({'error': 'Failed to fetch trending anime'}), 500
@@ -439,26 +1687,17 @@ def api_trending():
 def api_recent():
     """Get recent episodes"""
     try:
-        url = f"{Config.CONSUMET_BASE_URL}/anime/gogoanime/recent-episodes"
-        data = make_request(url)
-        
-        if data and 'results' in data:
-            results = data['results'][:20]
-            return jsonify({
-                'results': results,
-                'total': len(results)
-            })
-        else:
-            return jsonify({'results': [], 'total': 0})
+        data = cached_fetch(RECENT_CACHE_KEY, "anime_cache", fetch_recent)
+        return conditional_json(data or {'results': [], 'total': 0}, Config.HTTP_MAX_AGE_LISTS,
+                                cached_body(data, RECENT_CACHE_KEY))
     except Exception as e:
         logger.error(f"Recent episodes error: {str(e)}")
         return jsonify({'error': 'Failed to fetch recent episodes'}), 500
 
 # Watchlist endpoints
-@app.route('/api/watchlist', methods=['GET'])
-def api_get_watchlist():
-    """Get user's watchlist"""
-    with sqlite3.connect(Config.DATABASE_PATH) as conn:
+def list_watchlist() -> List[Dict]:
+    """Watchlist entries, most recently added first"""
+    with get_db().connection() as conn:
         cursor = conn.execute("""
             SELECT anime_id, title, image, current_episode, total_episodes, status, added_at
             FROM user_watchlist
@@ -475,64 +1714,175 @@ def api_get_watchlist():
                 'status': row[5],
                 'addedAt': row[6]
             })
-        return jsonify({'watchlist': watchlist, 'total': len(watchlist)})
+        return watchlist
+
+def add_to_watchlist(data: Dict):
+    """Insert or replace a watchlist entry"""
+    with get_db().connection() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO user_watchlist
+            (anime_id, title, image, total_episodes, status)
+            VALUES (?, ?, ?, ?, ?)
+        """, (
+            data['anime_id'],
+            data['title'],
+            data['image'],
+            data.get('total_episodes', 0),
+            data.get('status', 'watching')
+        ))
+
+def remove_from_watchlist(anime_id: str) -> bool:
+    """Delete a watchlist entry; False when it was not there"""
+    with get_db().connection() as conn:
+        cursor = conn.execute("DELETE FROM user_watchlist WHERE anime_id = ?", (anime_id,))
+        return cursor.rowcount > 0
+
+WATCHLIST_REQUIRED_FIELDS = ['anime_id', 'title', 'image']
+
+def watchlist_reply() -> Tuple[int, Dict]:
+    watchlist = list_watchlist()
+    return 200, {'watchlist': watchlist, 'total': len(watchlist)}
+
+def add_watchlist_reply(data) -> Tuple[int, Dict]:
+    """Add a watchlist entry from a request's decoded JSON body (anything, when the body was not an object)"""
+    if not isinstance(data, dict) or not all(field in data for field in WATCHLIST_REQUIRED_FIELDS):
+        return 400, {'error': 'Missing required fields'}
+    try:
+        add_to_watchlist(data)
+        return 200, {'success': True, 'message': 'Added to watchlist'}
+    except Exception as e:
+        logger.error(f"Watchlist add error: {str(e)}")
+        return 500, {'error': 'Failed to add to watchlist'}
+
+def remove_watchlist_reply(anime_id: str) -> Tuple[int, Dict]:
+    try:
+        if remove_from_watchlist(anime_id):
+            return 200, {'success': True, 'message': 'Removed from watchlist'}
+        return 404, {'error': 'Anime not found in watchlist'}
+    except Exception as e:
+        logger.error(f"Watchlist remove error: {str(e)}")
+        return 500, {'error': 'Failed to remove from watchlist'}
+
+@app.route('/api/watchlist', methods=['GET'])
+def api_get_watchlist():
+    """Get user's watchlist"""
+    return json_reply(watchlist_reply())
 
 @app.route('/api/watchlist', methods=['POST'])
 def api_add_to_watchlist():
     """Add anime to watchlist"""
-    data = request.get_json()
-    required_fields = ['anime_id', 'title', 'image']
-    
-    if not all(field in data for field in required_fields):
-        return jsonify({'error': 'Missing required fields'}), 400
-    
-    with sqlite3.connect(Config.DATABASE_PATH) as conn:
-        try:
-            conn.execute("""
-                INSERT OR REPLACE INTO user_watchlist
-                (anime_id, title, image, total_episodes, status)
-                VALUES (?, ?, ?, ?, ?)
-            """, (
-                data['anime_id'],
-                data['title'],
-                data['image'],
-                data.get('total_episodes', 0),
-                data.get('status', 'watching')
-            ))
-            return jsonify({'success': True, 'message': 'Added to watchlist'})
-        except Exception as e:
-            logger.error(f"Watchlist add error: {str(e)}")
-            return jsonify({'error': 'Failed to add to watchlist'}), 500
+    return json_reply(add_watchlist_reply(request.get_json(silent=True)))
 
 @app.route('/api/watchlist/<anime_id>', methods=['DELETE'])
 def api_remove_from_watchlist(anime_id):
     """Remove anime from watchlist"""
-    with sqlite3.connect(Config.DATABASE_PATH) as conn:
-        try:
-            cursor = conn.execute("DELETE FROM user_watchlist WHERE anime_id = ?", (anime_id,))
-            if cursor.rowcount > 0:
-                return jsonify({'success': True, 'message': 'Removed from watchlist'})
-            else:
-                return jsonify({'error': 'Anime not found in watchlist'}), 404
-        except Exception as e:
-            logger.error(f"Watchlist remove error: {str(e)}")
-            return jsonify({'error': 'Failed to remove from watchlist'}), 500
+    return json_reply(remove_watchlist_reply(anime_id))
+
+# Cache warming: lists, watchlist titles and top trending titles refreshed ahead of expiry
+def warm_headroom(upstream: str) -> bool:
+    """Warm only into spare rate limit, so user requests never queue behind warming"""
+    return rate_limiter.bucket(upstream).available() >= Config.WARM_RATE_HEADROOM
+
+cache_warmer = CacheWarmer(WarmBudget(Config.WARM_RATE, Config.WARM_BURST, warm_headroom), tick=Config.WARM_TICK)
+
+def warm_entry(budget: WarmBudget, upstream: str, cache_key: str, table: str, fetch) -> Tuple[Optional[Dict], bool]:
+    """(data, refreshed) for a cache entry, refetched first when it expires within Config.WARM_AHEAD
+    and the budget allows a request to the upstream"""
+    data, expires_at = lookup_cache(cache_key, table)
+    if data is not None and expires_at - time.time() >= Config.WARM_AHEAD:
+        return data, False
+    if not budget.take(upstream):
+        return data, False
+    fresh = coalesced_fetch(cache_key, fetch)
+    return (fresh, True) if fresh else (data, False)
+
+def warm_lists(budget: WarmBudget) -> int:
+    """Refresh the trending and recent-episode lists"""
+    ranked = provider_health.rank(Config.TRENDING_PROVIDERS, 'trending')
+    lists = [(TRENDING_CACHE_KEY, f"consumet:{ranked[0]}" if ranked else 'jikan', fetch_trending),
+             (RECENT_CACHE_KEY, 'consumet:gogoanime', fetch_recent)]
+    return sum(warm_entry(budget, upstream, key, "anime_cache", fetch)[1] for key, upstream, fetch in lists)
+
+def warm_title(budget: WarmBudget, provider: str, anime_id: str, numbers) -> int:
+    """Refresh a title's info, then streaming links for the episode numbers picked by numbers(info)"""
+    info_key = f"info_{provider}_{anime_id}"
+    info, refreshed = warm_entry(budget, f"consumet:{provider}", info_key, "anime_cache",
+                                 lambda: fetch_anime_info_consumet(info_key, anime_id, provider))
+    warmed = int(refreshed)
+    if not info:
+        return warmed
+    for number in numbers(info):
+        episode_id = episode_at(provider, anime_id, number)
+        if not episode_id:
+            continue
+        stream_key = f"stream_{provider}_{episode_id}"
+        _, refreshed = warm_entry(budget, f"consumet:{provider}", stream_key, "streaming_cache",
+                                  lambda: fetch_episode_streaming_links(stream_key, episode_id, provider))
+        warmed += refreshed
+    return warmed
+
+def watchlist_titles() -> List[Tuple[str, str, int]]:
+    """(provider, anime_id, current_episode) for each watchlist entry
+
+    The watchlist stores bare IDs, so the provider is the default one unless
+    the alias map only knows the ID from another provider.
+    """
+    with get_db().connection() as conn:
+        rows = conn.execute("SELECT anime_id, current_episode FROM user_watchlist ORDER BY added_at DESC").fetchall()
+    titles = []
+    for anime_id, current_episode in rows:
+        providers = [p for p in alias_map.providers(anime_id) if p != 'jikan']
+        provider = providers[0] if providers and Config.DEFAULT_PROVIDER not in providers else Config.DEFAULT_PROVIDER
+        titles.append((provider, anime_id, max(current_episode or 1, 1)))
+    return titles
+
+def warm_watchlist(budget: WarmBudget) -> int:
+    """Info and the current and next episodes' streaming links for watchlist titles"""
+    warmed = 0
+    for provider, anime_id, current in watchlist_titles():
+        warmed += warm_title(budget, provider, anime_id,
+                             lambda info, current=current: range(current, current + Config.WARM_EPISODES_AHEAD))
+    return warmed
+
+def warm_trending_titles(budget: WarmBudget) -> int:
+    """Info and latest-episode streaming links for the top trending titles"""
+    data, _ = lookup_cache(TRENDING_CACHE_KEY)
+    titles = [item for item in (data or {}).get('results', []) if item.get('provider') not in (None, 'jikan')]
+    warmed = 0
+    for item in titles[:Config.WARM_TRENDING_TITLES]:
+        warmed += warm_title(budget, item['provider'], str(item.get('id', '')),
+                             lambda info: [info['latestEpisode']] if info.get('latestEpisode') else [])
+    return warmed
+
+cache_warmer.add_job('lists', Config.WARM_LISTS_INTERVAL, warm_lists)
+cache_warmer.add_job('watchlist', Config.WARM_WATCHLIST_INTERVAL, warm_watchlist)
+cache_warmer.add_job('trending_titles', Config.WARM_TRENDING_INTERVAL, warm_trending_titles)
 
 # Health check
 @app.route('/api/health')
 def api_health():
     """Health check endpoint"""
-    return jsonify({
-        'status': 'healthy',
-        'timestamp': datetime.now().isoformat(),
-        'version': '3.0.0'
-    })
+    return jsonify(health_payload(upstream_flight.stats()))
+
+@app.route('/api/cache/stats')
+def api_cache_stats():
+    """Cache tier and maintenance statistics"""
+    return json_reply(cache_stats_reply(upstream_flight.stats()))
+
+# Metrics
+@app.route('/metrics')
+def metrics_endpoint():
+    """Request, upstream, cache and rate-limit metrics in the Prometheus text format"""
+    if not metrics.enabled:
+        return jsonify({'error': 'Endpoint not found'}), 404
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
 
 # Static files
 @app.route('/<path:filename>')
 def serve_static(filename):
-    """Serve static files"""
-    return send_from_directory(app.static_folder, filename)
+    """Serve static files, from memory when small enough"""
+    response = static_response(filename)
+    return response if response is not None else send_from_directory(app.static_folder, filename)
 
 # Error handlers
 @app.errorhandler(404)
@@ -550,10 +1900,68 @@ def internal_error(error):
 def run_app(host='127.0.0.1', port=8000, debug=False):
     """Run the Flask application"""
     init_database()
+    static_assets()
+    cache_maintenance.start()
+    if Config.CACHE_WARMING:
+        cache_warmer.start()
     logger.info(f"Starting AnimeVerse Enhanced Backend on {host}:{port}")
     
     app.run(host=host, port=port, debug=debug, threaded=True)
 
+def prefork_worker_start(slot: int):
+    """Per-process setup in a freshly forked worker"""
+    global database
+    # SQLite connections and HTTP sessions must never cross a fork
+    database = None
+    http_client.close()
+    stream_client.close()
+    rate_limiter.reset()
+    # Each worker publishes its metrics so whichever one is scraped reports the totals
+    metrics.reset()
+    metrics.share(rate_limiter.shared_dir, Config.METRICS_PUBLISH_INTERVAL)
+    # One worker runs maintenance and warming for the shared database
+    if slot == 0:
+        cache_maintenance.start()
+        if Config.CACHE_WARMING:
+            cache_warmer.start()
+
+def prefork_worker_stop(slot: int):
+    """Last words of a drained worker: its final metrics snapshot"""
+    metrics.stop()
+
+def prefork_worker_exit(pid: int):
+    """In the master: fold a reaped worker's metrics into the exited-workers total"""
+    fold_snapshot(rate_limiter.shared_dir, pid)
+
+def run_prefork(host='127.0.0.1', port=8000, workers=None):
+    """Run the threaded server in pre-forked worker processes sharing the cache, rate limits and metrics"""
+    import shutil
+    import tempfile
+    from prefork import PreforkServer
+
+    init_database()
+    get_db().close()
+    static_assets()  # compressed once in the master, shared copy-on-write by the workers
+    shared_dir = Config.RATE_LIMIT_SHARED_DIR or tempfile.mkdtemp(prefix='animeverse-ratelimit-')
+    rate_limiter.shared_dir = shared_dir
+    rate_limiter.reset()
+    clear_snapshots(shared_dir)
+    server = PreforkServer(
+        app, host, port,
+        workers=workers or Config.WORKERS or None,
+        max_requests=Config.WORKER_MAX_REQUESTS,
+        max_requests_jitter=Config.WORKER_MAX_REQUESTS_JITTER,
+        graceful_timeout=Config.WORKER_GRACEFUL_TIMEOUT,
+        on_worker_start=prefork_worker_start,
+        on_worker_stop=prefork_worker_stop,
+        on_worker_exit=prefork_worker_exit
+    )
+    try:
+        server.run()
+    finally:
+        if shared_dir != Config.RATE_LIMIT_SHARED_DIR:
+            shutil.rmtree(shared_dir, ignore_errors=True)
+
 if __name__ == '__main__':
     import argparse
     
@@ -561,6 +1969,30 @@ if __name__ == '__main__':
     parser.add_argument('--host', default='127.0.0.1', help='Host to bind to')
     parser.add_argument('--port', type=int, default=8000, help='Port to bind to')
     parser.add_argument('--debug', action='store_true', help='Enable debug mode')
+    parser.add_argument('--server', choices=['threaded', 'async', 'prefork'], default='threaded',
+                        help='threaded Flask server, the asyncio (ASGI) server, or pre-forked threaded workers')
+    parser.add_argument('--workers', type=int, default=Config.WORKERS,
+                        help='prefork: worker processes (default: one per CPU core)')
+    parser.add_argument('--max-requests', type=int, default=Config.WORKER_MAX_REQUESTS,
+                        help='prefork: recycle a worker after this many requests (0 never)')
+    parser.add_argument('--max-requests-jitter', type=int, default=Config.WORKER_MAX_REQUESTS_JITTER,
+                        help='prefork: up to this many extra requests per worker before recycling')
+    parser.add_argument('--graceful-timeout', type=float, default=Config.WORKER_GRACEFUL_TIMEOUT,
+                        help='prefork: seconds a worker gets to finish requests on reload or shutdown')
+    parser.add_argument('--rate-limit-dir', default=Config.RATE_LIMIT_SHARED_DIR,
+                        help='prefork: directory for the shared rate limit state (default: a temporary one)')
     
     args = parser.parse_args()
-    run_app(args.host, args.port, args.debug)
\ No newline at end of file
+    if args.server == 'async':
+        from asgi import run_async
+        run_async(args.host, args.port, args.debug)
+    elif args.server == 'prefork':
+        if args.debug:
+            parser.error('--debug needs the single-process threaded server')
+        Config.WORKER_MAX_REQUESTS = args.max_requests
+        Config.WORKER_MAX_REQUESTS_JITTER = args.max_requests_jitter
+        Config.WORKER_GRACEFUL_TIMEOUT = args.graceful_timeout
+        Config.RATE_LIMIT_SHARED_DIR = args.rate_limit_dir
+        run_prefork(args.host, args.port, args.workers)
+    else:
+        run_app(args.host, args.port, args.debug)
\ No newline at end of file
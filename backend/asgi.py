@@ -0,0 +1,986 @@
+"""
+Async serving mode
+An ASGI application serving the same API as the Flask app on asyncio: upstream
+calls go through a non-blocking aiohttp client and wait for rate-limit tokens
+with asyncio.sleep, memory-cache hits are answered on the event loop and SQLite
+work runs on a small thread pool. Cache, indexes, aliases, provider health and
+hedge budgets are shared with the threaded mode, and routes that make no
+upstream calls are thin adapters over app.py's shared handlers.
+
+Run with `python app.py --server async` or `uvicorn asgi:application`
+(needs the packages in requirements-async.txt).
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import mimetypes
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Awaitable, BinaryIO, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, quote
+
+try:
+    import aiohttp
+except ImportError:  # optional dependency
+    aiohttp = None
+
+import app as core
+from app import Config
+from compression import compress_body, is_compressible
+from hlsproxy import (RangeNotSatisfiable, PLAYLIST_CONTENT_TYPE, verify, is_playlist, rewrite_playlist,
+                      segment_headers, cached_segment_plan, iter_file)
+from httpcache import validator_headers, not_modified
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from ratelimit import RateLimitExceeded
+from upstream import RETRY_OUTCOMES, status_outcome
+
+logger = logging.getLogger(__name__)
+
+# SQLite reads/writes and index updates run here, off the event loop
+db_executor = ThreadPoolExecutor(max_workers=Config.ASYNC_DB_THREADS, thread_name_prefix='async-db')
+
+# How the current request was served, for X-Cache-Status
+cache_status: contextvars.ContextVar = contextvars.ContextVar('cache_status', default=None)
+# Newest cache entry behind the current request, for Last-Modified
+cache_updated: contextvars.ContextVar = contextvars.ContextVar('cache_updated', default=0)
+
+
+async def blocking(fn: Callable, *args, **kwargs):
+    """Run a blocking call (SQLite, index updates) on the database thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(fn, *args, **kwargs))
+
+
+def note_cache_status(status: str):
+    current = cache_status.get()
+    if current is None or core.CACHE_STATUS_RANK[status] > core.CACHE_STATUS_RANK[current]:
+        cache_status.set(status)
+
+
+def note_cache_time(cached_at: float):
+    if cached_at > cache_updated.get():
+        cache_updated.set(cached_at)
+
+
+async def with_cache_notes(coro):
+    """Await coro in its own task; returns (result, status, updated) for the request's task to note
+
+    Context variables set in a child task stay in the child's copy of the context.
+    """
+    cache_status.set(None)
+    cache_updated.set(0)
+    result = await coro
+    return result, cache_status.get(), cache_updated.get()
+
+
+# Upstream access
+class AsyncUpstream:
+    """aiohttp sessions with keep-alive pools sized like the threaded clients: one for the JSON
+    APIs, one with the stream client's headers for the CDN relay"""
+
+    def __init__(self):
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._loop = None
+
+    def _session(self, name: str, headers: Dict[str, str]):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._sessions = {}
+            self._loop = loop
+        session = self._sessions.get(name)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=0, limit_per_host=Config.HTTP_POOL_MAXSIZE, ttl_dns_cache=300)
+            session = self._sessions[name] = aiohttp.ClientSession(connector=connector, headers=headers)
+        return session
+
+    def session(self):
+        return self._session('api', core.http_client.headers)
+
+    def stream_session(self):
+        return self._session('stream', core.stream_client.headers)
+
+    async def attempt(self, url: str, params: Optional[Dict], timeout: Tuple[float, float],
+                      deadline: float) -> Tuple[Optional[Dict], str]:
+        """Async request_once: one GET with its own rate-limit token; returns (data, outcome)"""
+        remaining = deadline - time.monotonic()
+        try:
+            await rate_limit(url, max(0.0, min(core.rate_limiter.max_wait, remaining)))
+        except RateLimitExceeded as e:
+            logger.error(f"Rate limited {url}: {str(e)}")
+            return None, 'rate_limited'
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logger.error(f"Timeout for {url}")
+            return None, 'timeout'
+        client_timeout = aiohttp.ClientTimeout(total=remaining, sock_connect=timeout[0], sock_read=timeout[1])
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            async with self.session().get(url, params=params, timeout=client_timeout) as response:
+                if response.status != 200:
+                    logger.error(f"HTTP {response.status} for {url}")
+                    outcome = status_outcome(response.status)
+                    return None, outcome
+                data = await response.json(content_type=None, loads=core.json_backend.loads)
+                outcome = 'ok'
+                return data, outcome
+        except asyncio.TimeoutError:
+            logger.error(f"Timeout for {url}")
+            outcome = 'timeout'
+            return None, outcome
+        except Exception as e:
+            logger.error(f"Request failed for {url}: {str(e)}")
+            return None, outcome
+        finally:
+            core.upstream_latency.observe(time.perf_counter() - started, core.upstream_key(url), outcome)
+
+    async def fetch_json(self, url: str, params: Dict = None, timeout=None,
+                         deadline: Optional[float] = None) -> Tuple[Optional[Dict], str]:
+        """Async fetch_json: 5xx and connection errors retried within the deadline, a token per attempt"""
+        deadline = core.request_deadline(deadline)
+        timeout = core.request_timeouts(timeout)
+        for attempt in range(Config.HTTP_MAX_RETRIES + 1):
+            data, outcome = await self.attempt(url, params, timeout, deadline)
+            if outcome not in RETRY_OUTCOMES or attempt == Config.HTTP_MAX_RETRIES:
+                break
+            backoff = Config.HTTP_RETRY_BACKOFF * (2 ** attempt)
+            if time.monotonic() + backoff >= deadline:
+                break
+            await asyncio.sleep(backoff)
+        return data, outcome
+
+    async def get_json(self, url: str, params: Dict = None, timeout=None) -> Optional[Dict]:
+        """GET JSON with the same rate limiting, retries and error handling as make_request"""
+        return (await self.fetch_json(url, params, timeout))[0]
+
+    async def close(self):
+        sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            if not session.closed:
+                await session.close()
+
+
+upstream = AsyncUpstream()
+
+
+async def rate_limit(url: str, max_wait: Optional[float] = None):
+    """Reserve a token from the upstream's bucket and sleep for it without holding a thread"""
+    key = core.upstream_key(url)
+    try:
+        wait = core.rate_limiter.bucket(key).reserve(core.rate_limiter.max_wait if max_wait is None else max_wait)
+    except RateLimitExceeded:
+        core.rate_limit_rejected.inc(key)
+        raise
+    core.rate_limit_wait.observe(wait, key)
+    if wait > 0:
+        await asyncio.sleep(wait)
+
+
+async def provider_request(provider: str, kind: str, url: str, params: Dict = None,
+                           timeout: Optional[float] = None, deadline: Optional[float] = None) -> Optional[Dict]:
+    """Async provider_request: circuit breaker, adaptive timeout, health recording"""
+    if not core.provider_health.allow(provider, kind):
+        logger.warning(f"Circuit open for {provider} {kind}, skipping {url}")
+        return None
+    read_timeout = core.provider_health.timeout(provider, kind, timeout or Config.HTTP_READ_TIMEOUT,
+                                                Config.PROVIDER_TIMEOUT_MULTIPLIER)
+    started = time.monotonic()
+    data, outcome = None, 'error'
+    try:
+        data, outcome = await upstream.fetch_json(url, params, (Config.HTTP_CONNECT_TIMEOUT, read_timeout), deadline)
+    finally:
+        core.record_provider_outcome(provider, kind, time.monotonic() - started, outcome)
+    return data
+
+
+# Cache access
+class AsyncSingleFlight:
+    """One in-flight upstream fetch per cache key; concurrent callers await the same task"""
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, factory: Callable[[], Awaitable]):
+        task = self._tasks.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done, key=key: self._tasks.pop(key, None)
+                                   if self._tasks.get(key) is done else None)
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        # Shielded so one caller going away doesn't cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict:
+        return {'in_flight': len(self._tasks), 'leaders': self.leaders, 'coalesced': self.coalesced}
+
+
+upstream_flight = AsyncSingleFlight()
+revalidating = set()
+
+
+async def lookup_cache(key: str, table: str) -> Tuple[Optional[dict], float]:
+    """Fresh memory-cache hits on the loop; SQLite lookups (and expired memory entries) on the thread pool"""
+    started = time.perf_counter()
+    cached = core.memory_cache.get((table, key))
+    if cached is not None and cached[1] > time.time():
+        core.cache_maintenance.tracker.touch(table, key)
+        core.cache_read_latency.observe(time.perf_counter() - started, table, 'memory')
+    else:
+        # Expired or missing in memory (a miss already counted above): go straight to SQLite
+        cached = await blocking(core.read_cache_from_disk, key, table, cached, started)
+    data, expires_at, cached_at = cached[:3]
+    if data is not None:
+        note_cache_time(cached_at)
+    core.count_cache_lookup(table, data, expires_at)
+    return data, expires_at
+
+
+async def get_from_cache(key: str, table: str = "anime_cache") -> Optional[dict]:
+    data, expires_at = await lookup_cache(key, table)
+    if data is not None and expires_at > time.time():
+        return data
+    return None
+
+
+def schedule_revalidation(cache_key: str, fetch: Callable[[], Awaitable]):
+    """Refresh an expired entry in a background task, at most once at a time per key"""
+    if cache_key in revalidating:
+        return
+    revalidating.add(cache_key)
+
+    async def refresh():
+        try:
+            await upstream_flight.do(cache_key, fetch)
+        except Exception as e:
+            logger.error(f"Revalidation failed for {cache_key}: {str(e)}")
+        finally:
+            revalidating.discard(cache_key)
+
+    asyncio.ensure_future(refresh())
+
+
+async def cached_fetch(cache_key: str, table: str, fetch: Callable[[], Awaitable]) -> Optional[Dict]:
+    """Async cached_fetch: fresh, stale-while-revalidate, coalesced refetch, stale-if-error"""
+    data, expires_at = await lookup_cache(cache_key, table)
+    now = time.time()
+    if data is not None:
+        if now < expires_at:
+            note_cache_status('fresh')
+            return data
+        if now < expires_at + Config.CACHE_STALE_GRACE:
+            schedule_revalidation(cache_key, fetch)
+            note_cache_status('stale')
+            return data
+
+    result = await upstream_flight.do(cache_key, fetch)
+    if not result and data is not None and now < expires_at + Config.CACHE_STALE_IF_ERROR:
+        logger.warning(f"Serving stale {cache_key} after upstream failure")
+        note_cache_status('stale')
+        return data
+    note_cache_status('miss' if data is None else 'revalidated')
+    if result:
+        note_cache_time(time.time())
+    return result
+
+
+# Consumet and Jikan
+async def search_anime_consumet(query: str, provider: str, timeout: Optional[float] = None,
+                                deadline: Optional[float] = None) -> List[Dict]:
+    cache_key = f"search_{provider}_{query.lower()}"
+
+    async def fetch():
+        url = f"{Config.CONSUMET_BASE_URL}/anime/{provider}/{quote(query)}"
+        data = await provider_request(provider, 'search', url, timeout=timeout, deadline=deadline)
+        return await blocking(core.store_search_results, cache_key, provider, data)
+
+    data = await cached_fetch(cache_key, "anime_cache", fetch)
+    return data.get('results', []) if data else []
+
+
+async def get_anime_info_consumet(anime_id: str, provider: str) -> Optional[Dict]:
+    cache_key = f"info_{provider}_{anime_id}"
+
+    async def fetch():
+        url = f"{Config.CONSUMET_BASE_URL}/anime/{provider}/info/{anime_id}"
+        data = await provider_request(provider, 'info', url)
+        return await blocking(core.store_anime_info, cache_key, anime_id, provider, data)
+
+    return await cached_fetch(cache_key, "anime_cache", fetch)
+
+
+async def get_episode_streaming_links(episode_id: str, provider: str) -> Optional[Dict]:
+    cache_key = f"stream_{provider}_{episode_id}"
+
+    async def fetch():
+        url = f"{Config.CONSUMET_BASE_URL}/anime/{provider}/watch/{episode_id}"
+        data = await provider_request(provider, 'watch', url)
+        return await blocking(core.store_streaming_links, cache_key, provider, data)
+
+    return await cached_fetch(cache_key, "streaming_cache", fetch)
+
+
+async def search_jikan_fallback(query: str) -> List[Dict]:
+    cache_key = f"jikan_search_{query.lower()}"
+
+    async def fetch():
+        url = f"{Config.JIKAN_BASE_URL}/anime"
+        params = {'q': query, 'limit': 20, 'order_by': 'score', 'sort': 'desc'}
+        return await blocking(core.store_jikan_search, cache_key, await upstream.get_json(url, params))
+
+    data = await cached_fetch(cache_key, "anime_cache", fetch)
+    return data.get('results', []) if data else []
+
+
+async def get_jikan_anime_info(anime_id: str) -> Optional[Dict]:
+    cache_key = f"jikan_info_{anime_id}"
+
+    async def fetch():
+        data = await upstream.get_json(f"{Config.JIKAN_BASE_URL}/anime/{anime_id}")
+        return await blocking(core.store_jikan_anime_info, cache_key, data)
+
+    return await cached_fetch(cache_key, "anime_cache", fetch)
+
+
+async def search_with_fallback(query: str, min_results: int = None) -> List[Dict]:
+    """Concurrent provider search merged healthiest provider first, like the threaded mode"""
+    if min_results is None:
+        min_results = Config.SEARCH_EARLY_RESULTS
+    providers = core.provider_health.rank(core.provider_priority(), 'search')
+    timeout = Config.SEARCH_PROVIDER_TIMEOUT
+    deadline = time.monotonic() + timeout
+    tasks = {asyncio.ensure_future(with_cache_notes(search_anime_consumet(query, provider, timeout, deadline))): provider
+             for provider in providers}
+
+    results_by_provider = {}
+    collected = 0
+    pending = set(tasks)
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logger.warning(f"Search providers timed out: {', '.join(tasks[t] for t in pending)}")
+            break
+        done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            provider = tasks[task]
+            try:
+                results_by_provider[provider], status, updated = task.result()
+            except Exception as e:
+                logger.error(f"Provider {provider} failed: {str(e)}")
+                continue
+            if status:
+                note_cache_status(status)
+            note_cache_time(updated)
+            collected += len(results_by_provider[provider])
+        if min_results and collected >= min_results:
+            break
+    # Stragglers stop at the search deadline at the latest
+
+    return await blocking(core.merge_provider_results, providers, results_by_provider)
+
+
+async def get_anime_info(anime_id: str, provider: str) -> Optional[Dict]:
+    """Async get_anime_info: fresh cached info (own ID first), then requested provider, then healthiest alias"""
+    candidates = await blocking(core.info_candidates, anime_id, provider)
+    for alias_provider, alias_id in candidates:
+        cached = await get_from_cache(f"info_{alias_provider}_{alias_id}")
+        if cached:
+            note_cache_status('fresh')
+            return cached
+
+    for alias_provider, alias_id in candidates:
+        info = await get_anime_info_consumet(alias_id, alias_provider)
+        if info:
+            return info
+    return None
+
+
+async def hedged_streaming_links(episode_id: str, provider: str) -> Optional[Tuple[Dict, Optional[str], float]]:
+    """One hedged watch attempt: (links, cache status, cache time) on success, None so the hedger tries another"""
+    links, status, updated = await with_cache_notes(get_episode_streaming_links(episode_id, provider))
+    return (links, status, updated) if links else None
+
+
+async def resolve_streaming_links(episode_id: str, provider: str) -> Optional[Dict]:
+    """Streaming links from any provider carrying the episode, healthiest first (hedged if enabled)"""
+    candidates = [(provider, episode_id)] + await blocking(core.episode_alternatives, provider, episode_id)
+    for candidate_provider, candidate_id in candidates:
+        cached = await get_from_cache(f"stream_{candidate_provider}_{candidate_id}", "streaming_cache")
+        if cached:
+            note_cache_status('fresh')
+            return cached
+
+    ranked = core.provider_health.rank(candidates, 'watch', key=lambda c: c[0])
+    tried = set(ranked)
+    if Config.WATCH_HEDGING and len(ranked) > 1:
+        attempts = [(p, lambda p=p, e=e: hedged_streaming_links(e, p)) for p, e in ranked]
+        winner, _ = await core.watch_hedger.run_async(attempts[0], attempts[1:], core.hedge_delay(ranked[0][0]))
+        if winner:
+            links, status, updated = winner
+            if status:
+                note_cache_status(status)
+            note_cache_time(updated)
+            return links
+        note_cache_status('miss')
+    else:
+        for candidate in ranked:
+            links = await get_episode_streaming_links(candidate[1], candidate[0])
+            if links:
+                return links
+
+    # Every known copy failed: load the aliases' info (storing their episode rows) and look again
+    for alias_provider, alias_id in await blocking(core.episode_title_aliases, provider, episode_id):
+        await get_anime_info_consumet(alias_id, alias_provider)
+    for candidate in await blocking(core.episode_alternatives, provider, episode_id):
+        if candidate not in tried:
+            links = await get_episode_streaming_links(candidate[1], candidate[0])
+            if links:
+                return links
+    return None
+
+
+# HTTP layer
+class Request:
+    def __init__(self, scope: Dict, body: bytes):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                        for name, value in scope.get('headers', [])}
+        self.args = {key: values[0] for key, values in
+                     parse_qs(scope.get('query_string', b'').decode('latin-1')).items()}
+        self.body = body
+        self.route = 'unmatched'  # the matched route pattern, for metrics
+
+    def arg(self, name: str, default=None, type: Callable = None):
+        """Like Flask's request.args.get: unparsable values fall back to default"""
+        value = self.args.get(name)
+        if value is None:
+            return default
+        if type is None:
+            return value
+        try:
+            return type(value)
+        except (TypeError, ValueError):
+            return default
+
+    def json(self):
+        try:
+            return core.json_backend.loads(self.body or b'null')
+        except ValueError:
+            return None
+
+
+Response = Tuple[int, object]  # (status, JSON payload)
+
+
+class Streamed:
+    """A handler result sent as is: raw bytes, or chunks from an async iterator as they arrive"""
+
+    def __init__(self, status: int, headers: Dict[str, str], body: Union[bytes, AsyncIterator[bytes]] = b''):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+def conditional_json(request: Request, payload: Dict, max_age: int, body: Optional[bytes] = None) -> Streamed:
+    """JSON with ETag, Last-Modified and Cache-Control; an empty 304 when the client's copy matches
+
+    body, when given, is payload already serialized (a cached entry's bytes) and is sent as is.
+    """
+    if body is None:
+        body = core.encode_json(payload)
+    validators = validator_headers(body, max_age, Config.CACHE_STALE_GRACE, cache_updated.get())
+    if not_modified(request.headers, validators):
+        return Streamed(304, validators)
+    return Streamed(200, dict(validators, **{'Content-Type': 'application/json'}), body)
+
+
+routes: List[Tuple[str, str, re.Pattern, Callable]] = []
+
+
+def route(method: str, pattern: str):
+    """Register a handler; <name> segments match one path segment, like Flask"""
+    regex = re.compile('^' + re.sub(r'<(\w+)>', r'(?P<\1>[^/]+)', pattern) + '$')
+
+    def register(handler):
+        routes.append((method, pattern, regex, handler))
+        return handler
+    return register
+
+
+@route('GET', '/api/search')
+async def api_search(request: Request) -> Response:
+    query = request.arg('q', '').strip()
+    mode = request.arg('source', Config.SEARCH_MODE)
+    error = core.search_request_error(query, mode)
+    if error:
+        return 400, {'error': error}
+
+    try:
+        source = mode
+        if mode == 'local':
+            results = await blocking(core.search_index.search, query)
+        else:
+            results = await search_with_fallback(query)
+
+            if mode == 'merge':
+                results = core.merge_local_results(results, await blocking(core.search_index.search, query))
+
+            if not results:
+                results = await blocking(core.search_index.search, query)
+                source = 'local'
+
+        if not results and mode != 'local':
+            results = await search_jikan_fallback(query)
+            source = 'jikan'
+
+        return conditional_json(request, core.search_payload(results, query, source), Config.HTTP_MAX_AGE)
+    except Exception as e:
+        logger.error(f"Search error: {str(e)}")
+        return 500, {'error': 'Search failed'}
+
+
+@route('GET', '/api/suggest')
+async def api_suggest(request: Request) -> Response:
+    return core.suggest_reply(request.arg)
+
+
+@route('GET', '/api/anime/<provider>/<anime_id>')
+async def api_anime_info(request: Request, provider: str, anime_id: str) -> Response:
+    if not core.known_provider(provider):
+        return core.unknown_provider_reply(provider)
+    try:
+        info = await get_anime_info(anime_id, provider)
+        if not info and provider == 'jikan':
+            info = await get_jikan_anime_info(anime_id)
+        if info:
+            aliases = await blocking(core.alias_list, provider, anime_id)
+            return conditional_json(request, dict(info, aliases=aliases), Config.HTTP_MAX_AGE)
+        return 404, {'error': 'Anime not found'}
+    except Exception as e:
+        logger.error(f"Info error: {str(e)}")
+        return 500, {'error': 'Failed to fetch anime info'}
+
+
+@route('GET', '/api/anime/<provider>/<anime_id>/episodes')
+async def api_anime_episodes(request: Request, provider: str, anime_id: str) -> Response:
+    if not core.known_provider(provider):
+        return core.unknown_provider_reply(provider)
+    offset, limit, after = core.episode_page_params(request.arg)
+
+    try:
+        info = await get_anime_info(anime_id, provider)
+        if info:
+            provider, anime_id = info.get('provider') or provider, info.get('id') or anime_id
+            episodes, total = await blocking(core.get_episodes, provider, anime_id, offset, limit, after)
+        elif provider == 'jikan':
+            episodes, total = [], 0
+        else:
+            return 404, {'error': 'Anime not found'}
+
+        return 200, core.episodes_payload(episodes, total, offset, limit, provider, anime_id)
+    except Exception as e:
+        logger.error(f"Episodes error: {str(e)}")
+        return 500, {'error': 'Failed to fetch episodes'}
+
+
+@route('GET', '/api/watch/<provider>/<episode_id>')
+async def api_watch_episode(request: Request, provider: str, episode_id: str) -> Response:
+    if not core.known_provider(provider):
+        return core.unknown_provider_reply(provider)
+    try:
+        streaming_info = await resolve_streaming_links(episode_id, provider)
+        if streaming_info:
+            # Proxy URLs are signed only for hosts that resolve to public addresses: DNS off the loop
+            return 200, await blocking(core.with_proxy_urls, streaming_info)
+        return 404, {'error': 'Episode not found'}
+    except Exception as e:
+        logger.error(f"Streaming error: {str(e)}")
+        return 500, {'error': 'Failed to fetch streaming links'}
+
+
+async def fetch_trending() -> Optional[Dict]:
+    results, source = [], None
+    for provider in core.provider_health.rank(Config.TRENDING_PROVIDERS, 'trending'):
+        url = f"{Config.CONSUMET_BASE_URL}/anime/{provider}/top-airing"
+        results = core.trending_results(await provider_request(provider, 'trending', url), provider)
+        if results:
+            source = provider
+            break
+
+    if not results:
+        results = core.jikan_trending_results(await upstream.get_json(f"{Config.JIKAN_BASE_URL}/seasons/now"))
+    return await blocking(core.store_trending, results, source)
+
+
+async def fetch_recent() -> Optional[Dict]:
+    data = await upstream.get_json(f"{Config.CONSUMET_BASE_URL}/anime/gogoanime/recent-episodes")
+    return await blocking(core.store_recent, data)
+
+
+@route('GET', '/api/trending')
+async def api_trending(request: Request) -> Response:
+    try:
+        data = await cached_fetch(core.TRENDING_CACHE_KEY, "anime_cache", fetch_trending)
+        return conditional_json(request, data or {'results': [], 'total': 0}, Config.HTTP_MAX_AGE_LISTS,
+                                core.cached_body(data, core.TRENDING_CACHE_KEY))
+    except Exception as e:
+        logger.error(f"Trending error: {str(e)}")
+        return 500, {'error': 'Failed to fetch trending anime'}
+
+
+@route('GET', '/api/recent')
+async def api_recent(request: Request) -> Response:
+    try:
+        data = await cached_fetch(core.RECENT_CACHE_KEY, "anime_cache", fetch_recent)
+        return conditional_json(request, data or {'results': [], 'total': 0}, Config.HTTP_MAX_AGE_LISTS,
+                                core.cached_body(data, core.RECENT_CACHE_KEY))
+    except Exception as e:
+        logger.error(f"Recent episodes error: {str(e)}")
+        return 500, {'error': 'Failed to fetch recent episodes'}
+
+
+@route('GET', '/api/watchlist')
+async def api_get_watchlist(request: Request) -> Response:
+    return await blocking(core.watchlist_reply)
+
+
+@route('POST', '/api/watchlist')
+async def api_add_to_watchlist(request: Request) -> Response:
+    return await blocking(core.add_watchlist_reply, request.json())
+
+
+@route('DELETE', '/api/watchlist/<anime_id>')
+async def api_remove_from_watchlist(request: Request, anime_id: str) -> Response:
+    return await blocking(core.remove_watchlist_reply, anime_id)
+
+
+@route('GET', '/api/health')
+async def api_health(request: Request) -> Response:
+    payload = await blocking(core.health_payload, upstream_flight.stats())
+    return 200, dict(payload, server='async')
+
+
+@route('GET', '/api/cache/stats')
+async def api_cache_stats(request: Request) -> Response:
+    return await blocking(core.cache_stats_reply, upstream_flight.stats())
+
+
+@route('GET', '/metrics')
+async def metrics_endpoint(request: Request) -> Response:
+    if not core.metrics.enabled:
+        return 404, {'error': 'Endpoint not found'}
+    text = await blocking(core.metrics.render)
+    return Streamed(200, {'Content-Type': METRICS_CONTENT_TYPE}, text.encode('utf-8'))
+
+
+async def iter_disk_file(f, start: int, length: Optional[int]) -> AsyncIterator[bytes]:
+    """Chunks of an open file (a cached segment, a large static file), read on the thread pool"""
+    chunks = iter_file(f, start, length, Config.STREAM_CHUNK_SIZE)
+    try:
+        while True:
+            chunk = await blocking(next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        await blocking(chunks.close)
+
+
+async def open_stream(url: str, referer: str, range_header: Optional[str]):
+    """Async open_stream: the aiohttp response of a CDN GET, None when the request failed outright"""
+    timeout = aiohttp.ClientTimeout(sock_connect=Config.HTTP_CONNECT_TIMEOUT, sock_read=Config.STREAM_READ_TIMEOUT)
+    started = time.perf_counter()
+    try:
+        response = await upstream.stream_session().get(
+            url, headers=core.stream_request_headers(referer, range_header), timeout=timeout)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"Stream proxy error for {url}: {str(e)}")
+        core.upstream_latency.observe(time.perf_counter() - started, 'stream', 'error')
+        return None
+    core.upstream_latency.observe(time.perf_counter() - started, 'stream',
+                                  'ok' if response.status in (200, 206) else status_outcome(response.status))
+    return response
+
+
+segment_flight = AsyncSingleFlight()
+
+
+async def fetch_whole_segment(url: str, referer: str) -> bool:
+    """Async fetch_whole_segment: download a segment without Range into the disk cache"""
+    response = await open_stream(url, referer, None)
+    if response is None:
+        return False
+    try:
+        if response.status != 200 or is_playlist(url, response.headers.get('Content-Type', '')):
+            return False
+        length = response.headers.get('Content-Length', '')
+        writer = await blocking(core.segment_cache().writer, url, int(length) if length.isdigit() else None)
+        if writer is None:
+            return False
+        completed = False
+        try:
+            async for chunk in response.content.iter_chunked(Config.STREAM_CHUNK_SIZE):
+                await blocking(writer.write, chunk)
+            completed = True
+        finally:
+            await blocking(writer.commit if completed else writer.abort)
+        return True
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"Stream proxy error for {url}: {str(e)}")
+        return False
+    finally:
+        response.release()
+
+
+async def cache_whole_segment(url: str, referer: str):
+    """Async cache_whole_segment: (open file, size) of a segment fetched whole, None when it can't be cached"""
+    try:
+        fetched = await asyncio.wait_for(segment_flight.do(url, lambda: fetch_whole_segment(url, referer)),
+                                         Config.STREAM_READ_TIMEOUT)
+    except asyncio.TimeoutError:
+        return None
+    return await blocking(core.segment_cache().lookup, url) if fetched else None
+
+
+async def relay_segment(url: str, response) -> Streamed:
+    """Relay an upstream segment in chunks, teeing full bodies into the disk cache"""
+    writer = None
+    if response.status == 200:
+        length = response.headers.get('Content-Length', '')
+        writer = await blocking(core.segment_cache().writer, url, int(length) if length.isdigit() else None)
+
+    async def relay():
+        completed = False
+        try:
+            async for chunk in response.content.iter_chunked(Config.STREAM_CHUNK_SIZE):
+                if writer:
+                    await blocking(writer.write, chunk)
+                yield chunk
+            completed = True
+        finally:
+            response.release()
+            if writer:
+                await blocking(writer.commit if completed else writer.abort)
+
+    note_cache_status('miss')
+    return Streamed(response.status, segment_headers(url, response.headers), relay())
+
+
+@route('GET', '/api/stream')
+async def api_stream(request: Request):
+    url = request.arg('u', '')
+    referer = request.arg('r', '')
+    if not url.startswith(('http://', 'https://')) or \
+            not verify(core.stream_secret(), url, referer, request.arg('s', '')):
+        return 403, {'error': 'Invalid stream URL'}
+    if not await blocking(core.stream_host_allowed, url):
+        logger.warning(f"Refusing to proxy non-public host: {url}")
+        return 403, {'error': 'Invalid stream URL'}
+
+    playlist = is_playlist(url)
+    range_header = None if playlist else request.headers.get('range')
+    if not playlist:
+        cached = await blocking(core.segment_cache().lookup, url)
+        if cached is None and range_header:
+            cached = await cache_whole_segment(url, referer)
+            if cached:
+                note_cache_status('miss')
+        if cached:
+            f, size = cached
+            try:
+                status, headers, start, length = cached_segment_plan(url, size, range_header)
+            except RangeNotSatisfiable:
+                f.close()
+                return Streamed(416, {'Content-Range': f"bytes */{size}"})
+            note_cache_status('fresh')
+            return Streamed(status, headers, iter_disk_file(f, start, length))
+
+    # Playlists, whole-segment misses and ranges that could not be cached are relayed as they arrive
+    response = await open_stream(url, referer, range_header)
+    if response is None:
+        return 502, {'error': 'Stream unavailable'}
+    if response.status not in (200, 206):
+        response.release()
+        logger.error(f"HTTP {response.status} for stream {url}")
+        status = response.status if response.status in (403, 404, 416) else 502
+        return status, {'error': f"Upstream returned HTTP {response.status}"}
+
+    if playlist or is_playlist(url, response.headers.get('Content-Type', '')):
+        try:
+            text = await response.text()
+        finally:
+            response.release()
+        # Signing checks each URI's host, so the rewrite runs off the loop
+        body = await blocking(rewrite_playlist, text, str(response.url),
+                              lambda target: core.stream_proxy_url(target, referer))
+        return Streamed(200, {'Content-Type': PLAYLIST_CONTENT_TYPE, 'Cache-Control': 'no-cache',
+                              'X-Content-Type-Options': 'nosniff'}, body.encode('utf-8'))
+    return await relay_segment(url, response)
+
+
+def open_static(path: str) -> Optional[Tuple[BinaryIO, int]]:
+    """(open file, size) for a file under the static folder, None outside it or when missing"""
+    root = os.path.realpath(core.STATIC_DIR)
+    full = os.path.realpath(os.path.join(root, path))
+    if not full.startswith(root + os.sep) or not os.path.isfile(full):
+        return None
+    f = open(full, 'rb')
+    return f, os.fstat(f.fileno()).st_size
+
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-headers', b'Content-Type,Authorization'),
+    (b'access-control-allow-methods', b'GET,PUT,POST,DELETE'),
+]
+
+
+def compressed(request: Request, headers: List[Tuple[bytes, bytes]], body: bytes):
+    """(headers, body) with a large API body compressed, like the threaded mode's after_request hook"""
+    content_type = dict(headers).get(b'content-type', b'').decode('latin-1')
+    if any(name == b'content-encoding' for name, _ in headers) or len(body) < Config.COMPRESS_MIN_BYTES \
+            or not is_compressible(content_type):
+        return headers, body
+    headers = headers + [(b'vary', b'Accept-Encoding')]
+    result = compress_body(body, content_type, request.headers.get('accept-encoding'), Config.COMPRESS_MIN_BYTES,
+                           Config.COMPRESS_GZIP_LEVEL, Config.COMPRESS_BROTLI_QUALITY)
+    if result is None:
+        return headers, body
+    coding, body = result
+    headers = [(name, b'W/' + value if name == b'etag' and not value.startswith(b'W/') else value)
+               for name, value in headers]
+    return headers + [(b'content-encoding', coding.encode())], body
+
+
+async def dispatch(request: Request) -> Tuple[int, List[Tuple[bytes, bytes]], Union[bytes, AsyncIterator[bytes]]]:
+    """Route a request to its handler; returns (status, headers, body)"""
+    path_matched = False
+    for method, pattern, regex, handler in routes:
+        match = regex.match(request.path)
+        if not match:
+            continue
+        path_matched = True
+        if method != request.method:
+            continue
+        request.route = pattern
+        result = await handler(request, **match.groupdict())
+        if isinstance(result, Streamed):
+            status, body = result.status, result.body
+            headers = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                       for name, value in result.headers.items()]
+        else:
+            status, payload = result
+            headers = [(b'content-type', b'application/json')]
+            body = core.encode_json(payload)
+        status_header = cache_status.get()
+        if status_header:
+            headers.append((b'x-cache-status', status_header.encode()))
+        if status == 200 and isinstance(body, bytes) and request.path.startswith('/api/'):
+            headers, body = compressed(request, headers, body)
+        return status, headers, body
+
+    if request.method == 'OPTIONS':
+        return 200, [], b''
+    if path_matched:
+        return 405, [(b'content-type', b'application/json')], core.json_backend.dumps({'error': 'Method not allowed'})
+    if request.method == 'GET' and not request.path.startswith('/api/'):
+        reply = core.static_assets().respond(request.path.lstrip('/') or 'index.html', request.headers)
+        if reply is not None:
+            status, headers, body = reply
+            return status, [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                            for name, value in headers.items()], body
+        # Too large to hold in memory: stream it from disk
+        opened = await blocking(open_static, request.path.lstrip('/') or 'index.html')
+        if opened is not None:
+            f, size = opened
+            content_type = mimetypes.guess_type(request.path)[0] if request.path != '/' else 'text/html'
+            return 200, [(b'content-type', (content_type or 'application/octet-stream').encode()),
+                         (b'content-length', str(size).encode())], iter_disk_file(f, 0, None)
+    return 404, [(b'content-type', b'application/json')], core.json_backend.dumps({'error': 'Endpoint not found'})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                await blocking(core.init_database)
+                await blocking(core.static_assets)
+                core.cache_maintenance.start()
+                if Config.CACHE_WARMING:
+                    core.cache_warmer.start()
+                await send({'type': 'lifespan.startup.complete'})
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+        elif message['type'] == 'lifespan.shutdown':
+            core.cache_maintenance.stop()
+            core.cache_warmer.stop()
+            await upstream.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+
+    cache_status.set(None)
+    cache_updated.set(0)
+    started = time.perf_counter()
+    request = Request(scope, body)
+    try:
+        status, headers, payload = await dispatch(request)
+    except Exception as e:
+        logger.error(f"Internal error: {str(e)}")
+        status, headers = 500, [(b'content-type', b'application/json')]
+        payload = core.json_backend.dumps({'error': 'Internal server error'})
+    core.request_latency.observe(time.perf_counter() - started, request.method, request.route, str(status))
+
+    if isinstance(payload, bytes):
+        headers = headers + CORS_HEADERS
+        if status != 304:
+            headers.append((b'content-length', str(len(payload)).encode()))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': payload})
+        return
+
+    # Streamed body: relay chunks as they arrive, always closing the source
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers + CORS_HEADERS})
+    try:
+        async for chunk in payload:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        await payload.aclose()
+
+
+def run_async(host='127.0.0.1', port=8000, debug=False):
+    """Serve the ASGI application with uvicorn"""
+    try:
+        import uvicorn
+    except ImportError:
+        uvicorn = None
+    if uvicorn is None or aiohttp is None:
+        raise SystemExit("Async mode needs uvicorn and aiohttp: pip install -r backend/requirements-async.txt")
+    logger.info(f"Starting AnimeVerse async backend on {host}:{port}")
+    uvicorn.run(application, host=host, port=port, log_level='debug' if debug else 'info', lifespan='on')
@@ -0,0 +1,89 @@
+"""
+Payload codecs for cached API responses
+Codecs turn the UTF-8 JSON bytes of a response into the value stored in SQLite and back.
+The codec name is stored per row so rows written with an older codec stay readable.
+"""
+
+import threading
+import zlib
+from typing import Dict, Union
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+Blob = Union[str, bytes]
+
+
+class JSONCodec:
+    """Plain JSON text, stored as-is"""
+    name = 'json'
+
+    def encode(self, data: bytes) -> Blob:
+        return data.decode('utf-8')
+
+    def decode(self, blob: Blob) -> bytes:
+        return blob.encode('utf-8') if isinstance(blob, str) else blob
+
+
+class ZlibCodec:
+    """zlib-compressed UTF-8 JSON (stdlib)"""
+    name = 'zlib'
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def encode(self, data: bytes) -> Blob:
+        return zlib.compress(data, self.level)
+
+    def decode(self, blob: Blob) -> bytes:
+        return zlib.decompress(blob)
+
+
+class ZstdCodec:
+    """zstd-compressed UTF-8 JSON (requires the zstandard package)"""
+    name = 'zstd'
+
+    def __init__(self, level: int = 3):
+        self.level = level
+        self._local = threading.local()  # zstd contexts are not thread-safe
+
+    def _contexts(self):
+        local = self._local
+        if not hasattr(local, 'compressor'):
+            local.compressor = zstandard.ZstdCompressor(level=self.level)
+            local.decompressor = zstandard.ZstdDecompressor()
+        return local.compressor, local.decompressor
+
+    def encode(self, data: bytes) -> Blob:
+        return self._contexts()[0].compress(data)
+
+    def decode(self, blob: Blob) -> bytes:
+        return self._contexts()[1].decompress(blob)
+
+
+CODECS: Dict[str, object] = {'json': JSONCodec(), 'zlib': ZlibCodec()}
+if zstandard is not None:
+    CODECS['zstd'] = ZstdCodec()
+
+
+def get_codec(name: str):
+    """Codec by name; 'auto' picks zstd when installed, otherwise zlib"""
+    if name == 'auto':
+        return CODECS.get('zstd') or CODECS['zlib']
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown cache codec: {name}")
+
+
+def encode_payload(data: bytes, codec_name: str = 'auto', min_bytes: int = 0):
+    """Encode JSON bytes, leaving payloads under min_bytes uncompressed; returns (codec name, blob)"""
+    codec = CODECS['json'] if len(data) < min_bytes else get_codec(codec_name)
+    return codec.name, codec.encode(data)
+
+
+def decode_payload(blob: Blob, codec_name: str = 'json') -> bytes:
+    """JSON bytes of a stored payload (rows without a codec are plain JSON)"""
+    return get_codec(codec_name or 'json').decode(blob)
@@ -0,0 +1,234 @@
+"""
+Response compression and precompressed static assets
+API bodies above a size threshold are compressed per request with the best
+coding the client accepts (brotli when installed, else gzip). Static files are
+read and compressed once, at their highest levels, and served from memory;
+the pages' references to them are rewritten to content-hashed URLs that can
+be cached as immutable.
+"""
+
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+from httpcache import etag_matches
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/manifest+json',
+                      'application/xml', 'image/svg+xml')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'  # unhashed URLs: revalidate with the ETag every time
+REFERENCE_RE = re.compile(r'((?:src|href)=")([^"#?]+)(")')
+
+mimetypes.add_type('application/manifest+json', '.webmanifest')
+mimetypes.add_type('application/javascript', '.js')
+
+
+def available_encodings() -> List[str]:
+    """Content codings this process can produce, preferred first"""
+    return (['br'] if brotli is not None else []) + ['gzip']
+
+
+def negotiate(accept_encoding: Optional[str], offered: Iterable[str]) -> Optional[str]:
+    """The offered coding the client accepts with the highest q-value (offer order breaks ties),
+    None for identity"""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for coding in offered:
+        q = weights.get(coding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body: bytes, coding: str, level: Optional[int] = None) -> bytes:
+    """gzip (level 1-9, default 6) or br (quality 0-11, default 5)"""
+    if coding == 'br':
+        return brotli.compress(body, quality=5 if level is None else level)
+    return gzip.compress(body, compresslevel=6 if level is None else level, mtime=0)
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    return bool(content_type) and content_type.split(';')[0].strip().startswith(COMPRESSIBLE_TYPES)
+
+
+def compress_body(body: bytes, content_type: Optional[str], accept_encoding: Optional[str],
+                      min_bytes: int, gzip_level: int = 6, brotli_quality: int = 5) -> Optional[Tuple[str, bytes]]:
+    """(coding, compressed body) for a response worth compressing, else None"""
+    if len(body) < min_bytes or not is_compressible(content_type):
+        return None
+    coding = negotiate(accept_encoding, available_encodings())
+    if coding is None:
+        return None
+    compressed = compress(body, coding, brotli_quality if coding == 'br' else gzip_level)
+    return (coding, compressed) if len(compressed) < len(body) else None
+
+
+def hashed_name(path: str, digest: str) -> str:
+    """'assets/hls.min.js' -> 'assets/hls.min.<digest>.js'"""
+    base, ext = os.path.splitext(path)
+    return f"{base}.{digest}{ext}"
+
+
+class Asset:
+    """One static file held in memory with its precompressed variants"""
+
+    def __init__(self, path: str, body: bytes, content_type: str):
+        self.path = path
+        self.content_type = content_type
+        self.digest = hashlib.sha256(body).hexdigest()[:12]
+        self.variants: Dict[Optional[str], bytes] = {None: body}
+        self.etags: Dict[Optional[str], str] = {}
+
+    def add_variant(self, coding: str, body: bytes):
+        # Only keep codings that actually shrink the file
+        if len(body) < len(self.variants[None]):
+            self.variants[coding] = body
+
+    def seal(self):
+        # A strong ETag per representation: each coding is a different byte sequence
+        for coding in self.variants:
+            suffix = f"-{coding}" if coding else ''
+            self.etags[coding] = f'"{self.digest}{suffix}"'
+
+    @property
+    def url_path(self) -> str:
+        return hashed_name(self.path, self.digest)
+
+
+class StaticAssets:
+    """Static files loaded, compressed and content-hashed once, served from memory
+
+    Files larger than max_file_bytes are left to the framework's file serving
+    (sendfile where available). HTML files have their src/href references to
+    other assets rewritten to the hashed URLs before they are compressed.
+    """
+
+    def __init__(self, root: str, max_file_bytes: int = 4 * 1024 * 1024,
+                 gzip_level: int = 9, brotli_quality: int = 11):
+        self.root = os.path.realpath(root)
+        self.max_file_bytes = max_file_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._assets: Dict[str, Asset] = {}  # by relative path
+        self._hashed: Dict[str, Asset] = {}  # by hashed URL path
+        self._lock = threading.Lock()
+        self.served = 0
+        self.bytes_sent = 0
+
+    def build(self) -> int:
+        """Load and compress every file under root; returns how many were loaded"""
+        assets = {}
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                full = os.path.join(directory, name)
+                if os.path.getsize(full) > self.max_file_bytes:
+                    continue
+                path = os.path.relpath(full, self.root).replace(os.sep, '/')
+                with open(full, 'rb') as f:
+                    body = f.read()
+                content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+                assets[path] = Asset(path, body, content_type)
+
+        # Pages are rewritten after every other asset has its digest
+        for asset in assets.values():
+            if asset.content_type == 'text/html':
+                body = self._rewrite(asset, assets)
+                assets[asset.path] = Asset(asset.path, body, asset.content_type)
+
+        for asset in assets.values():
+            if is_compressible(asset.content_type):
+                body = asset.variants[None]
+                for coding in available_encodings():
+                    level = self.brotli_quality if coding == 'br' else self.gzip_level
+                    asset.add_variant(coding, compress(body, coding, level))
+            asset.seal()
+
+        with self._lock:
+            self._assets = assets
+            self._hashed = {asset.url_path: asset for asset in assets.values()}
+        logger.info(f"Static assets ready: {len(assets)} files, "
+                    f"{sum(len(a.variants[None]) for a in assets.values())} bytes")
+        return len(assets)
+
+    def _rewrite(self, page: Asset, assets: Dict[str, Asset]) -> bytes:
+        base = os.path.dirname(page.path)
+
+        def replace(match):
+            reference = match.group(2)
+            if '://' in reference or reference.startswith(('/', 'data:')):
+                return match.group(0)
+            target = assets.get(os.path.normpath(os.path.join(base, reference)).replace(os.sep, '/'))
+            if target is None or target.content_type == 'text/html':
+                return match.group(0)
+            return match.group(1) + hashed_name(reference, target.digest) + match.group(3)
+
+        text = page.variants[None].decode('utf-8')
+        return REFERENCE_RE.sub(replace, text).encode('utf-8')
+
+    def lookup(self, path: str) -> Tuple[Optional[Asset], bool]:
+        """(asset, hashed) for a URL path; hashed URLs may be cached forever"""
+        with self._lock:
+            asset = self._hashed.get(path)
+            if asset is not None:
+                return asset, True
+            return self._assets.get(path), False
+
+    def respond(self, path: str, request_headers: Mapping[str, str]) -> Optional[Tuple[int, Dict[str, str], bytes]]:
+        """(status, headers, body) for a static path, None when it is not held in memory
+
+        request_headers is looked up with lower-case names.
+        """
+        asset, hashed = self.lookup(path)
+        if asset is None:
+            return None
+        coding = negotiate(request_headers.get('accept-encoding'), [c for c in asset.variants if c])
+        etag = asset.etags[coding]
+        headers = {'Content-Type': asset.content_type, 'ETag': etag, 'Vary': 'Accept-Encoding',
+                   'Cache-Control': IMMUTABLE if hashed else REVALIDATE}
+        if coding:
+            headers['Content-Encoding'] = coding
+        if_none_match = request_headers.get('if-none-match')
+        if if_none_match and etag_matches(if_none_match, etag):
+            return 304, headers, b''
+        body = asset.variants[coding]
+        with self._lock:
+            self.served += 1
+            self.bytes_sent += len(body)
+        return 200, headers, body
+
+    def stats(self) -> Dict:
+        with self._lock:
+            assets = list(self._assets.values())
+            return {
+                'files': len(assets),
+                'bytes': sum(len(a.variants[None]) for a in assets),
+                'compressed_bytes': {coding: sum(len(a.variants.get(coding, a.variants[None])) for a in assets)
+                                     for coding in available_encodings()},
+                'served': self.served,
+                'bytes_sent': self.bytes_sent,
+            }
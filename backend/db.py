@@ -0,0 +1,110 @@
+"""
+SQLite access layer for the cache and watchlist database
+Pooled connections opened once with WAL journaling and tuned pragmas.
+Reusing connections also reuses sqlite3's per-connection prepared statement cache.
+"""
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+
+class Database:
+    """Pool of long-lived SQLite connections shared by request threads"""
+
+    def __init__(self, path: str, pool_size: int = 8, busy_timeout: float = 5.0,
+                 cache_size_kb: int = 16384, mmap_size: int = 64 * 1024 * 1024,
+                 synchronous: str = 'NORMAL', cached_statements: int = 256):
+        self.path = path
+        self.pool_size = pool_size
+        self.busy_timeout = busy_timeout
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.synchronous = synchronous
+        self.cached_statements = cached_statements
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0
+        self.opened = 0
+        self.checkouts = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def _checkout(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        conn = self._connect()
+        with self._lock:
+            self._open += 1
+            self.opened += 1
+        return conn
+
+    def _checkin(self, conn: sqlite3.Connection):
+        # Connections beyond the pool size are overflow and get closed
+        if self._idle.qsize() < self.pool_size:
+            self._idle.put(conn)
+            return
+        conn.close()
+        with self._lock:
+            self._open -= 1
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection for one transaction (commit on success, rollback on error)"""
+        conn = self._checkout()
+        with self._lock:
+            self.checkouts += 1
+        healthy = True
+        try:
+            with conn:
+                yield conn
+        except sqlite3.ProgrammingError:
+            # Connection is unusable; drop it instead of returning it to the pool
+            healthy = False
+            raise
+        finally:
+            if healthy:
+                self._checkin(conn)
+            else:
+                conn.close()
+                with self._lock:
+                    self._open -= 1
+
+    def close(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._open -= 1
+
+    def stats(self) -> Dict:
+        """Pool usage counters"""
+        with self._lock:
+            return {
+                'path': self.path,
+                'open': self._open,
+                'idle': self._idle.qsize(),
+                'opened': self.opened,
+                'checkouts': self.checkouts,
+            }
@@ -0,0 +1,183 @@
+"""
+Provider health tracking and circuit breakers
+Rolling latency percentiles and error rates are kept per (provider, endpoint kind);
+a breaker opens after repeated failures, rejects calls for a cool-down and then
+lets a limited number of half-open probes decide whether to close again.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Routing preference by breaker state
+STATE_RANK = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (q in 0..100) of unsorted values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class _Endpoint:
+    """Samples and breaker state for one (provider, kind)"""
+
+    def __init__(self, window: int):
+        self.samples = deque(maxlen=window)  # (latency seconds, ok)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+        self.opens = 0
+        self.rejected = 0
+
+    def latencies(self) -> List[float]:
+        return [latency for latency, ok in self.samples if ok]
+
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+
+class ProviderHealth:
+    """Per-provider, per-endpoint health with circuit breakers and health-ordered routing"""
+
+    def __init__(self, window: int = 50, failure_threshold: int = 5, error_rate: float = 0.5,
+                 min_samples: int = 10, open_seconds: float = 30, half_open_probes: int = 1,
+                 unknown_latency: float = 2.0, clock: Callable[[], float] = time.monotonic):
+        self.window = window
+        self.failure_threshold = failure_threshold  # consecutive failures that open the breaker
+        self.error_rate = error_rate  # windowed error rate that opens it, once min_samples are in
+        self.min_samples = min_samples
+        self.open_seconds = open_seconds  # cool-down before half-open probing
+        self.half_open_probes = half_open_probes  # concurrent probes allowed while half-open
+        self.unknown_latency = unknown_latency  # assumed latency for providers with no samples
+        self._clock = clock
+        self._endpoints: Dict[Tuple[str, Hashable], _Endpoint] = {}
+        self._lock = threading.Lock()
+
+    def _endpoint(self, provider: str, kind: Hashable) -> _Endpoint:
+        endpoint = self._endpoints.get((provider, kind))
+        if endpoint is None:
+            endpoint = self._endpoints[(provider, kind)] = _Endpoint(self.window)
+        return endpoint
+
+    def _refresh(self, endpoint: _Endpoint):
+        """Move an open breaker to half-open once its cool-down has passed (lock held)"""
+        if endpoint.state == OPEN and self._clock() - endpoint.opened_at >= self.open_seconds:
+            endpoint.state = HALF_OPEN
+            endpoint.probes = 0
+
+    def _open(self, endpoint: _Endpoint):
+        endpoint.state = OPEN
+        endpoint.opened_at = self._clock()
+        endpoint.probes = 0
+        endpoint.opens += 1
+
+    def state(self, provider: str, kind: Hashable) -> str:
+        with self._lock:
+            endpoint = self._endpoint(provider, kind)
+            self._refresh(endpoint)
+            return endpoint.state
+
+    def allow(self, provider: str, kind: Hashable) -> bool:
+        """Whether a call may go out now; a half-open breaker hands out probe slots"""
+        with self._lock:
+            endpoint = self._endpoint(provider, kind)
+            self._refresh(endpoint)
+            if endpoint.state == CLOSED:
+                return True
+            if endpoint.state == HALF_OPEN and endpoint.probes < self.half_open_probes:
+                endpoint.probes += 1
+                return True
+            endpoint.rejected += 1
+            return False
+
+    def release(self, provider: str, kind: Hashable):
+        """Hand back a half-open probe slot taken by a call that never reached the provider"""
+        with self._lock:
+            endpoint = self._endpoint(provider, kind)
+            if endpoint.state == HALF_OPEN and endpoint.probes > 0:
+                endpoint.probes -= 1
+
+    def record(self, provider: str, kind: Hashable, latency: float, ok: bool):
+        """Record one call's outcome and update the breaker"""
+        with self._lock:
+            endpoint = self._endpoint(provider, kind)
+            endpoint.samples.append((latency, ok))
+            if ok:
+                endpoint.consecutive_failures = 0
+                if endpoint.state == HALF_OPEN:
+                    endpoint.state = CLOSED
+                    endpoint.samples.clear()
+                    endpoint.samples.append((latency, ok))
+                return
+            endpoint.consecutive_failures += 1
+            if endpoint.state == HALF_OPEN:
+                self._open(endpoint)
+            elif endpoint.state == CLOSED and (
+                endpoint.consecutive_failures >= self.failure_threshold or
+                (len(endpoint.samples) >= self.min_samples and endpoint.error_rate() >= self.error_rate)
+            ):
+                self._open(endpoint)
+
+    def latency(self, provider: str, kind: Hashable, q: float = 50) -> Optional[float]:
+        """Latency percentile of successful calls, None without samples"""
+        with self._lock:
+            return percentile(self._endpoint(provider, kind).latencies(), q)
+
+    def timeout(self, provider: str, kind: Hashable, default: float,
+                multiplier: float = 3.0, floor: float = 1.0) -> float:
+        """Read timeout scaled from observed p99 latency, capped at default"""
+        with self._lock:
+            latencies = self._endpoint(provider, kind).latencies()
+        if len(latencies) < self.min_samples:
+            return default
+        return min(default, max(floor, percentile(latencies, 99) * multiplier))
+
+    def score(self, provider: str, kind: Hashable) -> Tuple[int, float]:
+        """Sort key: breaker state, then p75 latency inflated by the error rate"""
+        with self._lock:
+            endpoint = self._endpoint(provider, kind)
+            self._refresh(endpoint)
+            p75 = percentile(endpoint.latencies(), 75)
+            expected = self.unknown_latency if p75 is None else p75
+            failure = min(endpoint.error_rate(), 0.99)
+            return STATE_RANK[endpoint.state], expected / (1.0 - failure)
+
+    def rank(self, providers: Iterable, kind: Hashable, key: Callable = None) -> List:
+        """Providers (or items mapped to one by key) healthiest first; ties keep their order"""
+        key = key or (lambda item: item)
+        return sorted(providers, key=lambda item: self.score(key(item), kind))
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            report: Dict[str, Dict] = {}
+            for (provider, kind), endpoint in sorted(self._endpoints.items(), key=lambda item: str(item[0])):
+                self._refresh(endpoint)
+                latencies = endpoint.latencies()
+                report.setdefault(provider, {})[str(kind)] = {
+                    'state': endpoint.state,
+                    'samples': len(endpoint.samples),
+                    'error_rate': round(endpoint.error_rate(), 3),
+                    'p50': percentile(latencies, 50),
+                    'p90': percentile(latencies, 90),
+                    'p99': percentile(latencies, 99),
+                    'opens': endpoint.opens,
+                    'rejected': endpoint.rejected,
+                }
+            return report
@@ -0,0 +1,165 @@
+"""
+Hedged requests
+The primary call gets a head start; if it has not produced a usable result
+within the hedge delay, one backup call goes out to the next candidate and the
+first usable result wins. Backups are capped per provider by a token bucket.
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, Executor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ratelimit import RateLimitExceeded, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+Attempt = Tuple[str, Callable[[], Any]]  # (provider, call returning a result or None)
+
+
+class Hedger:
+    """Primary-plus-one-backup racing with per-provider hedge budgets and win metrics"""
+
+    def __init__(self, executor: Executor, budget_config: Callable[[str], Tuple[float, float]],
+                 can_send: Optional[Callable[[str], bool]] = None):
+        self._executor = executor
+        self._budget_config = budget_config  # provider -> (hedges per second, burst)
+        self._can_send = can_send or (lambda provider: True)  # e.g. upstream rate limit headroom
+        self._budgets: Dict[str, TokenBucket] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, provider: str, name: str):
+        with self._lock:
+            counters = self._counters.setdefault(provider, {
+                'primary': 0, 'primary_wins': 0, 'hedges': 0, 'hedge_wins': 0, 'denied': 0, 'failovers': 0
+            })
+            counters[name] += 1
+
+    def _budget(self, provider: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._budgets.get(provider)
+            if bucket is None:
+                rate, burst = self._budget_config(provider)
+                bucket = self._budgets[provider] = TokenBucket(rate, burst)
+            return bucket
+
+    def _take_budget(self, provider: str) -> bool:
+        """Spend one hedge token for provider, without waiting"""
+        if not self._can_send(provider):
+            return False
+        try:
+            self._budget(provider).reserve(max_wait=0)
+            return True
+        except RateLimitExceeded:
+            return False
+
+    def _next_backup(self, backups: List[Attempt], failover: bool) -> Optional[Tuple[str, Callable[[], Any], bool]]:
+        """(provider, call, is_hedge) for the next backup that may go; a failover needs no budget"""
+        while backups:
+            provider, call = backups.pop(0)
+            if failover or self._take_budget(provider):
+                self._count(provider, 'failovers' if failover else 'hedges')
+                return provider, call, not failover
+            self._count(provider, 'denied')
+        return None
+
+    def run(self, primary: Attempt, backups: List[Attempt], delay: float) -> Tuple[Any, Optional[str]]:
+        """Result of the first usable attempt and the provider that produced it
+
+        A primary that fails outright before the delay is replaced by a backup
+        immediately (a failover, not charged to the hedge budget).
+        """
+        provider, call = primary
+        self._count(provider, 'primary')
+        running = {self._executor.submit(call): (provider, False)}
+        done, _ = wait(running, timeout=delay)
+        hedged = False
+        backups = list(backups)
+
+        while running:
+            for future in done:
+                source, is_hedge = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Hedged attempt on {source} failed: {str(e)}")
+                    result = None
+                if result:
+                    self._count(source, 'hedge_wins' if is_hedge else 'primary_wins')
+                    # The loser is discarded; if it has not started it never will
+                    for other in running:
+                        other.cancel()
+                    return result, source
+
+            # Primary slow (hedge) or failed (failover): send the next backup that may go
+            if backups and (not hedged or not running):
+                backup = self._next_backup(backups, failover=not running)
+                if backup:
+                    backup_provider, backup_call, is_hedge = backup
+                    running[self._executor.submit(backup_call)] = (backup_provider, is_hedge)
+                    hedged = True
+
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+        return None, None
+
+    async def run_async(self, primary: Attempt, backups: List[Attempt], delay: float) -> Tuple[Any, Optional[str]]:
+        """run() on the running event loop: each call returns a coroutine and races as a task
+
+        Counters and hedge budgets are shared with run().
+        """
+        provider, call = primary
+        self._count(provider, 'primary')
+        running = {asyncio.ensure_future(call()): (provider, False)}
+        done, _ = await asyncio.wait(running, timeout=delay)
+        hedged = False
+        backups = list(backups)
+
+        while running:
+            for task in done:
+                source, is_hedge = running.pop(task)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    logger.error(f"Hedged attempt on {source} failed: {str(e)}")
+                    result = None
+                if result:
+                    self._count(source, 'hedge_wins' if is_hedge else 'primary_wins')
+                    # The loser stops waiting; an upstream fetch it shares through single-flight goes on
+                    for other in running:
+                        other.cancel()
+                    return result, source
+
+            if backups and (not hedged or not running):
+                backup = self._next_backup(backups, failover=not running)
+                if backup:
+                    backup_provider, backup_call, is_hedge = backup
+                    running[asyncio.ensure_future(backup_call())] = (backup_provider, is_hedge)
+                    hedged = True
+
+            if not running:
+                break
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        return None, None
+
+    def reset(self):
+        with self._lock:
+            self._budgets.clear()
+            self._counters.clear()
+
+    def stats(self) -> Dict:
+        """Per-provider counts plus totals and hedge win rate"""
+        with self._lock:
+            providers = {provider: dict(counters) for provider, counters in sorted(self._counters.items())}
+        hedges = sum(c['hedges'] for c in providers.values())
+        hedge_wins = sum(c['hedge_wins'] for c in providers.values())
+        return {
+            'providers': providers,
+            'hedges': hedges,
+            'hedge_wins': hedge_wins,
+            'denied': sum(c['denied'] for c in providers.values()),
+            'hedge_win_rate': round(hedge_wins / hedges, 4) if hedges else 0.0,
+        }
@@ -0,0 +1,358 @@
+"""
+HLS streaming proxy helpers
+Playlists are rewritten so every variant, segment, key and map URI points back
+at the proxy; segments are relayed in chunks and kept in a size-bounded disk
+cache so popular episodes are served locally after the first viewer.
+Proxy URLs are HMAC-signed so the endpoint only fetches URLs the backend issued,
+and only URLs on public hosts are ever signed or fetched.
+"""
+
+import hashlib
+import hmac
+import ipaddress
+import logging
+import os
+import re
+import socket
+import tempfile
+import threading
+import time
+from typing import BinaryIO, Callable, Dict, Iterator, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+logger = logging.getLogger(__name__)
+
+PLAYLIST_CONTENT_TYPE = 'application/vnd.apple.mpegurl'
+URI_ATTR_RE = re.compile(r'URI="([^"]*)"')
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# Upstream response headers relayed to the client for segments (never Content-Type: see segment_content_type)
+PASSTHROUGH_HEADERS = ('Content-Length', 'Content-Range', 'Last-Modified', 'ETag')
+# Content types served for proxied media by extension; anything else is sent as opaque bytes
+SEGMENT_CONTENT_TYPES = {
+    '.ts': 'video/mp2t',
+    '.m4s': 'video/iso.segment',
+    '.mp4': 'video/mp4',
+    '.m4a': 'audio/mp4',
+    '.aac': 'audio/aac',
+    '.vtt': 'text/vtt',
+    '.webvtt': 'text/vtt',
+    '.srt': 'text/plain',
+}
+HOST_CHECK_TTL = 300  # seconds a host's resolved addresses are trusted
+
+
+class RangeNotSatisfiable(Exception):
+    """Raised for a Range header that selects no bytes of the resource"""
+
+
+def sign(secret: bytes, url: str, referer: str = '') -> str:
+    """Signature binding a proxied URL to the Referer the CDN expects"""
+    message = f"{url}\n{referer}".encode('utf-8')
+    return hmac.new(secret, message, hashlib.sha256).hexdigest()[:32]
+
+
+def verify(secret: bytes, url: str, referer: str, signature: str) -> bool:
+    return hmac.compare_digest(sign(secret, url, referer), signature or '')
+
+
+_host_checks: Dict[str, Tuple[float, bool]] = {}
+_host_checks_lock = threading.Lock()
+
+
+def is_public_url(url: str) -> bool:
+    """Whether url's host resolves only to globally routable addresses
+
+    Loopback, private, link-local and other reserved addresses are refused, as are
+    hosts that do not resolve. Results are kept for HOST_CHECK_TTL seconds.
+    """
+    host = urlsplit(url).hostname
+    if not host:
+        return False
+    now = time.monotonic()
+    with _host_checks_lock:
+        checked = _host_checks.get(host)
+    if checked is not None and checked[0] > now:
+        return checked[1]
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except (OSError, UnicodeError):
+        return False  # not cached: resolution may work on the next try
+    public = bool(addresses) and all(ipaddress.ip_address(address.split('%')[0]).is_global for address in addresses)
+    with _host_checks_lock:
+        if len(_host_checks) > 4096:
+            _host_checks.clear()
+        _host_checks[host] = (now + HOST_CHECK_TTL, public)
+    return public
+
+
+def is_playlist(url: str, content_type: str = '') -> bool:
+    """Whether a response is an m3u8 playlist, by content type or path"""
+    return 'mpegurl' in (content_type or '').lower() or urlsplit(url).path.lower().endswith('.m3u8')
+
+
+def rewrite_playlist(text: str, base_url: str, proxy_url: Callable[[str], Optional[str]]) -> str:
+    """Point every URI in a playlist (resolved against base_url) at the proxy
+
+    proxy_url returns None for a URI that must not be proxied; its line is dropped,
+    along with the #EXTINF of a dropped segment.
+    """
+    lines = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            lines.append(line)
+        elif stripped.startswith('#'):
+            # Tags such as EXT-X-KEY, EXT-X-MAP and EXT-X-MEDIA carry URI attributes
+            rejected = []
+
+            def replace(match):
+                target = proxy_url(urljoin(base_url, match.group(1)))
+                if target is None:
+                    rejected.append(match.group(1))
+                    return match.group(0)
+                return f'URI="{target}"'
+            rewritten = URI_ATTR_RE.sub(replace, line)
+            if rejected:
+                logger.warning(f"Dropped playlist tag for unproxied URI {rejected[0]}")
+            else:
+                lines.append(rewritten)
+        else:
+            target = proxy_url(urljoin(base_url, stripped))
+            if target is None:
+                logger.warning(f"Dropped playlist entry for unproxied URI {stripped}")
+                if lines and lines[-1].lstrip().startswith('#EXTINF'):
+                    lines.pop()
+            else:
+                lines.append(target)
+    return '\n'.join(lines) + '\n'
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """(start, end inclusive) selected by a single-range Range header, None for the whole body"""
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match or not (match.group(1) or match.group(2)):
+        return None  # multi-range or malformed: ignored, as RFC 9110 allows
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start, end = max(0, size - int(last)), size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable(header)
+    return start, end
+
+
+def segment_content_type(url: str) -> str:
+    """Content type for a proxied segment, key or subtitle, by extension; the CDN's own is not trusted"""
+    return SEGMENT_CONTENT_TYPES.get(os.path.splitext(urlsplit(url).path)[1].lower(), 'application/octet-stream')
+
+
+def segment_headers(url: str, upstream_headers) -> Dict[str, str]:
+    """Response headers for a relayed segment"""
+    headers = {name: upstream_headers[name] for name in PASSTHROUGH_HEADERS if name in upstream_headers}
+    headers.update({'Content-Type': segment_content_type(url), 'X-Content-Type-Options': 'nosniff',
+                    'Accept-Ranges': 'bytes'})
+    return headers
+
+
+def cached_segment_plan(url: str, size: int, range_header: Optional[str]) -> Tuple[int, Dict[str, str], int, int]:
+    """(status, headers, start, length) for serving a cached segment of `size` bytes
+
+    Raises RangeNotSatisfiable for a range outside the segment.
+    """
+    selected = parse_range(range_header, size)
+    headers = {'Content-Type': segment_content_type(url), 'X-Content-Type-Options': 'nosniff',
+               'Accept-Ranges': 'bytes'}
+    if selected is None:
+        status, start, length = 200, 0, size
+    else:
+        start, end = selected
+        status, length = 206, end - start + 1
+        headers['Content-Range'] = f"bytes {start}-{end}/{size}"
+    headers['Content-Length'] = str(length)
+    return status, headers, start, length
+
+
+def iter_file(f: BinaryIO, start: int = 0, length: Optional[int] = None,
+              chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Stream part of an open file in chunks, closing it at the end
+
+    Cached segments are opened before responding, so one evicted meanwhile is
+    still readable through the open handle.
+    """
+    with f:
+        f.seek(start)
+        remaining = length
+        while remaining is None or remaining > 0:
+            chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+class CacheWriter:
+    """Tees a relayed segment into a temporary file; only complete bodies are committed"""
+
+    def __init__(self, cache: 'SegmentCache', url: str, expected: Optional[int]):
+        self._cache = cache
+        self.url = url
+        self.expected = expected  # Content-Length, when the upstream sent one
+        self.written = 0
+        fd, self._temp = tempfile.mkstemp(dir=cache.directory, suffix='.part')
+        self._file = os.fdopen(fd, 'wb')
+
+    def write(self, chunk: bytes):
+        if self._file is None:
+            return
+        self.written += len(chunk)
+        if self.written > self._cache.max_item_bytes:
+            self.abort()
+            return
+        self._file.write(chunk)
+
+    def commit(self):
+        """Publish the file if the whole body arrived, otherwise drop it"""
+        if self._file is None:
+            return
+        complete = self.written > 0 and (self.expected is None or self.written == self.expected)
+        self._file.close()
+        self._file = None
+        if complete:
+            self._cache._publish(self.url, self._temp, self.written)
+        else:
+            self._discard()
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._discard()
+
+    def _discard(self):
+        try:
+            os.remove(self._temp)
+        except OSError:
+            pass
+
+
+class SegmentCache:
+    """Disk-backed segment cache bounded by total bytes, evicting least recently used files
+
+    Files are published with an atomic rename, so several worker processes can
+    share one directory; eviction rescans the directory and uses file mtimes
+    (bumped on every hit) as the recency order.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1024 * 1024 * 1024,
+                 max_item_bytes: int = 32 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes  # larger bodies are relayed but never cached
+        self._lock = threading.Lock()
+        self._estimated = None  # bytes on disk as of the last scan plus later writes
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.seg')
+
+    def lookup(self, url: str) -> Optional[Tuple[BinaryIO, int]]:
+        """Open file and size of a cached segment, marking it recently used"""
+        path = self.path_for(url)
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        size = os.fstat(f.fileno()).st_size
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # evicted by another worker since we opened it
+        with self._lock:
+            self.hits += 1
+        return f, size
+
+    def writer(self, url: str, expected: Optional[int] = None) -> Optional[CacheWriter]:
+        """A writer for a segment about to be relayed, None when it is too large to keep"""
+        if expected is not None and expected > self.max_item_bytes:
+            return None
+        try:
+            return CacheWriter(self, url, expected)
+        except OSError as e:
+            logger.error(f"Segment cache write error: {str(e)}")
+            return None
+
+    def _publish(self, url: str, temp: str, size: int):
+        os.replace(temp, self.path_for(url))
+        with self._lock:
+            self.stored += 1
+            if self._estimated is not None:
+                self._estimated += size
+            over = self._estimated is None or self._estimated > self.max_bytes
+        if over:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.seg'):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self) -> int:
+        """Remove least recently used segments until the cache fits in max_bytes"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self._estimated = total
+            self.evicted += removed
+        return removed
+
+    def clear(self):
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self._lock:
+            self._estimated = 0
+            self.hits = self.misses = self.stored = self.evicted = 0
+
+    def stats(self) -> Dict:
+        entries = self._entries()
+        with self._lock:
+            return {
+                'directory': self.directory,
+                'files': len(entries),
+                'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stored': self.stored,
+                'evicted': self.evicted,
+            }
@@ -0,0 +1,57 @@
+"""
+HTTP validators for cacheable JSON responses
+Responses carry a strong ETag over the body bytes, Last-Modified from the
+newest cache entry behind them and a Cache-Control lifetime, so browsers and
+front proxies revalidate with If-None-Match and get an empty 304 while the
+list or title is unchanged.
+"""
+
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Mapping, Optional
+
+
+def strong_etag(body: bytes) -> str:
+    """Quoted strong entity tag for a response body"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def validator_headers(body: bytes, max_age: int, stale_while_revalidate: int = 0,
+                      last_modified: Optional[float] = None) -> Dict[str, str]:
+    """ETag, Cache-Control and (when known) Last-Modified for a response body"""
+    cache_control = f"public, max-age={max_age}"
+    if stale_while_revalidate:
+        cache_control += f", stale-while-revalidate={stale_while_revalidate}"
+    headers = {'ETag': strong_etag(body), 'Cache-Control': cache_control}
+    if last_modified:
+        headers['Last-Modified'] = formatdate(last_modified, usegmt=True)
+    return headers
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match uses the weak comparison, so W/ prefixes are ignored"""
+    if if_none_match.strip() == '*':
+        return True
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith('W/') else tag) == etag:
+            return True
+    return False
+
+
+def not_modified(request_headers: Mapping[str, str], validators: Dict[str, str]) -> bool:
+    """Whether a GET can be answered with 304; If-None-Match takes precedence over If-Modified-Since
+
+    request_headers is looked up with lower-case names (Flask's headers are case-insensitive).
+    """
+    if_none_match = request_headers.get('if-none-match')
+    if if_none_match:
+        return etag_matches(if_none_match, validators['ETag'])
+    since = request_headers.get('if-modified-since')
+    modified = validators.get('Last-Modified')
+    if since and modified:
+        try:
+            return parsedate_to_datetime(modified) <= parsedate_to_datetime(since)
+        except (TypeError, ValueError):
+            return False
+    return False
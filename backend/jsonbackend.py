@@ -0,0 +1,83 @@
+"""
+Pluggable JSON backend
+orjson when installed, then ujson, then the standard library. Every backend
+serializes to compact UTF-8 bytes, so API responses and cache rows share one
+encoding and a cached body can be sent as is.
+"""
+
+import datetime
+import decimal
+import json
+import uuid
+from typing import Any, Dict, Union
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # optional dependency
+    ujson = None
+
+
+def default(obj: Any) -> Any:
+    """Types the encoders don't handle natively"""
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class StdlibJSON:
+    """json from the standard library"""
+    name = 'json'
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=default).encode('utf-8')
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return json.loads(data)
+
+
+class OrjsonJSON:
+    """orjson (requires the orjson package)"""
+    name = 'orjson'
+
+    def dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return orjson.loads(data)
+
+
+class UjsonJSON:
+    """ujson (requires the ujson package)"""
+    name = 'ujson'
+
+    def dumps(self, obj: Any) -> bytes:
+        return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode('utf-8')
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return ujson.loads(data)
+
+
+BACKENDS: Dict[str, object] = {'json': StdlibJSON()}
+if ujson is not None:
+    BACKENDS['ujson'] = UjsonJSON()
+if orjson is not None:
+    BACKENDS['orjson'] = OrjsonJSON()
+
+
+def get_backend(name: str = 'auto'):
+    """Backend by name; 'auto' picks orjson, then ujson, then the standard library"""
+    if name == 'auto':
+        return BACKENDS.get('orjson') or BACKENDS.get('ujson') or BACKENDS['json']
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"JSON backend not available: {name}")
@@ -0,0 +1,236 @@
+"""
+Background maintenance for the SQLite cache tables
+Deletes expired rows in batches, evicts least recently used rows once the
+evictable tables outgrow a size cap and returns freed pages to the filesystem
+with incremental vacuum.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class AccessTracker:
+    """Collects cache read times in memory so hits never write to disk; flushed by maintenance"""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self._touched: Dict[Tuple[str, Hashable], float] = {}
+        self._lock = threading.Lock()
+
+    def touch(self, table: str, key: Hashable):
+        """Record a read of (table, key)"""
+        now = self._clock()
+        with self._lock:
+            self._touched[(table, key)] = now
+
+    def drain(self) -> Dict[Tuple[str, Hashable], float]:
+        """Take every recorded access"""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        return touched
+
+
+class CacheMaintenance:
+    """Expiry sweeps, LRU size capping and incremental vacuum, run on a schedule"""
+
+    def __init__(self, get_db, tables: List[str], retention: Callable[[], float],
+                 expiry_only_tables: Optional[List[str]] = None,
+                 max_bytes: int = 256 * 1024 * 1024, batch_size: int = 500,
+                 interval: float = 600, tracker: Optional[AccessTracker] = None,
+                 clock: Callable[[], float] = time.time):
+        self._get_db = get_db
+        self.tables = tables  # keyed by id, subject to LRU eviction
+        self.expiry_only_tables = list(expiry_only_tables or [])  # only swept by expiry
+        self._retention = retention  # seconds past expiry a row stays servable
+        self.max_bytes = max_bytes  # cap on the evictable tables, not the whole file
+        self.batch_size = batch_size
+        self.interval = interval
+        self.tracker = tracker or AccessTracker(clock)
+        self._clock = clock
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._run_lock = threading.Lock()
+        self.runs = 0
+        self.expired_rows = 0
+        self.evicted_rows = 0
+        self.reclaimed_bytes = 0
+        self.last_run: Optional[Dict] = None
+
+    # Helpers
+    @staticmethod
+    def _pragma(conn, name: str) -> int:
+        return conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+    def _file_bytes(self, conn) -> int:
+        return self._pragma(conn, 'page_count') * self._pragma(conn, 'page_size')
+
+    def _used_bytes(self, conn) -> int:
+        pages = self._pragma(conn, 'page_count') - self._pragma(conn, 'freelist_count')
+        return pages * self._pragma(conn, 'page_size')
+
+    def _evictable_bytes(self, conn) -> int:
+        """Bytes held by the LRU-evictable tables and their indexes
+
+        Other tables (catalog, aliases, episodes, watchlist) are not counted: evicting
+        cache rows cannot shrink them. Falls back to summing row sizes where SQLite is
+        built without the dbstat table.
+        """
+        placeholders = ', '.join('?' * len(self.tables))
+        try:
+            used = conn.execute(
+                f"SELECT SUM(pgsize - unused) FROM dbstat JOIN sqlite_master USING (name) "
+                f"WHERE tbl_name IN ({placeholders})", self.tables
+            ).fetchone()[0]
+        except sqlite3.OperationalError:
+            used = sum(conn.execute(
+                f"SELECT SUM(LENGTH(CAST(id AS BLOB)) + COALESCE(LENGTH(CAST(data AS BLOB)), 0)) FROM {table}"
+            ).fetchone()[0] or 0 for table in self.tables)
+        return used or 0
+
+    def ensure_incremental_vacuum(self):
+        """Switch the database to auto_vacuum=INCREMENTAL (needs one full VACUUM)"""
+        with self._get_db().connection() as conn:
+            if self._pragma(conn, 'auto_vacuum') == 2:
+                return
+            conn.commit()
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            logger.info("Cache database switched to incremental vacuum")
+
+    # Steps
+    def flush_access_times(self) -> int:
+        """Write batched access times to accessed_at"""
+        touched = self.tracker.drain()
+        if not touched:
+            return 0
+        by_table: Dict[str, List[Tuple[float, Hashable]]] = {}
+        for (table, key), accessed_at in touched.items():
+            if table in self.tables:
+                by_table.setdefault(table, []).append((accessed_at, key))
+        with self._get_db().connection() as conn:
+            for table, rows in by_table.items():
+                conn.executemany(f"UPDATE {table} SET accessed_at = MAX(COALESCE(accessed_at, 0), ?) WHERE id = ?", rows)
+        return len(touched)
+
+    def delete_expired(self) -> int:
+        """Batch-delete rows past expiry plus the stale-serving window"""
+        cutoff = self._clock() - self._retention()
+        deleted = 0
+        for table in self.tables + self.expiry_only_tables:
+            while True:
+                with self._get_db().connection() as conn:
+                    cursor = conn.execute(
+                        f"DELETE FROM {table} WHERE rowid IN "
+                        f"(SELECT rowid FROM {table} WHERE expires_at < ? LIMIT ?)",
+                        (cutoff, self.batch_size)
+                    )
+                    count = cursor.rowcount
+                deleted += count
+                if count < self.batch_size:
+                    break
+        return deleted
+
+    def enforce_size_cap(self) -> int:
+        """Evict least recently used rows until the evictable tables fit under max_bytes"""
+        evicted = 0
+        while True:
+            with self._get_db().connection() as conn:
+                if self._evictable_bytes(conn) <= self.max_bytes:
+                    break
+                union = " UNION ALL ".join(
+                    f"SELECT '{table}' AS tbl, id, COALESCE(accessed_at, cached_at, 0) AS seen FROM {table}"
+                    for table in self.tables
+                )
+                victims = conn.execute(f"SELECT tbl, id FROM ({union}) ORDER BY seen LIMIT ?",
+                                       (self.batch_size,)).fetchall()
+                if not victims:
+                    break
+                for table, key in victims:
+                    conn.execute(f"DELETE FROM {table} WHERE id = ?", (key,))
+            evicted += len(victims)
+        return evicted
+
+    def incremental_vacuum(self) -> int:
+        """Release free pages; returns bytes the file shrank by"""
+        with self._get_db().connection() as conn:
+            before = self._file_bytes(conn)
+            conn.commit()
+            conn.execute("PRAGMA incremental_vacuum")
+            after = self._file_bytes(conn)
+        return max(0, before - after)
+
+    def run_once(self) -> Dict:
+        """One full maintenance pass"""
+        with self._run_lock:
+            started = time.monotonic()
+            touched = self.flush_access_times()
+            expired = self.delete_expired()
+            evicted = self.enforce_size_cap()
+            reclaimed = self.incremental_vacuum()
+            self.runs += 1
+            self.expired_rows += expired
+            self.evicted_rows += evicted
+            self.reclaimed_bytes += reclaimed
+            self.last_run = {
+                'at': self._clock(),
+                'duration': round(time.monotonic() - started, 4),
+                'access_times_flushed': touched,
+                'expired_rows': expired,
+                'evicted_rows': evicted,
+                'reclaimed_bytes': reclaimed,
+            }
+            if expired or evicted:
+                logger.info(f"Cache maintenance removed {expired} expired and {evicted} evicted rows, "
+                            f"reclaimed {reclaimed} bytes")
+            return self.last_run
+
+    # Scheduling
+    def _loop(self):
+        try:
+            self.ensure_incremental_vacuum()
+        except Exception as e:
+            logger.error(f"Could not enable incremental vacuum: {str(e)}")
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Cache maintenance failed: {str(e)}")
+
+    def start(self):
+        """Run maintenance every interval seconds on a daemon thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='cache-maintenance', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def stats(self) -> Dict:
+        """Totals plus database size"""
+        with self._get_db().connection() as conn:
+            file_bytes = self._file_bytes(conn)
+            used_bytes = self._used_bytes(conn)
+            evictable_bytes = self._evictable_bytes(conn)
+            rows = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                    for table in self.tables + self.expiry_only_tables}
+        return {
+            'runs': self.runs,
+            'expired_rows': self.expired_rows,
+            'evicted_rows': self.evicted_rows,
+            'reclaimed_bytes': self.reclaimed_bytes,
+            'file_bytes': file_bytes,
+            'used_bytes': used_bytes,
+            'evictable_bytes': evictable_bytes,
+            'max_bytes': self.max_bytes,
+            'rows': rows,
+            'last_run': self.last_run,
+        }
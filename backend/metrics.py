@@ -0,0 +1,320 @@
+"""
+Request, upstream, cache and rate-limit metrics in the Prometheus text format
+Counters and histograms keep one series per label combination; recording is
+a bisect and a few additions under a per-metric lock, cheap enough to leave
+on. Worker processes can publish snapshots to a shared directory so any one
+of them renders the totals of all.
+"""
+
+import bisect
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers memory-cache hits (sub-millisecond) through slow upstreams
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+SNAPSHOT_PREFIX = 'metrics-'
+EXITED_SNAPSHOT = f"{SNAPSHOT_PREFIX}exited.json"  # totals of every worker that has exited
+
+
+def escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(str(value))}"' for name, value in zip(names, values)) + '}'
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def clear_snapshots(directory: str):
+    """Remove snapshots published by an earlier run into `directory`"""
+    for name in os.listdir(directory):
+        if name.startswith(SNAPSHOT_PREFIX):
+            try:
+                os.unlink(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+def snapshot_path(directory: str, pid: int) -> str:
+    return os.path.join(directory, f"{SNAPSHOT_PREFIX}{pid}.json")
+
+
+def write_snapshot(path: str, snapshot: Dict[str, List]):
+    """Replace the snapshot at path atomically"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.metrics-')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def fold_snapshot(directory: str, pid: int):
+    """Add an exited worker's last snapshot to the exited-workers total and remove its file
+
+    Keeps the totals from going backwards without one file per worker ever started.
+    """
+    path = snapshot_path(directory, pid)
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not read metrics of worker {pid}: {str(e)}")
+        snapshot = {}
+    total_path = os.path.join(directory, EXITED_SNAPSHOT)
+    try:
+        with open(total_path) as f:
+            total = json.load(f)
+    except (OSError, ValueError):
+        total = {}
+    for name, series in snapshot.items():
+        merged = {tuple(labels): value for labels, value in total.get(name, [])}
+        for labels, value in series:
+            key = tuple(labels)
+            current = merged.get(key)
+            if current is None:
+                merged[key] = value
+            elif isinstance(value, list):
+                # Histogram bucket counts and sum; a changed bucket layout restarts the series
+                merged[key] = [a + b for a, b in zip(current, value)] if len(current) == len(value) else value
+            else:
+                merged[key] = current + value
+        total[name] = [[list(labels), value] for labels, value in merged.items()]
+    write_snapshot(total_path, total)
+    os.unlink(path)
+
+
+class Counter:
+    """Monotonic count per label combination"""
+    kind = 'counter'
+
+    def __init__(self, registry: 'Registry', name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self._registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        if not self._registry.enabled:
+            return
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._series.get(labels, 0)
+
+    def snapshot(self) -> List:
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._series.items()]
+
+    def merge(self, series: Dict[Tuple[str, ...], float], snapshot: List):
+        for labels, value in snapshot:
+            key = tuple(labels)
+            series[key] = series.get(key, 0) + value
+
+    def render(self, series: Dict) -> Iterator[str]:
+        for labels, value in sorted(series.items()):
+            yield f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}"
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Histogram:
+    """Observation counts in cumulative `le` buckets plus their sum, per label combination"""
+    kind = 'histogram'
+
+    def __init__(self, registry: 'Registry', name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self._registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per series: a count per bucket (non-cumulative, the last one +Inf) then the sum
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        if not self._registry.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        """Observe the wall time of a block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def count(self, *labels: str) -> int:
+        with self._lock:
+            series = self._series.get(labels)
+            return int(sum(series[:-1])) if series else 0
+
+    def snapshot(self) -> List:
+        with self._lock:
+            return [[list(labels), list(series)] for labels, series in self._series.items()]
+
+    def merge(self, series: Dict[Tuple[str, ...], List[float]], snapshot: List):
+        for labels, values in snapshot:
+            key = tuple(labels)
+            current = series.get(key)
+            if current is None or len(current) != len(values):
+                series[key] = list(values)
+            else:
+                series[key] = [a + b for a, b in zip(current, values)]
+
+    def render(self, series: Dict) -> Iterator[str]:
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values[:-1]):
+                cumulative += count
+                bucket_labels = format_labels(self.labelnames + ('le',), labels + (format_value(bound),))
+                yield f"{self.name}_bucket{bucket_labels} {format_value(cumulative)}"
+            plain = format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{plain} {format_value(values[-1])}"
+            yield f"{self.name}_count{plain} {format_value(cumulative)}"
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Registry:
+    """The metrics of one process, optionally merged with sibling processes' snapshots"""
+
+    def __init__(self, enabled: Union[bool, Callable[[], bool]] = True):
+        self._enabled = enabled  # a flag, or a callable read on every recording
+        self._metrics: Dict[str, object] = {}
+        self.shared_dir: Optional[str] = None
+        self._publisher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled() if callable(self._enabled) else self._enabled
+
+    @enabled.setter
+    def enabled(self, value: Union[bool, Callable[[], bool]]):
+        self._enabled = value
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> Dict[str, List]:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def render(self) -> str:
+        """Text exposition of every metric, summed over this process and the published snapshots"""
+        merged: Dict[str, Dict] = {name: {} for name in self._metrics}
+        for snapshot in [self.snapshot()] + self._sibling_snapshots():
+            for name, series in snapshot.items():
+                if name in self._metrics:
+                    self._metrics[name].merge(merged[name], series)
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render(merged[name]))
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        """Clear every series (a freshly forked worker starts from zero)"""
+        for metric in self._metrics.values():
+            metric.reset()
+
+    # Sharing between worker processes
+    def publish(self):
+        """Write this process's snapshot where sibling processes can read it"""
+        if not self.shared_dir:
+            return
+        try:
+            write_snapshot(snapshot_path(self.shared_dir, os.getpid()), self.snapshot())
+        except OSError as e:
+            logger.error(f"Could not publish metrics: {str(e)}")
+
+    def _sibling_snapshots(self) -> List[Dict]:
+        # Exited workers are folded into one file by the master (fold_snapshot), so totals never go backwards
+        if not self.shared_dir:
+            return []
+        own = os.path.basename(snapshot_path(self.shared_dir, os.getpid()))
+        snapshots = []
+        try:
+            names = os.listdir(self.shared_dir)
+        except OSError:
+            return []
+        for name in names:
+            if not name.startswith(SNAPSHOT_PREFIX) or name == own:
+                continue
+            try:
+                with open(os.path.join(self.shared_dir, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def share(self, directory: str, interval: float = 5.0):
+        """Publish this process's snapshot to `directory` every `interval` seconds"""
+        self.shared_dir = directory
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                self.publish()
+            self.publish()
+
+        self._publisher = threading.Thread(target=run, name='metrics-publisher', daemon=True)
+        self._publisher.start()
+
+    def stop(self):
+        """Stop publishing, writing one last snapshot"""
+        self._stop.set()
+        if self._publisher is not None:
+            self._publisher.join(timeout=5)
+            self._publisher = None
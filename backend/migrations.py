@@ -0,0 +1,251 @@
+"""
+Versioned schema migrations for animeverse.db
+The applied version is stored in PRAGMA user_version; each migration runs in its own transaction.
+"""
+
+import logging
+import sqlite3
+from typing import Callable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Both key/value cache tables share this layout; timestamps are epoch seconds
+CACHE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id TEXT PRIMARY KEY,
+        provider TEXT,
+        data TEXT,
+        cached_at REAL,
+        expires_at REAL
+    )
+"""
+
+# Local ISO timestamp (as written by datetime.now().isoformat()) to epoch seconds
+LOCAL_TO_EPOCH = "(julianday({col}, 'utc') - 2440587.5) * 86400.0"
+# UTC timestamp (as written by datetime('now')) to epoch seconds
+UTC_TO_EPOCH = "(julianday({col}) - 2440587.5) * 86400.0"
+
+
+def table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    """Column names of a table (empty if it does not exist)"""
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def baseline_schema(conn: sqlite3.Connection):
+    """Tables as created by the original init_database"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS anime_cache (
+            id TEXT PRIMARY KEY,
+            provider TEXT,
+            data TEXT,
+            cached_at TIMESTAMP,
+            expires_at TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS episode_cache (
+            anime_id TEXT,
+            provider TEXT,
+            episode_number INTEGER,
+            data TEXT,
+            cached_at TIMESTAMP,
+            expires_at TIMESTAMP,
+            PRIMARY KEY (anime_id, provider, episode_number)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS streaming_cache (
+            episode_id TEXT PRIMARY KEY,
+            provider TEXT,
+            data TEXT,
+            cached_at TIMESTAMP,
+            expires_at TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_watchlist (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            anime_id TEXT,
+            title TEXT,
+            image TEXT,
+            current_episode INTEGER DEFAULT 1,
+            total_episodes INTEGER,
+            status TEXT DEFAULT 'watching',
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def rebuild_cache_table(conn: sqlite3.Connection, table: str, key_column: str):
+    """Rebuild a cache table into the shared (id, ...) layout with epoch timestamps"""
+    conn.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+    conn.execute(CACHE_TABLE_SQL.format(table=table))
+    conn.execute(f"""
+        INSERT OR REPLACE INTO {table} (id, provider, data, cached_at, expires_at)
+        SELECT {key_column}, provider, data,
+               {UTC_TO_EPOCH.format(col='cached_at')},
+               {LOCAL_TO_EPOCH.format(col='expires_at')}
+        FROM {table}_old
+        WHERE {key_column} IS NOT NULL
+    """)
+    conn.execute(f"DROP TABLE {table}_old")
+
+
+def unify_cache_tables(conn: sqlite3.Connection):
+    """Give anime_cache and streaming_cache the same keyed layout and index their expiry"""
+    rebuild_cache_table(conn, 'anime_cache', 'id')
+    key_column = 'episode_id' if 'episode_id' in table_columns(conn, 'streaming_cache') else 'id'
+    rebuild_cache_table(conn, 'streaming_cache', key_column)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_anime_cache_expires ON anime_cache (expires_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_streaming_cache_expires ON streaming_cache (expires_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_episode_cache_expires ON episode_cache (expires_at)")
+
+
+def track_access_time(conn: sqlite3.Connection):
+    """Add accessed_at to the cache tables so size-capped eviction can pick least recently used rows"""
+    for table in ('anime_cache', 'streaming_cache'):
+        if 'accessed_at' not in table_columns(conn, table):
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN accessed_at REAL")
+        conn.execute(f"UPDATE {table} SET accessed_at = cached_at WHERE accessed_at IS NULL")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_accessed ON {table} (accessed_at)")
+
+
+def payload_codec_column(conn: sqlite3.Connection):
+    """Record the payload codec per row; existing rows are plain JSON"""
+    for table in ('anime_cache', 'streaming_cache'):
+        if 'codec' not in table_columns(conn, table):
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN codec TEXT NOT NULL DEFAULT 'json'")
+
+
+def episode_table(conn: sqlite3.Connection):
+    """Replace the never-written legacy episode_cache with one row per (provider, anime, number)"""
+    conn.execute("DROP TABLE IF EXISTS episode_cache")
+    conn.execute("""
+        CREATE TABLE episode_cache (
+            provider TEXT NOT NULL,
+            anime_id TEXT NOT NULL,
+            number REAL NOT NULL,
+            episode_id TEXT,
+            title TEXT,
+            url TEXT,
+            cached_at REAL,
+            expires_at REAL,
+            PRIMARY KEY (provider, anime_id, number)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_episode_cache_expires ON episode_cache (expires_at)")
+
+
+def search_catalog(conn: sqlite3.Connection):
+    """Catalog of known titles with an FTS5 index kept in sync by triggers (index skipped without FTS5)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS anime_catalog (
+            rowid INTEGER PRIMARY KEY,
+            provider TEXT NOT NULL,
+            anime_id TEXT NOT NULL,
+            title TEXT,
+            english_title TEXT,
+            genres TEXT,
+            synopsis TEXT,
+            image TEXT,
+            release_date TEXT,
+            status TEXT,
+            updated_at REAL,
+            UNIQUE (provider, anime_id)
+        )
+    """)
+    try:
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS anime_catalog_fts USING fts5(
+                title, english_title, genres, synopsis,
+                content='anime_catalog', content_rowid='rowid',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"FTS5 not available, skipping search index: {str(e)}")
+        return
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS anime_catalog_ai AFTER INSERT ON anime_catalog BEGIN
+            INSERT INTO anime_catalog_fts (rowid, title, english_title, genres, synopsis)
+            VALUES (new.rowid, new.title, new.english_title, new.genres, new.synopsis);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS anime_catalog_ad AFTER DELETE ON anime_catalog BEGIN
+            INSERT INTO anime_catalog_fts (anime_catalog_fts, rowid, title, english_title, genres, synopsis)
+            VALUES ('delete', old.rowid, old.title, old.english_title, old.genres, old.synopsis);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS anime_catalog_au AFTER UPDATE ON anime_catalog BEGIN
+            INSERT INTO anime_catalog_fts (anime_catalog_fts, rowid, title, english_title, genres, synopsis)
+            VALUES ('delete', old.rowid, old.title, old.english_title, old.genres, old.synopsis);
+            INSERT INTO anime_catalog_fts (rowid, title, english_title, genres, synopsis)
+            VALUES (new.rowid, new.title, new.english_title, new.genres, new.synopsis);
+        END
+    """)
+
+
+def alias_table(conn: sqlite3.Connection):
+    """Provider ID -> canonical ID links shared by every provider spelling of a title"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS anime_alias (
+            provider TEXT NOT NULL,
+            anime_id TEXT NOT NULL,
+            canonical_id TEXT NOT NULL,
+            title TEXT,
+            created_at REAL,
+            updated_at REAL,
+            PRIMARY KEY (provider, anime_id)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_anime_alias_canonical ON anime_alias (canonical_id)")
+
+
+def episode_lookup_index(conn: sqlite3.Connection):
+    """Find an episode row by provider episode ID (watch requests carry only that)"""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_episode_cache_episode ON episode_cache (provider, episode_id)")
+
+
+# (version, description, migration) in the order they must be applied
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, 'baseline schema', baseline_schema),
+    (2, 'unified cache table layout with expiry indexes', unify_cache_tables),
+    (3, 'cache access-time tracking', track_access_time),
+    (4, 'per-row payload codec', payload_codec_column),
+    (5, 'normalized episode rows', episode_table),
+    (6, 'local search catalog', search_catalog),
+    (7, 'canonical title aliases', alias_table),
+    (8, 'episode lookup by provider episode ID', episode_lookup_index),
+]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    """Currently applied migration version"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply every pending migration in place and return the resulting version"""
+    if conn.in_transaction:
+        conn.commit()
+    version = schema_version(conn)
+    for target, description, migration in MIGRATIONS:
+        if target <= version:
+            continue
+        logger.info(f"Migrating database to v{target}: {description}")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the write lock
+            if schema_version(conn) >= target:
+                conn.rollback()
+                continue
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {int(target)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = target
+    return schema_version(conn)
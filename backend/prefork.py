@@ -0,0 +1,233 @@
+"""
+Pre-fork process manager for the threaded WSGI server
+The master binds the listening socket once and forks workers that all accept
+on it. Workers that exit are replaced, workers are recycled after a request
+quota, SIGHUP swaps every worker for a fresh one without dropping requests and
+SIGTERM/SIGINT drain the workers and stop.
+"""
+
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+from typing import Callable, Dict, Optional, Set
+
+from werkzeug.serving import make_server
+from werkzeug.wsgi import ClosingIterator
+
+logger = logging.getLogger(__name__)
+
+RESPAWN_DELAY = 1.0  # seconds to wait before replacing a worker that died right after starting
+
+
+class _Worker:
+    """Worker side: serves on the inherited socket until drained or its quota is used"""
+
+    def __init__(self, app, listener: socket.socket, host: str, port: int,
+                 max_requests: int, graceful_timeout: float):
+        self.app = app
+        self.max_requests = max_requests  # 0 serves forever
+        self.graceful_timeout = graceful_timeout
+        self.handled = 0
+        self.inflight = 0
+        self._lock = threading.Lock()
+        self._draining = threading.Event()
+        self.server = make_server(host, port, self, threaded=True, fd=listener.fileno())
+
+    def __call__(self, environ, start_response):
+        with self._lock:
+            self.handled += 1
+            self.inflight += 1
+            quota_used = self.max_requests and self.handled >= self.max_requests
+        if quota_used:
+            self.drain()
+        try:
+            return ClosingIterator(self.app(environ, start_response), self._finished)
+        except BaseException:
+            self._finished()
+            raise
+
+    def _finished(self):
+        with self._lock:
+            self.inflight -= 1
+
+    def drain(self):
+        """Stop accepting; requests already accepted are allowed to finish"""
+        if not self._draining.is_set():
+            self._draining.set()
+            # shutdown() waits for serve_forever to return, so never call it on the serving thread
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+    def serve(self):
+        signal.signal(signal.SIGTERM, lambda *_: self.drain())
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C reaches the master, which drains us
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        self.server.serve_forever()
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.inflight > 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.server.server_close()
+
+
+class PreforkServer:
+    """Master process: owns the listening socket and keeps `workers` children serving it"""
+
+    def __init__(self, app, host: str = '127.0.0.1', port: int = 8000, workers: Optional[int] = None,
+                 max_requests: int = 0, max_requests_jitter: int = 0, graceful_timeout: float = 30,
+                 backlog: int = 1024, on_worker_start: Optional[Callable[[int], None]] = None,
+                 on_worker_stop: Optional[Callable[[int], None]] = None,
+                 on_worker_exit: Optional[Callable[[int], None]] = None):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1  # sized to the machine's cores by default
+        self.max_requests = max_requests  # recycle a worker after this many requests (0 never)
+        self.max_requests_jitter = max_requests_jitter  # random extra so workers don't recycle together
+        self.graceful_timeout = graceful_timeout  # seconds a draining worker gets before SIGKILL
+        self.backlog = backlog
+        self.on_worker_start = on_worker_start  # called in each new worker with its slot number
+        self.on_worker_stop = on_worker_stop  # called in a worker with its slot once it has drained
+        self.on_worker_exit = on_worker_exit  # called in the master with the pid of each reaped worker
+        self.listener: Optional[socket.socket] = None
+        self._children: Dict[int, int] = {}  # pid -> slot
+        self._retiring: Set[int] = set()  # pids drained by a reload, not to be replaced
+        self._started: Dict[int, float] = {}
+        self._stopping = False
+        self._reloading = False
+        self.spawned = 0
+        self.reloads = 0
+
+    def bind(self) -> socket.socket:
+        family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        listener = socket.socket(family, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((self.host, self.port))
+        listener.listen(self.backlog)
+        listener.set_inheritable(True)
+        self.port = listener.getsockname()[1]
+        self.listener = listener
+        return listener
+
+    def _spawn(self, slot: int) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                random.seed()
+                if self.on_worker_start:
+                    self.on_worker_start(slot)
+                quota = self.max_requests
+                if quota and self.max_requests_jitter:
+                    quota += random.randint(0, self.max_requests_jitter)
+                _Worker(self.app, self.listener, self.host, self.port, quota, self.graceful_timeout).serve()
+                if self.on_worker_stop:
+                    self.on_worker_stop(slot)
+            except BaseException as e:
+                logger.error(f"Worker {slot} failed: {str(e)}")
+                code = 1
+            finally:
+                # Skip the master's atexit handlers and finalizers
+                os._exit(code)
+        self._children[pid] = slot
+        self._started[pid] = time.monotonic()
+        self.spawned += 1
+        logger.info(f"Worker {slot} started (pid {pid})")
+        return pid
+
+    def _reap(self):
+        """Collect exited workers and replace the ones still needed"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot = self._children.pop(pid, None)
+            started = self._started.pop(pid, time.monotonic())
+            if slot is None:
+                continue
+            self._exited(pid)
+            if pid in self._retiring:
+                self._retiring.discard(pid)
+                continue
+            if self._stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code != 0:
+                logger.error(f"Worker {slot} (pid {pid}) exited with {code}")
+                if time.monotonic() - started < RESPAWN_DELAY:
+                    time.sleep(RESPAWN_DELAY)
+            self._spawn(slot)
+
+    def _exited(self, pid: int):
+        if self.on_worker_exit:
+            try:
+                self.on_worker_exit(pid)
+            except Exception as e:
+                logger.error(f"Exit hook failed for worker pid {pid}: {str(e)}")
+
+    def _reload(self):
+        """Start a replacement for every worker, then drain the old ones"""
+        old = [(pid, slot) for pid, slot in self._children.items() if pid not in self._retiring]
+        for pid, slot in old:
+            self._spawn(slot)
+            self._retiring.add(pid)
+            self._signal(pid, signal.SIGTERM)
+        self.reloads += 1
+        logger.info(f"Reloaded {len(old)} workers")
+
+    def _signal(self, pid: int, signum: int):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _stop_workers(self):
+        for pid in list(self._children):
+            self._signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self._children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.05)
+        for pid in list(self._children):
+            logger.error(f"Worker pid {pid} did not drain in time, killing it")
+            self._signal(pid, signal.SIGKILL)
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+            self._children.pop(pid, None)
+            self._exited(pid)
+
+    def stop(self, *_):
+        self._stopping = True
+
+    def reload(self, *_):
+        self._reloading = True
+
+    def run(self):
+        """Bind, fork the workers and supervise them until SIGTERM or SIGINT"""
+        if self.listener is None:
+            self.bind()
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGHUP, self.reload)
+        logger.info(f"Pre-fork master {os.getpid()} serving {self.host}:{self.port} with {self.workers} workers")
+        for slot in range(self.workers):
+            self._spawn(slot)
+        try:
+            while not self._stopping:
+                if self._reloading:
+                    self._reloading = False
+                    self._reload()
+                self._reap()
+                time.sleep(0.1)
+        finally:
+            self._stopping = True
+            self._stop_workers()
+            self.listener.close()
+            logger.info("Pre-fork master stopped")
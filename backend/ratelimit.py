@@ -0,0 +1,212 @@
+"""
+Per-upstream token-bucket rate limiting
+Each upstream (a Consumet provider, Jikan) gets its own bucket so one slow
+provider never throttles the others, and waiting threads are served FIFO.
+Buckets can keep their state in a shared directory so several worker
+processes draw from one budget per upstream.
+"""
+
+import os
+import re
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; shared buckets need it
+    fcntl = None
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a token would not be available before the caller's deadline"""
+
+
+class TokenBucket:
+    """Token bucket using reservations: callers queue in arrival order and sleep outside the lock"""
+
+    def __init__(self, rate: float, capacity: float = 1,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate  # tokens per second, <= 0 means unlimited
+        self.capacity = max(capacity, 1)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waited = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    @contextmanager
+    def _state(self) -> Iterator[None]:
+        """Hold the bucket's token state for a read-modify-write"""
+        with self._lock:
+            yield
+
+    def reserve(self, max_wait: Optional[float] = None) -> float:
+        """Reserve one token and return how long the caller must wait for it"""
+        if self.rate <= 0:
+            with self._lock:
+                self.acquired += 1
+            return 0.0
+
+        with self._state():
+            self._refill(self._clock())
+            # Tokens may go negative: each negative token is a queued caller
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                self.rejected += 1
+                raise RateLimitExceeded(f"rate limit wait {wait:.2f}s exceeds {max_wait:.2f}s")
+            self._tokens -= 1
+            self.acquired += 1
+            if wait > 0:
+                self.waited += 1
+                self.total_wait += wait
+                self.max_wait_seen = max(self.max_wait_seen, wait)
+        return wait
+
+    def available(self) -> float:
+        """Tokens that could be taken right now without waiting"""
+        if self.rate <= 0:
+            return float('inf')
+        with self._state():
+            self._refill(self._clock())
+            return self._tokens
+
+    def acquire(self, max_wait: Optional[float] = None) -> float:
+        """Block until a token is available; returns the time spent waiting"""
+        wait = self.reserve(max_wait)
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    def stats(self) -> Dict:
+        """Counters for this bucket"""
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'capacity': self.capacity,
+                'acquired': self.acquired,
+                'waited': self.waited,
+                'rejected': self.rejected,
+                'total_wait': round(self.total_wait, 4),
+                'max_wait': round(self.max_wait_seen, 4),
+            }
+
+
+class SharedTokenBucket(TokenBucket):
+    """Token bucket whose tokens live in a small file, shared by every process that opens it
+
+    Each read-modify-write happens under an exclusive flock on the file, so
+    the processes together never exceed the bucket's rate. The clock must be
+    one all processes agree on (wall time by default).
+    """
+
+    STATE = struct.Struct('<dd')  # tokens, last refill time
+
+    def __init__(self, path: str, rate: float, capacity: float = 1,
+                 clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], None] = time.sleep):
+        if fcntl is None:
+            raise RuntimeError("shared rate limit buckets need fcntl (POSIX only)")
+        super().__init__(rate, capacity, clock, sleep)
+        self.path = path
+        self._fd: Optional[int] = None
+        self._pid: Optional[int] = None
+
+    def _file(self) -> int:
+        # flock locks belong to the open file, so a forked process must open its own
+        if self._fd is None or self._pid != os.getpid():
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._pid = os.getpid()
+        return self._fd
+
+    @contextmanager
+    def _state(self) -> Iterator[None]:
+        with self._lock:
+            fd = self._file()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                raw = os.pread(fd, self.STATE.size, 0)
+                if len(raw) == self.STATE.size:
+                    self._tokens, self._updated = self.STATE.unpack(raw)
+                    self._tokens = min(self._tokens, self.capacity)
+                else:
+                    self._tokens, self._updated = self.capacity, self._clock()
+                yield
+                os.pwrite(fd, self.STATE.pack(self._tokens, self._updated), 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def close(self):
+        if self._fd is not None and self._pid == os.getpid():
+            os.close(self._fd)
+        self._fd = None
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        stats['shared'] = self.path
+        return stats
+
+
+class RateLimiter:
+    """Registry of token buckets keyed by upstream name"""
+
+    def __init__(self, bucket_config: Callable[[str], Tuple[float, float]],
+                 max_wait: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep,
+                 shared_dir: Optional[str] = None):
+        self._bucket_config = bucket_config  # key -> (rate, capacity)
+        self.max_wait = max_wait
+        self.shared_dir = shared_dir  # when set, buckets are SharedTokenBuckets in this directory
+        self._clock = clock
+        self._sleep = sleep
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, key: str) -> TokenBucket:
+        """Return the bucket for an upstream, creating it on first use"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    rate, capacity = self._bucket_config(key)
+                    if self.shared_dir:
+                        path = os.path.join(self.shared_dir, re.sub(r'[^\w.-]', '_', key) + '.bucket')
+                        bucket = SharedTokenBucket(path, rate, capacity, sleep=self._sleep)
+                    else:
+                        bucket = TokenBucket(rate, capacity, self._clock, self._sleep)
+                    self._buckets[key] = bucket
+        return bucket
+
+    def acquire(self, key: str, max_wait: Optional[float] = None) -> float:
+        """Wait for a token from the upstream's bucket"""
+        return self.bucket(key).acquire(self.max_wait if max_wait is None else max_wait)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Counters for every bucket"""
+        with self._lock:
+            buckets = dict(self._buckets)
+        return {key: bucket.stats() for key, bucket in sorted(buckets.items())}
+
+    def reset(self):
+        """Drop all buckets so they are rebuilt from current configuration"""
+        with self._lock:
+            buckets, self._buckets = self._buckets, {}
+        for bucket in buckets.values():
+            if isinstance(bucket, SharedTokenBucket):
+                bucket.close()
@@ -0,0 +1,144 @@
+"""
+Local full-text search over every title the backend has fetched
+Backed by an SQLite FTS5 index (anime_catalog_fts) over the anime_catalog table.
+"""
+
+import logging
+import re
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# bm25 column weights: title, english_title, genres, synopsis
+RANK_WEIGHTS = (10.0, 8.0, 2.0, 1.0)
+
+
+def fts_query(text: str) -> Optional[str]:
+    """Turn free text into an FTS5 query where every token is prefix-matched"""
+    tokens = TOKEN_RE.findall(text.lower())
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+class SearchIndex:
+    """Incrementally updated catalog of known titles with ranked prefix search"""
+
+    def __init__(self, get_db):
+        self._get_db = get_db
+        self._available: Optional[bool] = None
+        self.indexed = 0
+        self.queries = 0
+
+    def available(self) -> bool:
+        """Whether the FTS5 index exists in the current database"""
+        if self._available is None:
+            with self._get_db().connection() as conn:
+                row = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'anime_catalog_fts'"
+                ).fetchone()
+            self._available = row is not None
+            if not self._available:
+                logger.warning("SQLite FTS5 unavailable, local search disabled")
+        return self._available
+
+    def reset(self):
+        """Forget cached availability (after switching databases)"""
+        self._available = None
+
+    def upsert(self, conn: sqlite3.Connection, provider: str, entries: Iterable[Dict]) -> int:
+        """Insert or refresh catalog rows; empty fields never overwrite known ones"""
+        rows = []
+        now = time.time()
+        for entry in entries:
+            anime_id = str(entry.get('id') or '')
+            if not anime_id or not entry.get('title'):
+                continue
+            genres = entry.get('genres') or []
+            genres_text = ', '.join(genres) if isinstance(genres, list) else str(genres)
+            rows.append((
+                provider, anime_id, entry.get('title') or None, entry.get('english_title') or None,
+                genres_text or None,
+                entry.get('synopsis') or None, entry.get('image') or None,
+                str(entry.get('releaseDate') or entry.get('year') or '') or None,
+                entry.get('status') or None, now
+            ))
+        conn.executemany("""
+            INSERT INTO anime_catalog
+                (provider, anime_id, title, english_title, genres, synopsis, image, release_date, status, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (provider, anime_id) DO UPDATE SET
+                title = COALESCE(excluded.title, title),
+                english_title = COALESCE(excluded.english_title, english_title),
+                genres = COALESCE(excluded.genres, genres),
+                synopsis = COALESCE(excluded.synopsis, synopsis),
+                image = COALESCE(excluded.image, image),
+                release_date = COALESCE(excluded.release_date, release_date),
+                status = COALESCE(excluded.status, status),
+                updated_at = excluded.updated_at
+        """, rows)
+        return len(rows)
+
+    def index_payload(self, key: str, data: Dict) -> int:
+        """Index a cache payload by its key: search_<provider>_<query> or info_<provider>_<id>"""
+        if not self.available() or not isinstance(data, dict):
+            return 0
+        provider = data.get('provider')
+        if not provider:
+            return 0
+        if key.startswith('search_'):
+            entries = data.get('results') or []
+        elif key.startswith('info_'):
+            entries = [data]
+        else:
+            return 0
+        with self._get_db().connection() as conn:
+            count = self.upsert(conn, provider, entries)
+        self.indexed += count
+        return count
+
+    def search(self, query: str, limit: int = 20, provider: Optional[str] = None) -> List[Dict]:
+        """Ranked results in the same shape as provider search results"""
+        match = fts_query(query)
+        if not match or not self.available():
+            return []
+        sql = f"""
+            SELECT c.provider, c.anime_id, c.title, c.english_title, c.image, c.release_date, c.status
+            FROM anime_catalog_fts
+            JOIN anime_catalog c ON c.rowid = anime_catalog_fts.rowid
+            WHERE anime_catalog_fts MATCH ?
+            {"AND c.provider = ?" if provider else ""}
+            ORDER BY bm25(anime_catalog_fts, {', '.join(str(w) for w in RANK_WEIGHTS)})
+            LIMIT ?
+        """
+        params = [match] + ([provider] if provider else []) + [limit]
+        with self._get_db().connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        self.queries += 1
+        return [{
+            'id': row[1],
+            'title': row[2],
+            'english_title': row[3] or row[2],
+            'image': row[4] or '',
+            'releaseDate': row[5] or '',
+            'status': row[6] or 'Unknown',
+            'provider': row[0],
+            'url': f"/anime/{row[0]}/{row[1]}"
+        } for row in rows]
+
+    def count(self) -> int:
+        """Titles in the catalog"""
+        with self._get_db().connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM anime_catalog").fetchone()[0]
+
+    def stats(self) -> Dict:
+        return {
+            'available': self.available(),
+            'titles': self.count(),
+            'indexed': self.indexed,
+            'queries': self.queries,
+        }
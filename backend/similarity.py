@@ -0,0 +1,175 @@
+"""
+Title normalization and fuzzy cross-provider deduplication
+Titles are reduced to a canonical form, exact canonical matches are grouped
+by hash, and the remaining near-duplicates are found with one-permutation
+MinHash signatures and LSH banding, so merging stays near-linear.
+"""
+
+import re
+import unicodedata
+import zlib
+from typing import Dict, List, Sequence, Tuple
+
+TAG_RE = re.compile(r"[\(\[]\s*(?:dub|dubbed|sub|subbed|uncensored|tv|hd|english dub)\s*[\)\]]", re.IGNORECASE)
+ORDINAL_SEASON_RE = re.compile(r"\b(\d+)(?:st|nd|rd|th)\s+season\b")
+SHORT_SEASON_RE = re.compile(r"\bs(\d+)\b")
+PART_RE = re.compile(r"\b(?:part|cour)\s+(\d+)\b")
+TRAILING_ROMAN_RE = re.compile(r"\s(ii|iii|iv|v|vi)$")
+FIRST_SEASON_RE = re.compile(r"\bseason 1\b")
+SEQUEL_MARK_RE = re.compile(r"\b(?:season|part)\s+\d+\b")
+NON_WORD_RE = re.compile(r"[^\w]+", re.UNICODE)
+NUMBER_RE = re.compile(r"\d+")
+ROMAN = {'ii': 2, 'iii': 3, 'iv': 4, 'v': 5, 'vi': 6}
+
+# MinHash / LSH parameters: BANDS * ROWS bins, tuned for a ~0.7 Jaccard threshold
+BANDS = 6
+ROWS = 3
+BINS = BANDS * ROWS
+SHINGLE = 3
+EMPTY_BIN = 0xFFFFFFFF
+
+
+def canonical_title(title: str) -> str:
+    """Canonical form: no accents, case, punctuation or dub tags; seasons spelled 'season N'"""
+    text = unicodedata.normalize('NFKD', title or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = TAG_RE.sub(' ', text)
+    text = NON_WORD_RE.sub(' ', text).strip()
+    text = ORDINAL_SEASON_RE.sub(r'season \1', text)
+    text = SHORT_SEASON_RE.sub(r'season \1', text)
+    text = PART_RE.sub(r'part \1', text)
+    text = TRAILING_ROMAN_RE.sub(lambda m: f" season {ROMAN[m.group(1)]}", text)
+    text = FIRST_SEASON_RE.sub(' ', text)
+    return ' '.join(text.split())
+
+
+def is_dub(title: str) -> bool:
+    """Whether a provider title marks the dubbed release"""
+    return bool(re.search(r"[\(\[]\s*(?:english\s+)?dub(?:bed)?\s*[\)\]]", title or '', re.IGNORECASE))
+
+
+def shingles(text: str) -> set:
+    """Character n-grams of the padded canonical title"""
+    padded = f" {text} "
+    if len(padded) <= SHINGLE:
+        return {padded}
+    return {padded[i:i + SHINGLE] for i in range(len(padded) - SHINGLE + 1)}
+
+
+def signature(grams: set) -> Tuple[int, ...]:
+    """One-permutation MinHash: one hash per shingle, minimum kept per bin"""
+    bins = [EMPTY_BIN] * BINS
+    for gram in grams:
+        h = zlib.crc32(gram.encode('utf-8'))
+        slot = h % BINS
+        value = h // BINS
+        if value < bins[slot]:
+            bins[slot] = value
+    # Densify: empty bins borrow from the next filled bin so short titles still band together
+    for i in range(BINS):
+        if bins[i] == EMPTY_BIN:
+            for step in range(1, BINS):
+                borrowed = bins[(i + step) % BINS]
+                if borrowed != EMPTY_BIN:
+                    bins[i] = borrowed + step
+                    break
+    return tuple(bins)
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # Keep the lower index (higher priority) as the root
+            if rb < ra:
+                ra, rb = rb, ra
+            self.parent[rb] = ra
+
+
+def cluster_titles(titles: Sequence[str], threshold: float = 0.7) -> List[int]:
+    """Cluster id (index of the cluster's first title) for every title"""
+    forms = [canonical_title(t) for t in titles]
+    uf = _UnionFind(len(titles))
+
+    # Exact canonical matches
+    first_by_form: Dict[str, int] = {}
+    for i, form in enumerate(forms):
+        if form in first_by_form:
+            uf.union(first_by_form[form], i)
+        else:
+            first_by_form[form] = i
+
+    # Near matches among distinct canonical forms
+    reps = list(first_by_form.values())
+    # Season/part markers are compared exactly via the bucket key, not shingled,
+    # so the shared 'season N' text does not pull unrelated sequels together
+    grams = {i: shingles(' '.join(SEQUEL_MARK_RE.sub(' ', forms[i]).split())) for i in reps}
+    buckets: Dict[Tuple, List[int]] = {}
+    for i in reps:
+        sig = signature(grams[i])
+        # Different season/part/movie numbers are different shows, so they never share a bucket
+        numbers = tuple(NUMBER_RE.findall(forms[i]))
+        for band in range(BANDS):
+            key = (band, numbers, sig[band * ROWS:(band + 1) * ROWS])
+            buckets.setdefault(key, []).append(i)
+
+    checked = set()
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                a, b = members[x], members[y]
+                if (a, b) in checked:
+                    continue
+                checked.add((a, b))
+                if jaccard(grams[a], grams[b]) >= threshold:
+                    uf.union(a, b)
+
+    return [uf.find(i) for i in range(len(titles))]
+
+
+def merge_results(results: List[Dict], threshold: float = 0.7) -> List[Dict]:
+    """Collapse near-duplicate titles across providers, keeping priority order
+
+    The first result of each cluster is the representative (copied, never mutated);
+    it gains 'providers', the provider/id of every merged result.
+    """
+    if not results:
+        return []
+    clusters = cluster_titles([r.get('title') or '' for r in results], threshold)
+    merged: Dict[int, Dict] = {}
+    order: List[int] = []
+    for result, root in zip(results, clusters):
+        source = {
+            'provider': result.get('provider', ''),
+            'id': result.get('id', ''),
+            'url': result.get('url', ''),
+            'dub': is_dub(result.get('title') or '')
+        }
+        entry = merged.get(root)
+        if entry is None:
+            entry = dict(result)
+            entry['providers'] = []
+            merged[root] = entry
+            order.append(root)
+        # Already-merged results bring their own provider lists along
+        for item in result.get('providers') or [source]:
+            if item not in entry['providers']:
+                entry['providers'].append(item)
+    return [merged[root] for root in order]
@@ -0,0 +1,90 @@
+"""
+Request coalescing for identical upstream fetches
+Concurrent callers asking for the same key share one in-flight call and its result
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class FlightTimeout(Exception):
+    """Raised to a waiting caller when the in-flight call does not finish in time"""
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; followers wait on the leader's outcome"""
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """Return fn()'s result, sharing it with concurrent callers of the same key
+
+        Exceptions raised by the leader are re-raised in every follower.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            wait = self.timeout if timeout is None else timeout
+            if not call.done.wait(wait):
+                with self._lock:
+                    self.timeouts += 1
+                raise FlightTimeout(f"in-flight call for {key!r} did not finish within {wait}s")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def in_flight(self) -> int:
+        """Number of keys currently being fetched"""
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict:
+        """Leader/coalesced/timeout counters"""
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'timeouts': self.timeouts,
+                'errors': self.errors,
+            }
@@ -0,0 +1,177 @@
+"""
+In-memory typeahead over known titles
+A sorted array of normalized title keys (one per word start) answers prefix
+lookups with bisect; matches are ranked by a popularity weight.
+"""
+
+import heapq
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+NON_WORD_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+# Rough per-object overheads used for the memory ceiling
+ENTRY_OVERHEAD = 240
+KEY_OVERHEAD = 120
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return NON_WORD_RE.sub(' ', text.lower()).strip()
+
+
+class Suggestion:
+    __slots__ = ('title', 'anime_id', 'provider', 'image', 'weight', 'keys')
+
+    def __init__(self, title: str, anime_id: str, provider: str, image: str, weight: float):
+        self.title = title
+        self.anime_id = anime_id
+        self.provider = provider
+        self.image = image
+        self.weight = weight
+        self.keys: Tuple[str, ...] = ()
+
+    def size(self) -> int:
+        return ENTRY_OVERHEAD + len(self.title) + len(self.anime_id) + len(self.image) + \
+            sum(KEY_OVERHEAD + len(key) for key in self.keys)
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.anime_id,
+            'title': self.title,
+            'image': self.image,
+            'provider': self.provider,
+            'url': f"/anime/{self.provider}/{self.anime_id}"
+        }
+
+
+def title_keys(*titles: str) -> Tuple[str, ...]:
+    """Every suffix of the normalized titles that starts at a word boundary"""
+    keys = set()
+    for title in titles:
+        words = normalize(title).split()
+        for i in range(len(words)):
+            keys.add(' '.join(words[i:]))
+    return tuple(keys)
+
+
+class SuggestIndex:
+    """Prefix index with popularity-weighted top-K lookups and a memory ceiling"""
+
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._titles: Dict[str, Suggestion] = {}  # normalized title -> suggestion
+        self._pending: List[Suggestion] = []
+        # (sorted keys, suggestion per key) swapped as one tuple so readers never see a torn pair
+        self._index: Tuple[List[str], List[Suggestion]] = ([], [])
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Short prefixes match many keys, so their top-K lists are memoized until the next change
+        self._top_cache: Dict[Tuple[str, int], List[Dict]] = {}
+        self.evictions = 0
+        self.rebuilds = 0
+
+    def add(self, entries: Iterable[Dict], provider: Optional[str] = None, weight: float = 1.0) -> int:
+        """Add or re-weight titles from search/info/trending results"""
+        added = 0
+        with self._lock:
+            for entry in entries:
+                title = entry.get('title') or ''
+                if isinstance(title, dict):  # some providers return {romaji, english}
+                    title = title.get('english') or title.get('romaji') or ''
+                name = normalize(title)
+                if not name:
+                    continue
+                existing = self._titles.get(name)
+                self._top_cache = {}
+                if existing is not None:
+                    existing.weight += weight
+                    continue
+                suggestion = Suggestion(title, str(entry.get('id') or ''),
+                                        entry.get('provider') or provider or '',
+                                        entry.get('image') or '', weight)
+                suggestion.keys = title_keys(title, entry.get('english_title') or '')
+                self._titles[name] = suggestion
+                self._pending.append(suggestion)
+                self._bytes += suggestion.size()
+                added += 1
+            if self._bytes > self.max_bytes:
+                self._evict()
+        return added
+
+    def _evict(self):
+        """Drop the least popular titles until under 90% of the ceiling (lock held)"""
+        target = self.max_bytes * 0.9
+        for name, suggestion in sorted(self._titles.items(), key=lambda item: item[1].weight):
+            if self._bytes <= target:
+                break
+            del self._titles[name]
+            self._bytes -= suggestion.size()
+            self.evictions += 1
+        self._pending = []
+        self._rebuild(list(self._titles.values()))
+
+    def _rebuild(self, suggestions: List[Suggestion]):
+        pairs = sorted((key, id(s), s) for s in suggestions for key in s.keys)
+        self._index = ([p[0] for p in pairs], [p[2] for p in pairs])
+        self._top_cache = {}
+        self.rebuilds += 1
+
+    def _merge_pending(self):
+        """Fold newly added titles into the sorted arrays"""
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            keys, refs = self._index
+            new_pairs = sorted((key, id(s), s) for s in pending for key in s.keys)
+            merged = list(heapq.merge(
+                zip(keys, map(id, refs), refs), new_pairs,
+                key=lambda p: (p[0], p[1])
+            ))
+            self._index = ([p[0] for p in merged], [p[2] for p in merged])
+            self._top_cache = {}
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Dict]:
+        """Top titles whose words start with prefix, most popular first"""
+        query = normalize(prefix)
+        if not query:
+            return []
+        if self._pending:
+            self._merge_pending()
+        top_cache = self._top_cache
+        cached = top_cache.get((query, limit))
+        if cached is not None:
+            return cached
+        keys, refs = self._index
+        lo = bisect_left(keys, query)
+        hi = bisect_left(keys, query + '\uffff', lo)
+        unique = {id(s): s for s in refs[lo:hi]}.values()
+        best = [s.to_dict() for s in heapq.nlargest(limit, unique, key=lambda s: s.weight)]
+        if len(query) <= 2:
+            top_cache[(query, limit)] = best
+        return best
+
+    def clear(self):
+        with self._lock:
+            self._titles.clear()
+            self._pending = []
+            self._index = ([], [])
+            self._top_cache = {}
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'titles': len(self._titles),
+                'keys': len(self._index[0]) + sum(len(s.keys) for s in self._pending),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+                'rebuilds': self.rebuilds,
+            }
@@ -0,0 +1,93 @@
+"""
+Pooled HTTP client for the upstream APIs (Consumet, Jikan)
+Keeps one keep-alive connection pool per host so small JSON calls skip the TCP+TLS handshake.
+The client itself never retries: callers retry so every attempt is charged to the rate limiter.
+"""
+
+import threading
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+Timeout = Union[float, Tuple[float, float]]
+
+# Attempt outcomes worth another try for idempotent GETs: 5xx and connection errors. Not timeouts,
+# and not 429 ('throttled'), which is the upstream asking us to slow down
+RETRY_OUTCOMES = ('server_error', 'error')
+# Outcomes that count against a provider's health: 5xx, timeouts and connection errors. A 404 or
+# other 4xx is the provider answering correctly about a missing item
+FAILURE_OUTCOMES = ('server_error', 'timeout', 'error')
+
+
+def status_outcome(status: int) -> str:
+    """Outcome of an attempt that got a response: ok, throttled (429), server_error or client_error"""
+    if status == 200:
+        return 'ok'
+    if status == 429:
+        return 'throttled'
+    return 'server_error' if status >= 500 else 'client_error'
+
+
+class UpstreamClient:
+    """Thread-safe HTTP client with a dedicated keep-alive pool per upstream host"""
+
+    def __init__(self, pool_connections: int = 4, pool_maxsize: int = 16,
+                 connect_timeout: float = 3.05, read_timeout: float = 15,
+                 headers: Optional[Dict[str, str]] = None):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.timeout = (connect_timeout, read_timeout)
+        self.headers = dict(headers or {})
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def _new_session(self) -> requests.Session:
+        """Build a session whose adapter keeps connections alive for reuse"""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=0,
+            pool_block=False,
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update(self.headers)
+        return session
+
+    def session_for(self, url: str) -> requests.Session:
+        """Return the shared session for the URL's host, creating it on first use"""
+        parts = urlsplit(url)
+        host_key = f"{parts.scheme}://{parts.netloc}"
+        session = self._sessions.get(host_key)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host_key)
+                if session is None:
+                    session = self._new_session()
+                    self._sessions[host_key] = session
+        return session
+
+    def get(self, url: str, params: Optional[Dict] = None,
+            headers: Optional[Dict[str, str]] = None,
+            timeout: Optional[Timeout] = None, **kwargs) -> requests.Response:
+        """GET through the host's pool; timeout defaults to (connect, read)"""
+        return self.session_for(url).get(
+            url, params=params, headers=headers,
+            timeout=timeout if timeout is not None else self.timeout, **kwargs
+        )
+
+    def hosts(self):
+        """Hosts that currently have a pool"""
+        with self._lock:
+            return list(self._sessions.keys())
+
+    def close(self):
+        """Close every pooled connection"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
@@ -0,0 +1,130 @@
+"""
+Proactive cache warming
+Jobs run on their own intervals from a scheduler driven by an injectable
+clock. Every upstream request a job wants to make is charged to a warming
+budget first and skipped (never queued) when the budget or the upstream's
+rate-limit headroom is short, so warming never delays user requests.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from ratelimit import RateLimitExceeded, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class WarmBudget:
+    """Spend-or-skip request budget: a token bucket of its own plus the upstream's spare tokens"""
+
+    def __init__(self, rate: float, burst: float, headroom: Callable[[str], bool] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self._bucket = TokenBucket(rate, burst, clock=clock)
+        self._headroom = headroom or (lambda upstream: True)  # upstream key -> may we send now
+        self._lock = threading.Lock()
+        self.spent = 0
+        self.skipped = 0
+
+    def take(self, upstream: str) -> bool:
+        """Charge one request to `upstream` ('consumet:<provider>', 'jikan'); False means skip it"""
+        allowed = self._headroom(upstream)
+        if allowed:
+            try:
+                self._bucket.reserve(max_wait=0)
+            except RateLimitExceeded:
+                allowed = False
+        with self._lock:
+            if allowed:
+                self.spent += 1
+            else:
+                self.skipped += 1
+        return allowed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'spent': self.spent, 'skipped': self.skipped,
+                    'rate': self._bucket.rate, 'burst': self._bucket.capacity}
+
+
+class _Job:
+    def __init__(self, name: str, interval: float, run: Callable[[WarmBudget], int], next_run: float):
+        self.name = name
+        self.interval = interval
+        self.run = run  # returns how many entries it warmed
+        self.next_run = next_run
+        self.runs = 0
+        self.warmed = 0
+        self.errors = 0
+        self.last_run: Optional[float] = None
+
+
+class CacheWarmer:
+    """Interval scheduler for warming jobs sharing one WarmBudget"""
+
+    def __init__(self, budget: WarmBudget, clock: Callable[[], float] = time.monotonic, tick: float = 5.0):
+        self.budget = budget
+        self._clock = clock
+        self.tick = tick  # seconds between checks for due jobs
+        self._jobs: List[_Job] = []
+        self._lock = threading.Lock()  # one pass at a time
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_job(self, name: str, interval: float, run: Callable[[WarmBudget], int], delay: float = 0):
+        """Run `run(budget)` every interval seconds, first after delay"""
+        self._jobs.append(_Job(name, interval, run, self._clock() + delay))
+
+    def run_pending(self) -> Dict[str, int]:
+        """Run every job that is due, in registration order; entries warmed per job"""
+        warmed = {}
+        with self._lock:
+            for job in self._jobs:
+                now = self._clock()
+                if now < job.next_run:
+                    continue
+                job.next_run = now + job.interval
+                job.last_run = now
+                job.runs += 1
+                try:
+                    count = job.run(self.budget) or 0
+                except Exception as e:
+                    logger.error(f"Cache warming job {job.name} failed: {str(e)}")
+                    job.errors += 1
+                    continue
+                job.warmed += count
+                warmed[job.name] = count
+        if any(warmed.values()):
+            logger.info(f"Cache warming refreshed {warmed}")
+        return warmed
+
+    def _loop(self):
+        while not self._stop.wait(self.tick):
+            self.run_pending()
+
+    def start(self):
+        """Check for due jobs every tick seconds on a daemon thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='cache-warmer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def stats(self) -> Dict:
+        now = self._clock()
+        return {
+            'budget': self.budget.stats(),
+            'jobs': {job.name: {
+                'interval': job.interval,
+                'runs': job.runs,
+                'warmed': job.warmed,
+                'errors': job.errors,
+                'due_in': round(max(0.0, job.next_run - now), 3),
+            } for job in self._jobs},
+        }
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bytes on disk and decode time per cache payload codec
+Run with zstandard installed to include the zstd codec.
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from codec import CODECS
+from fixtures import info_payload, search_payload, streaming_payload
+
+ROUNDS = 200
+
+FIXTURES = {
+    'search (20 results)': search_payload(),
+    'info (1100 episodes)': info_payload(),
+    'stream links': streaming_payload(),
+}
+
+
+def main():
+    print(f"{'payload':<22} {'codec':<6} {'bytes':>9} {'ratio':>7} {'decode+parse us':>16}")
+    for label, payload in FIXTURES.items():
+        text = json.dumps(payload).encode('utf-8')
+        for name, codec in CODECS.items():
+            blob = codec.encode(text)
+            started = time.perf_counter()
+            for _ in range(ROUNDS):
+                json.loads(codec.decode(blob))
+            per_call = (time.perf_counter() - started) / ROUNDS * 1e6
+            print(f"{label:<22} {name:<6} {len(blob):>9} {len(text) / len(blob):>6.1f}x {per_call:>16.1f}")
+
+
+if __name__ == '__main__':
+    main()
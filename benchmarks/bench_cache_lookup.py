@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: SQLite cache lookups per second
+Compares the old connect-per-lookup pattern with the pooled WAL connections in db.py
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from db import Database
+
+ROWS = 2000
+LOOKUPS = 20000
+
+QUERY = "SELECT data, expires_at FROM anime_cache WHERE id = ?"
+
+
+def populate(path):
+    with sqlite3.connect(path) as conn:
+        conn.execute("""
+            CREATE TABLE anime_cache (
+                id TEXT PRIMARY KEY, provider TEXT, data TEXT,
+                cached_at TIMESTAMP, expires_at TIMESTAMP
+            )
+        """)
+        payload = json.dumps({'results': [{'id': f"anime-{i}", 'title': f"Anime {i}"} for i in range(20)]})
+        conn.executemany(
+            "INSERT INTO anime_cache VALUES (?, 'gogoanime', ?, datetime('now'), '2999-01-01T00:00:00')",
+            [(f"search_gogoanime_{i}", payload) for i in range(ROWS)]
+        )
+
+
+def connect_per_lookup(path):
+    for i in range(LOOKUPS):
+        with sqlite3.connect(path) as conn:
+            conn.execute(QUERY, (f"search_gogoanime_{i % ROWS}",)).fetchone()
+
+
+def pooled(path):
+    db = Database(path)
+    for i in range(LOOKUPS):
+        with db.connection() as conn:
+            conn.execute(QUERY, (f"search_gogoanime_{i % ROWS}",)).fetchone()
+    db.close()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        populate(path)
+        print(f"{LOOKUPS} lookups over {ROWS} rows")
+        for name, fn in (('connect per lookup', connect_per_lookup), ('pooled WAL', pooled)):
+            started = time.perf_counter()
+            fn(path)
+            elapsed = time.perf_counter() - started
+            print(f"  {name:<20} {LOOKUPS / elapsed:>10.0f} lookups/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Measurement: bytes on the wire and server CPU per request, with and without compression
+Static files are compared served from disk as before (send_from_directory,
+uncompressed), compressed on the fly per request (gzip level 6), and from the
+precompressed in-memory copies. API bodies (an episode page and a search) are
+compared uncompressed and with per-request gzip (and brotli when installed).
+Runs in process through Flask's test client, so CPU is the application's own
+work per request, without socket I/O.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'backend'))
+sys.path.insert(0, HERE)
+
+import app as backend
+from compression import available_encodings, compress
+from loadtest import LatencyStub
+
+STATIC = ['index.html', 'app.js', 'styles.css', 'assets/hls.min.js']
+API = ['/api/anime/gogoanime/one-piece/episodes?limit=100', '/api/search?q=frieren']
+
+
+def wire_bytes(response, body: bytes) -> int:
+    head = len(f"HTTP/1.1 {response.status}\r\n") + 2
+    return head + sum(len(name) + len(value) + 4 for name, value in response.headers.items()) + len(body)
+
+
+def measure(client, path: str, headers: dict, count: int):
+    """(bytes on the wire, CPU microseconds) per request"""
+    size = 0
+    started = time.process_time()
+    for _ in range(count):
+        response = client.get(path, headers=headers)
+        body = response.get_data()
+        size = wire_bytes(response, body)
+        response.close()
+    return size, (time.process_time() - started) / count * 1e6
+
+
+def gzip_cost(body: bytes, count: int) -> float:
+    """CPU microseconds to gzip a body per request"""
+    started = time.process_time()
+    for _ in range(count):
+        compress(body, 'gzip', 6)
+    return (time.process_time() - started) / count * 1e6
+
+
+def row(label: str, size: int, cpu: float, baseline: int):
+    print(f"  {label:<22} {size / 1024:>10.1f} {100.0 * size / baseline:>7.1f}% {cpu:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200, help='requests per measurement')
+    args = parser.parse_args()
+
+    stub = LatencyStub(latency=0, episodes=500)
+    backend.Config.CONSUMET_BASE_URL = stub.url
+    backend.Config.JIKAN_BASE_URL = stub.url + '/v4'
+    backend.Config.CONSUMET_RATE_LIMIT = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        backend.Config.DATABASE_PATH = os.path.join(tmp, 'bench.db')
+        backend.init_database()
+        client = backend.app.test_client()
+        started = time.perf_counter()
+        backend.static_assets()
+        print(f"static assets precompressed at startup in {time.perf_counter() - started:.2f} s "
+              f"({', '.join(available_encodings())})")
+        print(f"  {'':<22} {'KiB/req':>10} {'of raw':>8} {'CPU us/req':>10}")
+
+        accept = {'Accept-Encoding': 'br, gzip'}
+        for path in STATIC:
+            backend.Config.STATIC_MEMORY_MAX_BYTES = 0
+            backend.static_files = None  # nothing held in memory: the previous send_from_directory path
+            raw, raw_cpu = measure(client, f"/{path}" if path != 'index.html' else '/', {}, args.requests)
+            backend.Config.STATIC_MEMORY_MAX_BYTES = 4 * 1024 * 1024
+            backend.static_files = None
+            backend.static_assets()
+            body = open(os.path.join(backend.STATIC_DIR, path), 'rb').read()
+            precompressed, cpu = measure(client, f"/{path}" if path != 'index.html' else '/', accept, args.requests)
+            on_the_fly = raw_cpu + gzip_cost(body, max(1, args.requests // 10))
+            print(path)
+            row('disk, uncompressed', raw, raw_cpu, raw)
+            row('gzip per request', len(compress(body, 'gzip', 6)) + raw - len(body), on_the_fly, raw)
+            row('precompressed', precompressed, cpu, raw)
+
+        client.get(API[0])  # warm the cache: only response encoding is measured
+        client.get(API[1])
+        for path in API:
+            raw, raw_cpu = measure(client, path, {}, args.requests)
+            print(path)
+            row('uncompressed', raw, raw_cpu, raw)
+            for coding in available_encodings():
+                size, cpu = measure(client, path, {'Accept-Encoding': coding}, args.requests)
+                row(f"{coding} per request", size, cpu, raw)
+        backend.get_db().close()
+    stub.stop()
+
+
+if __name__ == '__main__':
+    main()
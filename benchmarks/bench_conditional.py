@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Measurement: bytes saved by ETag revalidation for polling clients
+Simulates clients polling /api/trending, /api/recent and one title page each
+round through the Flask app against a local stub upstream. Clients that send
+If-None-Match with their last ETag get an empty 304 until the list changes
+(every --change-every rounds); the baseline re-downloads every body. Sizes
+count the status line, headers and body as they would go over the wire,
+before any compression.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'backend'))
+sys.path.insert(0, HERE)
+
+import app as backend
+from loadtest import LatencyStub
+
+PATHS = ['/api/trending', '/api/recent', '/api/anime/gogoanime/bench-title']
+
+
+def wire_bytes(response) -> int:
+    head = len(f"HTTP/1.1 {response.status}\r\n") + 2
+    head += sum(len(name) + len(value) + 4 for name, value in response.headers.items())
+    return head + len(response.get_data())
+
+
+def change_lists(round_number: int):
+    """Publish a new trending and recent list, as a refresh with new airings would"""
+    for key, store in ((backend.TRENDING_CACHE_KEY, lambda results: backend.store_trending(results, 'gogoanime')),
+                       (backend.RECENT_CACHE_KEY, lambda results: backend.store_recent({'results': results}))):
+        data = backend.get_from_cache(key)
+        results = [dict(item) for item in data['results']]
+        results[0]['title'] = f"{results[0].get('title', '')} (round {round_number})"
+        store(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=10, help='polls per client')
+    parser.add_argument('--change-every', type=int, default=5, help='rounds between list changes (0 never)')
+    args = parser.parse_args()
+
+    stub = LatencyStub(latency=0)
+    backend.Config.CONSUMET_BASE_URL = stub.url
+    backend.Config.JIKAN_BASE_URL = stub.url + '/v4'
+    backend.Config.CONSUMET_RATE_LIMIT = 0
+    backend.Config.JIKAN_RATE_LIMIT = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        backend.Config.DATABASE_PATH = os.path.join(tmp, 'bench.db')
+        backend.init_database()
+        client = backend.app.test_client()
+
+        baseline = conditional = not_modified = 0
+        etags = [dict() for _ in range(args.clients)]
+        for round_number in range(args.rounds):
+            if round_number and args.change_every and round_number % args.change_every == 0:
+                change_lists(round_number)
+            for known in etags:
+                for path in PATHS:
+                    full = client.get(path)
+                    baseline += wire_bytes(full)
+                    headers = {'If-None-Match': known[path]} if path in known else {}
+                    response = client.get(path, headers=headers)
+                    conditional += wire_bytes(response)
+                    if response.status_code == 304:
+                        not_modified += 1
+                    else:
+                        known[path] = response.headers['ETag']
+        backend.get_db().close()
+    stub.stop()
+
+    requests_made = args.clients * args.rounds * len(PATHS)
+    per_1k = 1000.0 / args.clients
+    print(f"{args.clients} clients x {args.rounds} polls of {len(PATHS)} endpoints, "
+          f"lists change every {args.change_every or 'never'} rounds")
+    print(f"{'':<24} {'MB total':>10} {'MB per 1k clients':>18}")
+    print(f"{'full bodies':<24} {baseline / 1e6:>10.2f} {baseline * per_1k / 1e6:>18.2f}")
+    print(f"{'If-None-Match':<24} {conditional / 1e6:>10.2f} {conditional * per_1k / 1e6:>18.2f}")
+    print(f"saved {100.0 * (baseline - conditional) / baseline:.1f}% "
+          f"({(baseline - conditional) * per_1k / args.rounds / 1e3:.0f} kB per 1k clients per poll); "
+          f"{not_modified}/{requests_made} answered 304")
+
+
+if __name__ == '__main__':
+    main()
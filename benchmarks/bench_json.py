@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Measurement: JSON serialization cost per endpoint, by backend
+First the encode and decode time of each endpoint's response body with every
+installed JSON backend, then the CPU per request of those endpoints served
+from a warm cache through the Flask app, with the stdlib backend and with the
+fastest installed one. Trending is also measured with the pass-through of the
+cached bytes turned off, i.e. decoded and re-encoded as before.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'backend'))
+sys.path.insert(0, HERE)
+
+import app as backend
+from fixtures import info_payload, search_payload, streaming_payload
+from jsonbackend import BACKENDS, get_backend
+from loadtest import LatencyStub
+
+ENDPOINTS = {
+    '/api/trending': '/api/trending',
+    '/api/search': '/api/search?q=naruto',
+    '/api/anime/<id>': '/api/anime/gogoanime/one-piece',
+    '/api/anime/<id>/episodes': '/api/anime/gogoanime/one-piece/episodes?limit=100',
+    '/api/watch/<episode>': '/api/watch/gogoanime/one-piece-episode-1',
+}
+
+
+def bodies():
+    """A representative response payload per endpoint"""
+    info = info_payload(500)
+    episodes = info.pop('episodes_list')
+    results = search_payload()['results']
+    return {
+        '/api/trending': {'results': results, 'total': len(results), 'source': 'gogoanime'},
+        '/api/search': {'results': results, 'total': len(results), 'query': 'naruto', 'source': 'remote'},
+        '/api/anime/<id>': dict(info, aliases=[]),
+        '/api/anime/<id>/episodes': {'episodes': episodes[:100], 'total': len(episodes), 'offset': 0, 'limit': 100},
+        '/api/watch/<episode>': streaming_payload(),
+    }
+
+
+def per_call(fn, rounds: int) -> float:
+    """Microseconds per call"""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+def cpu_per_request(client, path: str, count: int) -> float:
+    """Application CPU microseconds per request"""
+    started = time.process_time()
+    for _ in range(count):
+        client.get(path).close()
+    return (time.process_time() - started) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=500, help='calls per encode/decode measurement')
+    parser.add_argument('--requests', type=int, default=300, help='requests per endpoint measurement')
+    args = parser.parse_args()
+
+    names = sorted(BACKENDS, key=lambda name: name != 'json')
+    print(f"{'endpoint body':<26} {'bytes':>7} " + ' '.join(f"{name + ' enc/dec us':>20}" for name in names))
+    for endpoint, payload in bodies().items():
+        cells = []
+        for name in names:
+            codec = BACKENDS[name]
+            body = codec.dumps(payload)
+            encode = per_call(lambda: codec.dumps(payload), args.rounds)
+            decode = per_call(lambda: codec.loads(body), args.rounds)
+            cells.append(f"{encode:.1f}/{decode:.1f}")
+        print(f"{endpoint:<26} {len(BACKENDS['json'].dumps(payload)):>7} " + ' '.join(f"{c:>20}" for c in cells))
+
+    fastest = get_backend('auto')
+    stub = LatencyStub(latency=0, episodes=500)
+    backend.Config.CONSUMET_BASE_URL = stub.url
+    backend.Config.JIKAN_BASE_URL = stub.url + '/v4'
+    backend.Config.CONSUMET_RATE_LIMIT = 0
+    backend.Config.COMPRESS_MIN_BYTES = 1 << 30  # measure serialization, not gzip
+    default_cached_body = backend.cached_body
+    with tempfile.TemporaryDirectory() as tmp:
+        backend.Config.DATABASE_PATH = os.path.join(tmp, 'bench.db')
+        backend.init_database()
+        client = backend.app.test_client()
+        for path in ENDPOINTS.values():
+            client.get(path).close()  # warm the cache: only response encoding is measured
+
+        columns = [('json', BACKENDS['json'])] + ([(fastest.name, fastest)] if fastest.name != 'json' else [])
+        print()
+        print(f"{'CPU us per cached request':<34} " + ' '.join(f"{name:>10}" for name, _ in columns))
+        for endpoint, path in ENDPOINTS.items():
+            cells = []
+            for _, codec in columns:
+                backend.json_backend = codec
+                cells.append(cpu_per_request(client, path, args.requests))
+            print(f"{endpoint:<34} " + ' '.join(f"{cpu:>10.0f}" for cpu in cells))
+        backend.cached_body = lambda data, key, table="anime_cache": None
+        cells = []
+        for _, codec in columns:
+            backend.json_backend = codec
+            cells.append(cpu_per_request(client, ENDPOINTS['/api/trending'], args.requests))
+        print(f"{'/api/trending, re-encoded':<34} " + ' '.join(f"{cpu:>10.0f}" for cpu in cells))
+        backend.cached_body = default_cached_body
+        backend.json_backend = fastest
+        backend.get_db().close()
+    stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Measurement: cost of recording metrics
+The time of one histogram observation and one counter increment, then the
+CPU per request of cached endpoints through the Flask app with metrics on and
+off, and the time to render /metrics once every series is populated.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'backend'))
+sys.path.insert(0, HERE)
+
+import app as backend
+from loadtest import LatencyStub
+from metrics import Registry
+
+PATHS = ['/api/trending', '/api/anime/gogoanime/one-piece', '/api/watch/gogoanime/one-piece-episode-1']
+
+
+def per_call(fn, rounds: int) -> float:
+    """Nanoseconds per call"""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds * 1e9
+
+
+def cpu_per_request(client, path: str, count: int) -> float:
+    """Application CPU microseconds per request"""
+    started = time.process_time()
+    for _ in range(count):
+        client.get(path).close()
+    return (time.process_time() - started) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=200000, help='calls per recording measurement')
+    parser.add_argument('--requests', type=int, default=1000, help='requests per endpoint measurement')
+    args = parser.parse_args()
+
+    registry = Registry()
+    histogram = registry.histogram('bench_seconds', 'Bench', ('route', 'status'))
+    counter = registry.counter('bench_total', 'Bench', ('table', 'result'))
+    print(f"histogram observe: {per_call(lambda: histogram.observe(0.003, '/api/trending', '200'), args.rounds):.0f} ns")
+    print(f"counter inc:       {per_call(lambda: counter.inc('anime_cache', 'hit'), args.rounds):.0f} ns")
+
+    stub = LatencyStub(latency=0)
+    backend.Config.CONSUMET_BASE_URL = stub.url
+    backend.Config.JIKAN_BASE_URL = stub.url + '/v4'
+    backend.Config.CONSUMET_RATE_LIMIT = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        backend.Config.DATABASE_PATH = os.path.join(tmp, 'bench.db')
+        backend.init_database()
+        client = backend.app.test_client()
+        for path in PATHS:
+            client.get(path).close()  # warm the cache
+
+        print(f"\n{'CPU us per cached request':<44} {'off':>8} {'on':>8}")
+        for path in PATHS:
+            cells = []
+            for enabled in (False, True):
+                backend.Config.METRICS_ENABLED = enabled
+                cells.append(cpu_per_request(client, path, args.requests))
+            print(f"{path:<44} {cells[0]:>8.0f} {cells[1]:>8.0f}")
+
+        started = time.perf_counter()
+        text = client.get('/metrics').get_data()
+        print(f"\n/metrics: {len(text.splitlines())} lines, {len(text)} bytes, "
+              f"{(time.perf_counter() - started) * 1e3:.1f} ms")
+        backend.get_db().close()
+    stub.stop()
+
+
+if __name__ == '__main__':
+    main()
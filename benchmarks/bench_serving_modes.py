@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Load test: threaded Flask server vs the async (ASGI) server
+Both serve uncached /api/anime requests against a local stub upstream that
+answers after a fixed delay, so throughput is bound by how many requests can
+wait on the upstream at once. Needs aiohttp and uvicorn.
+"""
+
+import argparse
+import os
+import socket
+import sys
+import tempfile
+import threading
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'backend'))
+sys.path.insert(0, HERE)
+
+import app as backend
+from loadtest import LatencyStub, run_load, wait_for_port
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def configure(stub_url: str, db_path: str):
+    backend.Config.CONSUMET_BASE_URL = stub_url
+    backend.Config.JIKAN_BASE_URL = stub_url + '/v4'
+    backend.Config.CONSUMET_RATE_LIMIT = 0
+    backend.Config.JIKAN_RATE_LIMIT = 0
+    backend.Config.HTTP_POOL_MAXSIZE = 1000
+    backend.Config.DATABASE_PATH = db_path
+    backend.rate_limiter.reset()
+    backend.memory_cache.clear()
+    backend.provider_health.reset()
+    backend.http_client.pool_maxsize = 1000
+    backend.http_client.close()
+    backend.init_database()
+
+
+def start_threaded(port: int):
+    from werkzeug.serving import make_server
+    server = make_server('127.0.0.1', port, backend.app, threaded=True)
+    server.socket.listen(1024)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.shutdown
+
+
+def start_async(port: int):
+    import uvicorn
+    import asgi
+    server = uvicorn.Server(uvicorn.Config(asgi.application, host='127.0.0.1', port=port,
+                                           log_level='warning', lifespan='on', backlog=1024))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+
+    def stop():
+        server.should_exit = True
+        thread.join(timeout=10)
+    return stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.1, help='stub upstream delay in seconds')
+    parser.add_argument('--requests', type=int, default=1000, help='requests per run')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[50, 200, 500])
+    args = parser.parse_args()
+
+    stub = LatencyStub(latency=args.latency)
+    print(f"stub upstream latency {args.latency * 1000:.0f} ms, {args.requests} uncached requests per run")
+    print(f"{'mode':<9} {'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode, start in (('threaded', start_threaded), ('async', start_async)):
+            for concurrency in args.concurrency:
+                configure(stub.url, os.path.join(tmp, f"{mode}-{concurrency}.db"))
+                port = free_port()
+                stop = start(port)
+                base = f"http://127.0.0.1:{port}"
+                wait_for_port(base)
+                paths = [f"/api/anime/gogoanime/{mode}-{concurrency}-{i}" for i in range(args.requests)]
+                result = run_load(base, paths, concurrency)
+                stop()
+                print(f"{mode:<9} {concurrency:>7} {result['rps']:>8.0f} {result['p50_ms']:>8.0f} "
+                      f"{result['p99_ms']:>8.0f} {result['errors']:>7}")
+    stub.stop()
+
+
+if __name__ == '__main__':
+    main()
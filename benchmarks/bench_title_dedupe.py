@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cross-provider title merging on synthetic result sets
+Every base title appears under several provider spellings; the per-title cost
+should stay flat as the set grows if merging is near-linear.
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from similarity import merge_results
+
+PROVIDERS = ['gogoanime', 'zoro', '9anime', 'animepahe']
+SYLLABLES = ['ka', 'ki', 'ku', 'shi', 'to', 'na', 'mi', 'ryu', 'sei', 'ten', 'yo', 'ha', 'ro', 'gen', 'zu', 'ma']
+VARIANTS = [
+    lambda t, s: f"{t} Season {s}" if s > 1 else t,
+    lambda t, s: f"{t} {s}nd Season" if s > 1 else f"{t} (TV)",
+    lambda t, s: (f"{t} Season {s}" if s > 1 else t) + " (Dub)",
+    lambda t, s: (f"{t}: S{s}" if s > 1 else t.replace(' ', '-')),
+]
+
+
+def synthetic_results(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    results = []
+    while len(results) < count:
+        base = ' '.join(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+                        for _ in range(rng.randint(2, 4))).title()
+        season = rng.randint(1, 3)
+        for provider, variant in zip(PROVIDERS, VARIANTS):
+            results.append({
+                'id': f"{provider}-{len(results)}",
+                'title': variant(base, season),
+                'provider': provider,
+                'url': f"/anime/{provider}/{len(results)}"
+            })
+    rng.shuffle(results)
+    return results[:count]
+
+
+def main():
+    print(f"{'titles':>7} {'merged':>7} {'seconds':>9} {'us/title':>9}")
+    for count in (1000, 5000, 10000, 20000):
+        results = synthetic_results(count)
+        started = time.perf_counter()
+        merged = merge_results(results)
+        elapsed = time.perf_counter() - started
+        print(f"{count:>7} {len(merged):>7} {elapsed:>9.3f} {elapsed / count * 1e6:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Load test: pre-fork worker scaling from 1 to N processes
+Serves /api/anime through the pre-fork master against a local stub upstream and
+reports throughput per worker count, plus how many requests reached the
+upstream per second when a Consumet rate limit is set (it should stay flat as
+workers are added, because the workers share one set of buckets). Needs aiohttp.
+"""
+
+import argparse
+import os
+import signal
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'backend'))
+sys.path.insert(0, HERE)
+
+import app as backend
+from prefork import PreforkServer
+from loadtest import LatencyStub, run_load, wait_for_port
+
+
+def start_master(workers: int, db_path: str, rate_dir: str, interval: float):
+    backend.Config.DATABASE_PATH = db_path
+    backend.Config.CONSUMET_RATE_LIMIT = interval
+    backend.Config.CONSUMET_BURST = 1
+    backend.Config.RATE_LIMIT_MAX_WAIT = 60
+    backend.rate_limiter.max_wait = 60
+    backend.rate_limiter.shared_dir = rate_dir
+    backend.rate_limiter.reset()
+    backend.init_database()
+    backend.get_db().close()
+    server = PreforkServer(backend.app, port=0, workers=workers, on_worker_start=backend.prefork_worker_start)
+    server.bind()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            server.run()
+        finally:
+            os._exit(0)
+    server.listener.close()
+    return f"http://127.0.0.1:{server.port}", pid
+
+
+def stop_master(pid: int):
+    os.kill(pid, signal.SIGTERM)
+    os.waitpid(pid, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument('--latency', type=float, default=0.02, help='stub upstream delay in seconds')
+    parser.add_argument('--requests', type=int, default=2000, help='requests per run')
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--titles', type=int, default=200, help='distinct titles (repeats are cache hits)')
+    parser.add_argument('--limited-rate', type=float, default=20, help='upstream requests/s for the rate-limited run')
+    args = parser.parse_args()
+
+    backend.Config.JIKAN_RATE_LIMIT = 0
+    backend.Config.HTTP_POOL_MAXSIZE = 256
+    stub = LatencyStub(latency=args.latency)
+    backend.Config.CONSUMET_BASE_URL = stub.url
+    backend.Config.JIKAN_BASE_URL = stub.url + '/v4'
+
+    print(f"{os.cpu_count()} CPU cores, stub latency {args.latency * 1000:.0f} ms, "
+          f"{args.requests} requests over {args.titles} titles, {args.concurrency} clients")
+    print(f"{'limit':<10} {'workers':>7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'upstream/s':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, interval, count in (('none', 0, args.requests),
+                                       (f"{args.limited_rate:g}/s", 1.0 / args.limited_rate, args.requests // 4)):
+            for workers in args.workers:
+                run = f"{label.replace('/', '')}-{workers}"
+                rate_dir = os.path.join(tmp, run)
+                os.mkdir(rate_dir)
+                url, master = start_master(workers, os.path.join(tmp, f"{run}.db"), rate_dir, interval)
+                wait_for_port(url)
+                upstream_before = stub.requests
+                paths = [f"/api/anime/gogoanime/{run}-{i % args.titles}" for i in range(count)]
+                started = time.perf_counter()
+                result = run_load(url, paths, args.concurrency, timeout=120)
+                upstream_rate = (stub.requests - upstream_before) / (time.perf_counter() - started)
+                stop_master(master)
+                print(f"{label:<10} {workers:>7} {result['rps']:>8.0f} {result['p50_ms']:>8.0f} "
+                      f"{result['p99_ms']:>8.0f} {result['errors']:>7} {upstream_rate:>11.1f}")
+    stub.stop()
+
+
+if __name__ == '__main__':
+    main()
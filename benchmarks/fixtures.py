@@ -0,0 +1,60 @@
+"""
+Consumet-shaped payloads for the benchmarks
+"""
+
+
+def search_payload(provider='gogoanime', count=20):
+    """A cached search_<provider>_<query> entry"""
+    return {
+        'provider': provider,
+        'results': [{
+            'id': f"naruto-shippuden-{i}",
+            'title': f"Naruto Shippuden Movie {i}",
+            'english_title': f"Naruto Shippuden Movie {i}",
+            'image': f"https://gogocdn.net/cover/naruto-shippuden-{i}.png",
+            'releaseDate': str(2007 + i % 15),
+            'status': 'Completed',
+            'provider': provider,
+            'url': f"/anime/{provider}/naruto-shippuden-{i}"
+        } for i in range(count)]
+    }
+
+
+def info_payload(episodes=1100, provider='gogoanime'):
+    """A cached info_<provider>_<id> entry for a One Piece-sized show"""
+    return {
+        'id': 'one-piece',
+        'title': 'One Piece',
+        'english_title': 'One Piece',
+        'synopsis': 'Gol D. Roger was known as the Pirate King, the strongest and most infamous being '
+                    'to have sailed the Grand Line. ' * 6,
+        'genres': ['Action', 'Adventure', 'Comedy', 'Drama', 'Fantasy', 'Shounen', 'Super Power'],
+        'episodes': episodes,
+        'totalEpisodes': episodes,
+        'year': '1999',
+        'score': 8.7,
+        'image': 'https://gogocdn.net/cover/one-piece.png',
+        'status': 'Ongoing',
+        'type': 'TV Series',
+        'episodes_list': [{
+            'id': f"one-piece-episode-{n}",
+            'number': n,
+            'url': f"https://gogoanime.cl/one-piece-episode-{n}"
+        } for n in range(1, episodes + 1)],
+        'provider': provider
+    }
+
+
+def streaming_payload(provider='gogoanime'):
+    """A cached stream_<provider>_<episode> entry"""
+    return {
+        'sources': [{
+            'url': f"https://www088.vipanicdn.net/streamhls/0b594d900f47daabc194844092384914/ep.1.1677591044.{q}.m3u8",
+            'isM3U8': True,
+            'quality': q
+        } for q in ('360p', '480p', '720p', '1080p', 'default', 'backup')],
+        'subtitles': [],
+        'intro': {'start': 0, 'end': 90},
+        'outro': {},
+        'provider': provider
+    }
@@ -0,0 +1,110 @@
+"""
+Load-test helpers: a latency-injecting stub upstream and an asyncio load generator
+Used by the serving benchmarks; the load generator needs aiohttp.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+from fixtures import info_payload, search_payload, streaming_payload
+
+
+class LatencyStub:
+    """Consumet-shaped upstream that answers every request after a fixed delay"""
+
+    def __init__(self, latency: float = 0.1, episodes: int = 24):
+        cached_info = info_payload(episodes)
+        # Consumet returns the episode list under 'episodes'
+        info = json.dumps(dict(cached_info, episodes=cached_info.pop('episodes_list'))).encode()
+        search = json.dumps(search_payload()).encode()
+        stream = json.dumps(streaming_payload()).encode()
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                stub.requests += 1
+                time.sleep(latency)
+                body = info if '/info/' in self.path else stream if '/watch/' in self.path else search
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        ThreadingHTTPServer.request_queue_size = 1024
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100.0 * len(ordered)))] if ordered else 0.0
+
+
+async def _load(base_url: str, paths: List[str], concurrency: int, timeout: float) -> Dict:
+    import aiohttp
+
+    queue = list(reversed(paths))
+    latencies, errors = [], 0
+
+    async def worker(session):
+        nonlocal errors
+        while queue:
+            path = queue.pop()
+            started = time.perf_counter()
+            try:
+                async with session.get(base_url + path) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return {
+        'requests': len(paths),
+        'errors': errors,
+        'seconds': elapsed,
+        'rps': len(paths) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def run_load(base_url: str, paths: List[str], concurrency: int, timeout: float = 60) -> Dict:
+    """Fetch every path with `concurrency` clients; throughput and latency percentiles"""
+    return asyncio.run(_load(base_url, paths, concurrency, timeout))
+
+
+def wait_for_port(url: str, timeout: float = 10):
+    """Block until a server answers /api/health"""
+    import urllib.request
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url + '/api/health', timeout=1).read()
+            return
+        except Exception:
+            time.sleep(0.05)
+    raise RuntimeError(f"server at {url} did not come up")
@@ -0,0 +1,99 @@
+"""
+Shared pytest fixtures for the AnimeVerse backend
+"""
+
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+class StubUpstream:
+    """Local HTTP/1.1 server standing in for Consumet/Jikan"""
+
+    def __init__(self):
+        self.routes = {}
+        self.hits = {}
+        self.connections = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                with stub._lock:
+                    stub.hits[path] = stub.hits.get(path, 0) + 1
+                route = stub.routes.get(path)
+                if callable(route):
+                    route = route(self)
+                status, body, headers = route if route else (404, {'error': 'not found'}, {})
+                payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', headers.get('Content-Type', 'application/json'))
+                for name, value in headers.items():
+                    if name != 'Content-Type':
+                        self.send_header(name, value)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def route(self, path, body, status=200, headers=None):
+        """Register a static response (or a callable returning (status, body, headers))"""
+        self.routes[path] = body if callable(body) else (status, body, headers or {})
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_upstream():
+    stub = StubUpstream().start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def backend(tmp_path, stub_upstream, monkeypatch):
+    """The Flask app pointed at a temp database and the stub upstream"""
+    import app as backend_app
+    monkeypatch.setattr(backend_app.Config, 'DATABASE_PATH', str(tmp_path / 'animeverse.db'))
+    monkeypatch.setattr(backend_app.Config, 'SEGMENT_CACHE_DIR', str(tmp_path / 'segments'))
+    monkeypatch.setattr(backend_app.Config, 'CONSUMET_BASE_URL', stub_upstream.url)
+    monkeypatch.setattr(backend_app.Config, 'JIKAN_BASE_URL', stub_upstream.url + '/v4')
+    monkeypatch.setattr(backend_app.Config, 'CONSUMET_RATE_LIMIT', 0)
+    monkeypatch.setattr(backend_app.Config, 'JIKAN_RATE_LIMIT', 0)
+    backend_app.rate_limiter.reset()
+    backend_app.memory_cache.clear()
+    backend_app.suggest_index.clear()
+    backend_app.provider_health.reset()
+    backend_app.watch_hedger.reset()
+    backend_app.metrics.reset()
+    backend_app.init_database()
+    return backend_app
@@ -101,11 +101,15 @@ start_app() {
     local host="${1:-$DEFAULT_HOST}"
     local port="${2:-$(find_available_port)}"
     local debug="${3:-false}"
+    local workers="${4:-}"
     
     log "INFO" "Starting $APP_NAME..."
     log "INFO" "Host: $host"
     log "INFO" "Port: $port"
     log "INFO" "Debug mode: $debug"
+    if [[ -n "$workers" ]]; then
+        log "INFO" "Workers: $workers (0 = one per CPU core)"
+    fi
     
     # Change to backend directory
     cd "$BACKEND_DIR" || error_exit "Failed to change to backend directory"
@@ -118,6 +122,15 @@ start_app() {
     if [[ "$debug" == "true" ]]; then
         debug_flag="--debug"
     fi
+    
+    # Production mode: pre-forked workers sharing the cache and rate limits
+    local server_flags=""
+    if [[ -n "$workers" ]]; then
+        if [[ "$debug" == "true" ]]; then
+            error_exit "--workers cannot be combined with --debug"
+        fi
+        server_flags="--server prefork --workers $workers"
+    fi
 
     if [[ -x "$BIN_LOCAL" ]]; then
         log "INFO" "Starting bundled binary (local)..."
@@ -131,7 +144,7 @@ start_app() {
         export FLASK_APP="app.py"
         export FLASK_ENV="${debug:+development}"
         log "INFO" "Starting Flask server (fallback)..."
-        python3 app.py --host "$host" --port "$port" $debug_flag &
+        python3 app.py --host "$host" --port "$port" $debug_flag $server_flags &
     fi
     local server_pid=$!
     
@@ -147,6 +160,9 @@ start_app() {
     if curl -s "http://$host:$port/api/health" >/dev/null 2>&1; then
         log "INFO" "Server started successfully (PID: $server_pid)"
         log "INFO" "Application URL: http://$host:$port"
+        if [[ -n "$workers" ]]; then
+            log "INFO" "Graceful reload: kill -HUP $server_pid"
+        fi
         
         # Open browser
         open_browser "http://$host:$port"
@@ -220,12 +236,14 @@ Options for start:
     --host HOST     Host to bind to (default: $DEFAULT_HOST)
     --port PORT     Port to bind to (default: auto-detect)
     --debug         Enable debug mode
+    --workers N     Run N pre-forked worker processes (0 = one per CPU core)
 
 Examples:
     $0                          # Start with default settings
     $0 start                    # Same as above
     $0 start --debug            # Start in debug mode
     $0 start --host 0.0.0.0     # Start and bind to all interfaces
+    $0 start --workers 0        # Production mode, one worker per CPU core
     $0 setup                    # Verify dependencies
     $0 clean                    # Clean up
 
@@ -238,6 +256,7 @@ main() {
     local host="$DEFAULT_HOST"
     local port=""
     local debug="false"
+    local workers=""
     
     # Parse arguments
     while [[ $# -gt 0 ]]; do
@@ -258,6 +277,10 @@ main() {
                 debug="true"
                 shift
                 ;;
+            --workers)
+                workers="$2"
+                shift 2
+                ;;
             -h|--help)
                 usage
                 exit 0
@@ -274,7 +297,7 @@ main() {
     case "$command" in
         start)
             setup  # Always setup before starting
-            start_app "$host" "${port:-$(find_available_port)}" "$debug"
+            start_app "$host" "${port:-$(find_available_port)}" "$debug" "$workers"
             ;;
         setup)
             setup
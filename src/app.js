@@ -441,6 +441,12 @@ async function showAnimeDetails(anime) {
             const provider = anime.provider || AppState.provider;
             const id = anime.id;
             const detailData = await apiRequest(`/anime/${provider}/${encodeURIComponent(id)}`);
+            // Any provider alias of the title may answer; episodes come from the one that did
+            const sourceProvider = (detailData && detailData.provider) || provider;
+            const sourceId = (detailData && detailData.id) || id;
+            const episodePage = detailData && detailData.episodes
+                ? await apiRequest(`/anime/${sourceProvider}/${encodeURIComponent(sourceId)}/episodes?limit=50`)
+                : null;
             
             if (detailData) {
                 info = {
@@ -451,8 +457,8 @@ async function showAnimeDetails(anime) {
                     genres: detailData.genres || [],
                     episodes: detailData.totalEpisodes || detailData.episodes || anime.episodes,
                     image: detailData.image || anime.image,
-                    provider: provider,
-                    episodes_list: detailData.episodes_list || []
+                    provider: sourceProvider,
+                    episodes_list: (episodePage && episodePage.episodes) || detailData.episodes_list || []
                 };
             }
         }
@@ -556,6 +562,9 @@ async function playEpisode(provider, episodeId, epNum) {
         video.removeAttribute('src');
         video.load();
 
+        // Play through the backend proxy when offered (CDNs often block CORS/hotlinking)
+        const streamUrl = hlsSource && (hlsSource.proxyUrl || hlsSource.url);
+
         // Setup HLS if supported
         if (window.Hls && window.Hls.isSupported() && hlsSource && hlsSource.url && /m3u8/.test(hlsSource.url)) {
             if (AppState.hlsPlayer) {
@@ -564,14 +573,14 @@ async function playEpisode(provider, episodeId, epNum) {
             }
             
             AppState.hlsPlayer = new Hls();
-            AppState.hlsPlayer.loadSource(hlsSource.url);
+            AppState.hlsPlayer.loadSource(streamUrl);
             AppState.hlsPlayer.attachMedia(video);
             AppState.hlsPlayer.on(Hls.Events.MANIFEST_PARSED, () => {
                 video.play().catch(console.error);
             });
         } else {
             // Fallback to native video
-            video.src = hlsSource.url;
+            video.src = streamUrl;
             video.play().catch(console.error);
         }
 
@@ -0,0 +1,89 @@
+"""
+Tests for canonical title IDs shared across provider aliases
+"""
+
+from aliases import AliasMap
+
+
+def frieren_search(stub):
+    stub.route('/anime/gogoanime/frieren', {'results': [{'id': 'sousou-no-frieren', 'title': 'Sousou no Frieren'}]})
+    stub.route('/anime/zoro/frieren', {'results': [{'id': 'frieren-18542', 'title': 'Sousou no Frieren (TV)'}]})
+
+
+def test_search_links_provider_ids(backend, stub_upstream):
+    frieren_search(stub_upstream)
+    backend.search_with_fallback('frieren')
+
+    assert backend.alias_map.canonical('gogoanime', 'sousou-no-frieren') == \
+        backend.alias_map.canonical('zoro', 'frieren-18542')
+    # Persisted: a fresh map over the same database sees the link
+    assert set(AliasMap(backend.get_db).aliases('zoro', 'frieren-18542')) == {
+        ('gogoanime', 'sousou-no-frieren'), ('zoro', 'frieren-18542')
+    }
+
+
+def test_groups_merge_through_shared_member(backend):
+    aliases = backend.alias_map
+    first = aliases.link('Shingeki no Kyojin', [('gogoanime', 'snk'), ('zoro', 'aot-112')])
+    second = aliases.link('Attack on Titan', [('animepahe', 'aot'), ('jikan', '16498')])
+    assert first != second
+    aliases.link('Attack on Titan', [('zoro', 'aot-112'), ('animepahe', 'aot')])
+    assert len(aliases.aliases('jikan', '16498')) == 4
+    assert aliases.canonical('jikan', '16498') == first
+
+
+def test_dub_and_sub_keep_separate_canonical_ids(backend, stub_upstream):
+    stub_upstream.route('/anime/gogoanime/naruto', {'results': [
+        {'id': 'naruto', 'title': 'Naruto'}, {'id': 'naruto-dub', 'title': 'Naruto (Dub)'}]})
+    stub_upstream.route('/anime/zoro/naruto', {'results': [{'id': 'naruto-677', 'title': 'Naruto'}]})
+    stub_upstream.route('/anime/gogoanime/info/naruto', {'id': 'naruto', 'title': 'Naruto', 'episodes': []})
+    stub_upstream.route('/anime/gogoanime/info/naruto-dub', {'id': 'naruto-dub', 'title': 'Naruto', 'episodes': []})
+    backend.search_with_fallback('naruto')
+
+    aliases = backend.alias_map
+    assert set(aliases.aliases('gogoanime', 'naruto')) == {('gogoanime', 'naruto'), ('zoro', 'naruto-677')}
+    assert aliases.aliases('gogoanime', 'naruto-dub') == [('gogoanime', 'naruto-dub')]
+
+    client = backend.app.test_client()
+    assert client.get('/api/anime/gogoanime/naruto').get_json()['id'] == 'naruto'
+    # The dub's info title has no tag; caching it must not pull the dub into the sub group
+    assert client.get('/api/anime/gogoanime/naruto-dub').get_json()['id'] == 'naruto-dub'
+    assert aliases.canonical('gogoanime', 'naruto-dub') != aliases.canonical('gogoanime', 'naruto')
+
+
+def test_requested_id_answers_from_its_own_cache_first(backend):
+    backend.alias_map.link('Sousou no Frieren', [('gogoanime', 'sousou-no-frieren'), ('zoro', 'frieren-18542')])
+    backend.save_to_cache('info_gogoanime_sousou-no-frieren', {'id': 'sousou-no-frieren', 'provider': 'gogoanime'})
+    backend.save_to_cache('info_zoro_frieren-18542', {'id': 'frieren-18542', 'provider': 'zoro'})
+    assert backend.get_anime_info('frieren-18542', 'zoro')['provider'] == 'zoro'
+    assert backend.get_anime_info('sousou-no-frieren', 'gogoanime')['provider'] == 'gogoanime'
+
+
+def test_info_served_from_cached_alias(backend, stub_upstream):
+    frieren_search(stub_upstream)
+    stub_upstream.route('/anime/gogoanime/info/sousou-no-frieren', {
+        'id': 'sousou-no-frieren', 'title': 'Sousou no Frieren',
+        'episodes': [{'id': f"frieren-episode-{n}", 'number': n} for n in range(1, 29)]
+    })
+    stub_upstream.route('/anime/zoro/info/frieren-18542', {'id': 'frieren-18542', 'title': 'Frieren', 'episodes': []})
+    backend.search_with_fallback('frieren')
+    client = backend.app.test_client()
+
+    assert client.get('/api/anime/gogoanime/sousou-no-frieren').status_code == 200
+    data = client.get('/api/anime/zoro/frieren-18542').get_json()
+    assert data['provider'] == 'gogoanime'
+    assert {a['provider'] for a in data['aliases']} == {'gogoanime', 'zoro'}
+    assert stub_upstream.hits.get('/anime/zoro/info/frieren-18542', 0) == 0
+
+    page = client.get('/api/anime/zoro/frieren-18542/episodes?limit=10').get_json()
+    assert page['provider'] == 'gogoanime' and page['total'] == 28
+    assert stub_upstream.hits['/anime/gogoanime/info/sousou-no-frieren'] == 1
+
+
+def test_info_falls_back_to_other_alias(backend, stub_upstream):
+    frieren_search(stub_upstream)
+    stub_upstream.route('/anime/zoro/info/frieren-18542', {'id': 'frieren-18542', 'title': 'Frieren', 'episodes': []})
+    backend.search_with_fallback('frieren')
+
+    data = backend.app.test_client().get('/api/anime/gogoanime/sousou-no-frieren').get_json()
+    assert data['provider'] == 'zoro'
@@ -0,0 +1,265 @@
+"""
+Tests for the async (ASGI) serving mode
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+
+@pytest.fixture
+def asgi(backend):
+    import asgi as asgi_app
+    return asgi_app
+
+
+def run(asgi, *requests):
+    """Send (method, path[, query[, body[, headers]]]) requests concurrently; returns (status, headers, json) each"""
+    async def one(method, path, query='', body=b'', headers=()):
+        scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(),
+                 'headers': [(k.lower().encode(), v.encode()) for k, v in headers]}
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+
+        await asgi.application(scope, receive, send)
+        headers = {k.decode(): v.decode() for k, v in sent[0]['headers']}
+        payload = b''.join(message.get('body', b'') for message in sent[1:])
+        return sent[0]['status'], headers, json.loads(payload) if 'json' in headers.get('content-type', '') and 'content-encoding' not in headers \
+            else payload
+
+    async def main():
+        try:
+            return await asyncio.gather(*(one(*r) for r in requests))
+        finally:
+            await asgi.upstream.close()
+
+    return asyncio.run(main())
+
+
+def test_search_info_episodes_and_watch(asgi, stub_upstream):
+    stub_upstream.route('/anime/gogoanime/frieren', {'results': [{'id': 'sousou-no-frieren', 'title': 'Sousou no Frieren'}]})
+    stub_upstream.route('/anime/zoro/frieren', {'results': [{'id': 'frieren-18542', 'title': 'Sousou no Frieren (TV)'}]})
+    for provider in ('9anime', 'animepahe'):
+        stub_upstream.route(f"/anime/{provider}/frieren", {'results': []})
+    stub_upstream.route('/anime/gogoanime/info/sousou-no-frieren', {
+        'id': 'sousou-no-frieren', 'title': 'Sousou no Frieren',
+        'episodes': [{'id': f"sousou-no-frieren-episode-{n}", 'number': n} for n in range(1, 29)]
+    })
+    stub_upstream.route('/anime/gogoanime/watch/sousou-no-frieren-episode-3', {'sources': [{'url': 'https://cdn/3.m3u8'}]})
+
+    (status, _, search), = run(asgi, ('GET', '/api/search', 'q=frieren'))
+    assert status == 200
+    assert len(search['results']) == 1 and len(search['results'][0]['providers']) == 2
+    (_, headers, _), = run(asgi, ('GET', '/api/search', 'q=frieren'))
+    assert headers['x-cache-status'] == 'fresh' and headers['last-modified']
+
+    (_, headers, info), = run(asgi, ('GET', '/api/anime/zoro/frieren-18542'))
+    assert info['provider'] == 'gogoanime' and headers['x-cache-status'] == 'miss'
+    (_, headers, _), = run(asgi, ('GET', '/api/anime/gogoanime/sousou-no-frieren'))
+    assert headers['x-cache-status'] == 'fresh'
+
+    (_, _, page), = run(asgi, ('GET', '/api/anime/gogoanime/sousou-no-frieren/episodes', 'limit=10'))
+    assert page['total'] == 28 and page['next_cursor'].endswith('after=10&limit=10')
+
+    (status, _, links), = run(asgi, ('GET', '/api/watch/gogoanime/sousou-no-frieren-episode-3'))
+    assert status == 200 and links['sources'][0]['url'] == 'https://cdn/3.m3u8'
+    assert stub_upstream.hits['/anime/gogoanime/info/sousou-no-frieren'] == 1
+
+
+def test_expired_memory_entry_rereads_sqlite(asgi, backend, stub_upstream):
+    key = ('anime_cache', 'info_gogoanime_naruto')
+    backend.save_to_cache('info_gogoanime_naruto', {'id': 'naruto', 'title': 'Old', 'provider': 'gogoanime'}, duration=-10)
+    expired = backend.memory_cache.peek(key)
+    backend.save_to_cache('info_gogoanime_naruto', {'id': 'naruto', 'title': 'New', 'provider': 'gogoanime'})
+    backend.memory_cache.set(key, expired, expired[1] + backend.cache_retention())
+
+    (_, headers, info), = run(asgi, ('GET', '/api/anime/gogoanime/naruto'))
+    assert info['title'] == 'New' and headers['x-cache-status'] == 'fresh'
+    assert stub_upstream.hits.get('/anime/gogoanime/info/naruto', 0) == 0
+
+
+def test_concurrent_requests_do_not_hold_threads(asgi, stub_upstream, monkeypatch):
+    monkeypatch.setattr(asgi.Config, 'HTTP_POOL_MAXSIZE', 100)
+
+    def slow(handler):
+        time.sleep(0.3)
+        return 200, {'id': 'x', 'title': handler.path.rsplit('/', 1)[-1], 'episodes': []}, {}
+    for i in range(40):
+        stub_upstream.route(f"/anime/gogoanime/info/show-{i}", slow)
+
+    started = time.monotonic()
+    responses = run(asgi, *[('GET', f"/api/anime/gogoanime/show-{i}") for i in range(40)])
+    assert all(status == 200 for status, _, _ in responses)
+    # 40 upstream waits of 0.3s overlap on one event loop
+    assert time.monotonic() - started < 2.5
+
+
+def test_identical_requests_are_coalesced(asgi, stub_upstream):
+    def slow(handler):
+        time.sleep(0.2)
+        return 200, {'id': 'naruto', 'title': 'Naruto', 'episodes': []}, {}
+    stub_upstream.route('/anime/gogoanime/info/naruto', slow)
+    responses = run(asgi, *[('GET', '/api/anime/gogoanime/naruto')] * 10)
+    assert all(status == 200 for status, _, _ in responses)
+    assert stub_upstream.hits['/anime/gogoanime/info/naruto'] == 1
+
+
+def test_watchlist_roundtrip_and_errors(asgi):
+    body = json.dumps({'anime_id': 'naruto', 'title': 'Naruto', 'image': 'n.jpg'}).encode()
+    (status, _, _), = run(asgi, ('POST', '/api/watchlist', '', body))
+    assert status == 200
+    (_, _, data), = run(asgi, ('GET', '/api/watchlist'))
+    assert [w['id'] for w in data['watchlist']] == ['naruto']
+    (status, _, _), = run(asgi, ('DELETE', '/api/watchlist/naruto'))
+    assert status == 200
+    (status, _, _), = run(asgi, ('DELETE', '/api/watchlist/naruto'))
+    assert status == 404
+    (status, _, _), = run(asgi, ('POST', '/api/watchlist', '', b'{}'))
+    assert status == 400
+    (status, _, data), = run(asgi, ('GET', '/api/nope'))
+    assert status == 404 and data['error'] == 'Endpoint not found'
+
+
+def test_static_index_is_served(asgi):
+    (status, headers, body), = run(asgi, ('GET', '/'))
+    assert status == 200 and headers['content-type'] == 'text/html'
+    assert b'<html' in body.lower()
+    (status, _, _), = run(asgi, ('GET', '/../backend/app.py'))
+    assert status == 404
+
+
+def test_large_static_file_is_streamed(asgi, backend, tmp_path, monkeypatch):
+    from compression import StaticAssets
+    (tmp_path / 'movie.bin').write_bytes(b'x' * 300000)
+    static = StaticAssets(str(tmp_path), max_file_bytes=1024)
+    static.build()
+    monkeypatch.setattr(backend, 'STATIC_DIR', str(tmp_path))
+    monkeypatch.setattr(backend, 'static_files', static)
+    (status, headers, body), = run(asgi, ('GET', '/movie.bin'))
+    assert status == 200 and headers['content-length'] == '300000'
+    assert body == b'x' * 300000
+
+
+def test_stream_proxy(asgi, backend, stub_upstream, monkeypatch):
+    monkeypatch.setattr(backend.Config, 'STREAM_ALLOW_PRIVATE_HOSTS', True)
+    segment = bytes(range(256)) * 16
+    stub_upstream.route('/hls/index.m3u8', b"#EXTM3U\n#EXTINF:10.0,\nseg0.ts\n#EXT-X-ENDLIST\n",
+                        headers={'Content-Type': 'application/vnd.apple.mpegurl'})
+    stub_upstream.route('/hls/seg0.ts', segment, headers={'Content-Type': 'video/mp2t'})
+    path, query = backend.stream_proxy_url(f"{stub_upstream.url}/hls/index.m3u8").split('?', 1)
+
+    (status, headers, playlist), = run(asgi, ('GET', path, query))
+    assert status == 200 and headers['content-type'] == 'application/vnd.apple.mpegurl'
+    segment_path, segment_query = playlist.decode().splitlines()[2].split('?', 1)
+
+    (_, first_headers, first), = run(asgi, ('GET', segment_path, segment_query))
+    (_, second_headers, second), = run(asgi, ('GET', segment_path, segment_query))
+    (status, part_headers, part), = run(asgi, ('GET', segment_path, segment_query, b'', [('Range', 'bytes=10-19')]))
+    assert first == second == segment
+    assert (first_headers['x-cache-status'], second_headers['x-cache-status']) == ('miss', 'fresh')
+    assert status == 206 and part == segment[10:20] and part_headers['content-range'] == f"bytes 10-19/{len(segment)}"
+    assert stub_upstream.hits['/hls/seg0.ts'] == 1
+
+    # A range that misses the cache fetches the whole segment once and is answered from the copy
+    stub_upstream.route('/hls/seg1.ts', segment, headers={'Content-Type': 'text/html'})
+    path, query = backend.stream_proxy_url(f"{stub_upstream.url}/hls/seg1.ts").split('?', 1)
+    (status, headers, part), = run(asgi, ('GET', path, query, b'', [('Range', 'bytes=-16')]))
+    assert status == 206 and part == segment[-16:] and headers['x-cache-status'] == 'miss'
+    assert headers['content-type'] == 'video/mp2t'
+    (_, headers, _), = run(asgi, ('GET', path, query, b'', [('Range', 'bytes=0-15')]))
+    assert headers['x-cache-status'] == 'fresh' and stub_upstream.hits['/hls/seg1.ts'] == 1
+
+
+def test_conditional_trending(asgi, stub_upstream):
+    stub_upstream.route('/anime/gogoanime/top-airing', {'results': [{'id': 'frieren', 'title': 'Frieren'}]})
+    (status, headers, trending), = run(asgi, ('GET', '/api/trending'))
+    assert status == 200 and trending['total'] == 1
+    assert headers['cache-control'].startswith('public, max-age=') and headers['last-modified']
+
+    (status, cached, body), = run(asgi, ('GET', '/api/trending', '', b'', [('If-None-Match', headers['etag'])]))
+    assert status == 304 and body == b'' and 'content-length' not in cached
+    assert cached['etag'] == headers['etag']
+    assert stub_upstream.hits['/anime/gogoanime/top-airing'] == 1
+
+
+def test_compressed_api_and_static_assets(asgi, stub_upstream):
+    import gzip
+
+    stub_upstream.route('/anime/gogoanime/info/frieren', {
+        'id': 'frieren', 'title': 'Frieren',
+        'episodes': [{'id': f"frieren-episode-{n}", 'number': n} for n in range(1, 29)]
+    })
+    (status, headers, body), (_, index_headers, index) = run(
+        asgi, ('GET', '/api/anime/gogoanime/frieren/episodes', '', b'', [('Accept-Encoding', 'gzip')]),
+        ('GET', '/', '', b'', [('Accept-Encoding', 'gzip')]))
+    assert status == 200 and headers['content-encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(body))['total'] == 28
+    assert int(headers['content-length']) == len(body)
+    assert index_headers['content-encoding'] == 'gzip' and b'<html' in gzip.decompress(index).lower()
+
+
+def test_metrics_endpoint(asgi, backend, stub_upstream):
+    stub_upstream.route('/anime/gogoanime/top-airing', {'results': [{'id': 'frieren', 'title': 'Frieren'}]})
+    run(asgi, ('GET', '/api/trending'))
+    run(asgi, ('GET', '/api/trending'))
+    (status, headers, body), = run(asgi, ('GET', '/metrics'))
+    assert status == 200 and headers['content-type'].startswith('text/plain; version=0.0.4')
+    text = body.decode()
+    assert 'animeverse_http_request_duration_seconds_count{method="GET",route="/api/trending",status="200"} 2\n' in text
+    assert backend.upstream_latency.count('consumet:gogoanime', 'ok') == 1
+    assert backend.cache_lookups.value('anime_cache', 'hit') == 1
+
+
+def test_health_and_cache_stats_match_the_threaded_server(asgi, backend):
+    (_, _, health), = run(asgi, ('GET', '/api/health'))
+    expected = backend.app.test_client().get('/api/health').get_json()
+    assert set(health) == set(expected) | {'server'}
+    assert health['hedging']['enabled'] is False
+
+    (_, _, stats), = run(asgi, ('GET', '/api/cache/stats'))
+    assert set(stats) == set(backend.app.test_client().get('/api/cache/stats').get_json())
+    assert 'static' in stats
+
+
+def test_watch_hedges_to_alias(asgi, backend, stub_upstream, monkeypatch):
+    monkeypatch.setattr(asgi.Config, 'WATCH_HEDGING', True)
+    monkeypatch.setattr(asgi.Config, 'WATCH_HEDGE_DELAY', 0.05)
+    stub_upstream.route('/anime/gogoanime/frieren', {'results': [{'id': 'sousou-no-frieren', 'title': 'Sousou no Frieren'}]})
+    stub_upstream.route('/anime/zoro/frieren', {'results': [{'id': 'frieren-18542', 'title': 'Sousou no Frieren'}]})
+    backend.search_with_fallback('frieren')
+    for provider, anime_id, sep in (('gogoanime', 'sousou-no-frieren', '-episode-'), ('zoro', 'frieren-18542', '$ep=')):
+        stub_upstream.route(f"/anime/{provider}/info/{anime_id}", {
+            'id': anime_id, 'title': 'Sousou no Frieren',
+            'episodes': [{'id': f"{anime_id}{sep}{n}", 'number': n} for n in range(1, 4)]
+        })
+        backend.get_anime_info_consumet(anime_id, provider)
+
+    def slow(handler):
+        time.sleep(0.8)
+        return 200, {'sources': [{'url': 'https://cdn/gogo.m3u8'}]}, {}
+    stub_upstream.route('/anime/gogoanime/watch/sousou-no-frieren-episode-1', slow)
+    stub_upstream.route('/anime/zoro/watch/frieren-18542$ep=1', {'sources': [{'url': 'https://cdn/zoro.m3u8'}]})
+
+    started = time.monotonic()
+    (status, headers, data), = run(asgi, ('GET', '/api/watch/gogoanime/sousou-no-frieren-episode-1'))
+    assert time.monotonic() - started < 0.6
+    assert status == 200 and data['provider'] == 'zoro' and headers['x-cache-status'] == 'miss'
+    assert backend.watch_hedger.stats()['hedge_wins'] == 1
+
+
+def test_memory_miss_is_counted_once(asgi, backend):
+    backend.save_to_cache('info_gogoanime_naruto', {'id': 'naruto', 'title': 'Naruto', 'provider': 'gogoanime'})
+    backend.memory_cache.clear()
+    misses = backend.memory_cache.stats()['misses']
+    (status, _, _), = run(asgi, ('GET', '/api/anime/gogoanime/naruto'))
+    assert status == 200
+    assert backend.memory_cache.stats()['misses'] == misses + 1
@@ -0,0 +1,152 @@
+"""
+Tests for the cache layers in front of upstream calls
+"""
+
+import time
+
+from memcache import MemoryCache, estimate_size
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_memory_cache_lru_by_entries_and_bytes():
+    cache = MemoryCache(max_entries=2, max_bytes=100)
+    cache.set('a', 1, float('inf'), 10)
+    cache.set('b', 2, float('inf'), 10)
+    assert cache.get('a') == 1
+    cache.set('c', 3, float('inf'), 10)
+    assert cache.get('b') is None
+    cache.set('d', 4, float('inf'), 95)
+    assert cache.get('a') is None and cache.get('c') is None and cache.get('d') == 4
+    assert cache.stats()['evictions'] == 3
+
+
+def test_memory_cache_honours_expiry():
+    clock = FakeClock()
+    cache = MemoryCache(clock=clock)
+    cache.set('a', 1, clock.now + 5, 1)
+    assert cache.get('a') == 1
+    clock.now += 5
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_memory_cache_counts_decoded_object_and_body():
+    data = {'results': [{'id': f"anime-{i}", 'title': f"Title {i}"} for i in range(50)]}
+    body = b'x' * 4000
+    cache = MemoryCache()
+    cache.set('a', (data, body), float('inf'))
+    assert cache.stats()['bytes'] > len(body) + estimate_size(data)
+
+
+def test_hot_lookups_skip_sqlite(backend, monkeypatch):
+    backend.save_to_cache('info_gogoanime_naruto', {'id': 'naruto', 'provider': 'gogoanime'})
+
+    def no_disk(*args, **kwargs):
+        raise AssertionError('L1 hit should not touch SQLite')
+
+    import db
+    monkeypatch.setattr(db.sqlite3, 'connect', no_disk)
+    monkeypatch.setattr(backend, 'get_db', no_disk)
+    assert backend.get_from_cache('info_gogoanime_naruto')['id'] == 'naruto'
+
+
+def test_sqlite_hit_populates_memory_tier(backend):
+    backend.save_to_cache('info_gogoanime_naruto', {'id': 'naruto', 'provider': 'gogoanime'})
+    backend.memory_cache.clear()
+    assert backend.get_from_cache('info_gogoanime_naruto')['id'] == 'naruto'
+    assert backend.memory_cache.get(('anime_cache', 'info_gogoanime_naruto'))[0]['id'] == 'naruto'
+
+
+def test_expired_memory_entry_rereads_sqlite(backend, stub_upstream):
+    # Another worker refreshed the row; this worker's memory tier still holds the expired copy
+    key = ('anime_cache', 'info_gogoanime_naruto')
+    backend.save_to_cache('info_gogoanime_naruto', {'id': 'naruto', 'title': 'Old', 'provider': 'gogoanime'}, duration=-10)
+    expired = backend.memory_cache.peek(key)
+    backend.save_to_cache('info_gogoanime_naruto', {'id': 'naruto', 'title': 'New', 'provider': 'gogoanime'})
+    backend.memory_cache.set(key, expired, expired[1] + backend.cache_retention())
+
+    response = backend.app.test_client().get('/api/anime/gogoanime/naruto')
+    assert response.headers['X-Cache-Status'] == 'fresh'
+    assert response.get_json()['title'] == 'New'
+    assert backend.memory_cache.peek(key)[0]['title'] == 'New'
+    assert stub_upstream.hits.get(INFO_PATH, 0) == 0
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+INFO_PATH = '/anime/gogoanime/info/naruto'
+
+
+def test_stale_entry_served_while_revalidating(backend, stub_upstream):
+    backend.save_to_cache('info_gogoanime_naruto', {'id': 'naruto', 'title': 'Old', 'provider': 'gogoanime'}, duration=-10)
+    stub_upstream.route(INFO_PATH, {'id': 'naruto', 'title': 'New', 'episodes': []})
+    client = backend.app.test_client()
+
+    response = client.get('/api/anime/gogoanime/naruto')
+    assert response.headers['X-Cache-Status'] == 'stale'
+    assert response.get_json()['title'] == 'Old'
+
+    assert wait_for(lambda: backend.get_from_cache('info_gogoanime_naruto') is not None)
+    response = client.get('/api/anime/gogoanime/naruto')
+    assert response.headers['X-Cache-Status'] == 'fresh'
+    assert response.get_json()['title'] == 'New'
+    assert stub_upstream.hits[INFO_PATH] == 1
+
+
+def test_stale_if_error_when_upstream_is_down(backend, stub_upstream, monkeypatch):
+    monkeypatch.setattr(backend.Config, 'CACHE_STALE_GRACE', 5)
+    backend.save_to_cache('info_gogoanime_naruto', {'id': 'naruto', 'title': 'Old', 'provider': 'gogoanime'}, duration=-60)
+    response = backend.app.test_client().get('/api/anime/gogoanime/naruto')
+    assert response.status_code == 200
+    assert response.headers['X-Cache-Status'] == 'stale'
+    assert stub_upstream.hits[INFO_PATH] == 1
+
+
+def test_expired_past_grace_is_revalidated_inline(backend, stub_upstream, monkeypatch):
+    monkeypatch.setattr(backend.Config, 'CACHE_STALE_GRACE', 5)
+    backend.save_to_cache('info_gogoanime_naruto', {'id': 'naruto', 'title': 'Old', 'provider': 'gogoanime'}, duration=-60)
+    stub_upstream.route(INFO_PATH, {'id': 'naruto', 'title': 'New', 'episodes': []})
+    response = backend.app.test_client().get('/api/anime/gogoanime/naruto')
+    assert response.headers['X-Cache-Status'] == 'revalidated'
+    assert response.get_json()['title'] == 'New'
+
+
+def test_search_reports_provider_cache_status_and_time(backend, stub_upstream):
+    for provider in backend.provider_priority():
+        stub_upstream.route(f"/anime/{provider}/naruto", {'results': [{'id': 'naruto', 'title': 'Naruto'}]})
+    client = backend.app.test_client()
+    first = client.get('/api/search?q=naruto')
+    assert first.headers['X-Cache-Status'] == 'miss' and first.headers['Last-Modified']
+    again = client.get('/api/search?q=naruto')
+    assert again.headers['X-Cache-Status'] == 'fresh'
+    assert again.headers['Last-Modified'] == first.headers['Last-Modified']
+
+
+def test_large_payloads_are_compressed_and_old_rows_stay_readable(backend):
+    info = {'id': 'one-piece', 'provider': 'gogoanime',
+            'episodes_list': [{'id': f"one-piece-episode-{n}", 'number': n} for n in range(1, 1101)]}
+    backend.save_to_cache('info_gogoanime_one-piece', info)
+    with backend.get_db().connection() as conn:
+        conn.execute("INSERT INTO anime_cache (id, provider, data, cached_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                     ('info_gogoanime_legacy', 'gogoanime', '{"id": "legacy"}', time.time(), time.time() + 60))
+        codec, blob = conn.execute("SELECT codec, data FROM anime_cache WHERE id = 'info_gogoanime_one-piece'").fetchone()
+    assert codec in ('zlib', 'zstd')
+    assert len(blob) < len(backend.json_backend.dumps(info)) / 4
+
+    backend.memory_cache.clear()
+    assert backend.get_from_cache('info_gogoanime_one-piece') == info
+    assert backend.get_from_cache('info_gogoanime_legacy') == {'id': 'legacy'}
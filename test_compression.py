@@ -0,0 +1,89 @@
+"""
+Tests for API response compression and the precompressed static assets
+"""
+
+import gzip
+import json
+import re
+
+from compression import StaticAssets, compress_body, negotiate
+
+EPISODES = [{'id': f"frieren-episode-{n}", 'number': n, 'title': f"Episode {n}"} for n in range(1, 29)]
+
+
+def test_negotiate_prefers_highest_q_then_offer_order():
+    assert negotiate('gzip, deflate, br', ['br', 'gzip']) == 'br'
+    assert negotiate('gzip;q=1.0, br;q=0.5', ['br', 'gzip']) == 'gzip'
+    assert negotiate('br;q=0, *', ['br', 'gzip']) == 'gzip'
+    assert negotiate('identity', ['br', 'gzip']) is None
+    assert negotiate('', ['gzip']) is None
+    assert compress_body(b'x' * 100, 'application/json', 'gzip', min_bytes=1024) is None
+    assert compress_body(b'x' * 2048, 'image/png', 'gzip', min_bytes=1024) is None
+
+
+def test_static_assets_are_hashed_and_precompressed(tmp_path):
+    (tmp_path / 'assets').mkdir()
+    (tmp_path / 'app.js').write_text('console.log("animeverse");\n' * 200)
+    (tmp_path / 'assets' / 'player.js').write_text('var player = 1;\n' * 200)
+    (tmp_path / 'big.bin').write_bytes(b'\0' * 10000)
+    (tmp_path / 'index.html').write_text(
+        '<script src="https://cdn.example/x.js"></script><script src="assets/player.js"></script>'
+        '<script src="app.js"></script><link rel="manifest" href="missing.webmanifest">')
+    static = StaticAssets(str(tmp_path), max_file_bytes=8192)
+    assert static.build() == 3
+
+    status, headers, page = static.respond('index.html', {})
+    assert status == 200 and headers['Cache-Control'] == 'no-cache'
+    scripts = re.findall(r'src="([^"]+)"', page.decode())
+    assert scripts[0] == 'https://cdn.example/x.js' and 'href="missing.webmanifest"' in page.decode()
+    assert re.fullmatch(r'assets/player\.[0-9a-f]{12}\.js', scripts[1])
+
+    status, headers, body = static.respond(scripts[2], {'accept-encoding': 'gzip'})
+    assert headers['Cache-Control'].endswith('immutable') and headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(body) == (tmp_path / 'app.js').read_bytes()
+    assert headers['Vary'] == 'Accept-Encoding'
+
+    status, plain, _ = static.respond('app.js', {})
+    assert 'Content-Encoding' not in plain and plain['ETag'] != headers['ETag']
+    assert static.respond('app.js', {'if-none-match': plain['ETag']})[0] == 304
+    assert static.respond('big.bin', {}) is None
+
+
+def test_large_api_bodies_are_compressed(backend, stub_upstream):
+    stub_upstream.route('/anime/gogoanime/info/frieren', {'id': 'frieren', 'title': 'Frieren', 'episodes': EPISODES})
+    client = backend.app.test_client()
+
+    page = client.get('/api/anime/gogoanime/frieren/episodes', headers={'Accept-Encoding': 'gzip'})
+    assert page.headers['Content-Encoding'] == 'gzip' and 'Accept-Encoding' in page.headers['Vary']
+    assert json.loads(gzip.decompress(page.get_data()))['total'] == 28
+    assert int(page.headers['Content-Length']) == len(page.get_data())
+
+    info = client.get('/api/anime/gogoanime/frieren', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in info.headers  # under COMPRESS_MIN_BYTES
+    plain = client.get('/api/anime/gogoanime/frieren/episodes')
+    assert 'Content-Encoding' not in plain.headers and plain.get_json()['total'] == 28
+
+
+def test_compressed_validators_still_revalidate(backend, stub_upstream, monkeypatch):
+    monkeypatch.setattr(backend.Config, 'COMPRESS_MIN_BYTES', 16)
+    stub_upstream.route('/anime/gogoanime/top-airing', {'results': [{'id': f"show-{n}", 'title': f"Show {n}"}
+                                                                    for n in range(20)]})
+    client = backend.app.test_client()
+
+    first = client.get('/api/trending', headers={'Accept-Encoding': 'gzip'})
+    assert first.headers['Content-Encoding'] == 'gzip' and first.headers['ETag'].startswith('W/"')
+    again = client.get('/api/trending', headers={'Accept-Encoding': 'gzip', 'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+
+
+def test_index_and_hashed_assets_are_served_from_memory(backend):
+    client = backend.app.test_client()
+    index = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert index.headers['Content-Encoding'] == 'gzip'
+    html = gzip.decompress(index.get_data()).decode()
+    app_js = re.search(r'src="(app\.[0-9a-f]{12}\.js)"', html).group(1)
+
+    script = client.get(f"/{app_js}")
+    assert script.status_code == 200 and script.headers['Cache-Control'].endswith('immutable')
+    assert script.headers['Content-Type'].startswith('application/javascript')
+    assert client.get('/not-there.js').status_code == 404
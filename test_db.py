@@ -0,0 +1,62 @@
+"""
+Tests for the pooled SQLite access layer
+"""
+
+import threading
+
+from db import Database
+
+
+def test_connections_use_wal_and_are_reused(tmp_path):
+    db = Database(str(tmp_path / 'cache.db'))
+    for _ in range(5):
+        with db.connection() as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    assert db.stats()['opened'] == 1
+    db.close()
+
+
+def test_rollback_on_error_returns_connection(tmp_path):
+    db = Database(str(tmp_path / 'cache.db'))
+    with db.connection() as conn:
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY)")
+    try:
+        with db.connection() as conn:
+            conn.execute("INSERT INTO t VALUES (1)")
+            raise RuntimeError('boom')
+    except RuntimeError:
+        pass
+    with db.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    assert db.stats()['opened'] == 1
+
+
+def test_concurrent_readers_and_writer(tmp_path):
+    db = Database(str(tmp_path / 'cache.db'), pool_size=4)
+    with db.connection() as conn:
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)")
+    errors = []
+
+    def writer():
+        try:
+            for i in range(200):
+                with db.connection() as conn:
+                    conn.execute("INSERT OR REPLACE INTO t VALUES (?, 'x')", (i % 20,))
+        except Exception as e:
+            errors.append(e)
+
+    def reader():
+        try:
+            for _ in range(200):
+                with db.connection() as conn:
+                    conn.execute("SELECT COUNT(*) FROM t").fetchone()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert db.stats()['idle'] <= 4
@@ -0,0 +1,51 @@
+"""
+Tests for normalized episode storage and the paginated episodes endpoint
+"""
+
+INFO_PATH = '/anime/gogoanime/info/one-piece'
+
+
+def one_piece(episodes=1100):
+    return {
+        'id': 'one-piece', 'title': 'One Piece', 'totalEpisodes': episodes,
+        'episodes': [{'id': f"one-piece-episode-{n}", 'number': n, 'url': f"https://gogo/{n}"}
+                     for n in range(1, episodes + 1)]
+    }
+
+
+def test_info_carries_counts_not_episode_list(backend, stub_upstream):
+    stub_upstream.route(INFO_PATH, one_piece())
+    data = backend.app.test_client().get('/api/anime/gogoanime/one-piece').get_json()
+    assert 'episodes_list' not in data
+    assert data['episodes'] == 1100
+    assert data['latestEpisode'] == 1100
+    assert data['episodes_cursor'].startswith('/api/anime/gogoanime/one-piece/episodes')
+
+
+def test_episode_pages(backend, stub_upstream):
+    stub_upstream.route(INFO_PATH, one_piece())
+    client = backend.app.test_client()
+
+    page = client.get('/api/anime/gogoanime/one-piece/episodes?offset=100&limit=50').get_json()
+    assert page['total'] == 1100
+    assert [e['number'] for e in page['episodes']] == list(range(101, 151))
+    assert page['next_cursor'].endswith('after=150&limit=50')
+
+    page = client.get(page['next_cursor']).get_json()
+    assert page['episodes'][0]['number'] == 151
+
+    page = client.get('/api/anime/gogoanime/one-piece/episodes?after=1095').get_json()
+    assert [e['number'] for e in page['episodes']] == [1096, 1097, 1098, 1099, 1100]
+    assert page['next_cursor'] is None
+    assert stub_upstream.hits[INFO_PATH] == 1
+
+
+def test_refetch_replaces_episode_rows(backend):
+    backend.save_episodes('gogoanime', 'show', [{'id': 'a', 'number': 1}, {'id': 'b', 'number': 1.5}, {'id': 'c', 'number': 2}])
+    backend.save_episodes('gogoanime', 'show', [{'id': 'a', 'number': 1}])
+    episodes, total = backend.get_episodes('gogoanime', 'show')
+    assert total == 1 and episodes[0]['id'] == 'a'
+
+    backend.save_episodes('gogoanime', 'show', [{'id': 'a', 'number': 1}, {'id': 'b', 'number': 1.5}])
+    episodes, _ = backend.get_episodes('gogoanime', 'show')
+    assert [e['number'] for e in episodes] == [1, 1.5]
@@ -0,0 +1,148 @@
+"""
+Tests for provider health tracking, circuit breakers and health-ordered routing
+"""
+
+import time
+
+from health import CLOSED, HALF_OPEN, OPEN, ProviderHealth
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_probes_and_closes():
+    clock = FakeClock()
+    health = ProviderHealth(failure_threshold=3, open_seconds=30, clock=clock)
+    for _ in range(3):
+        assert health.allow('gogoanime', 'watch')
+        health.record('gogoanime', 'watch', 1.0, False)
+    assert health.state('gogoanime', 'watch') == OPEN
+    assert not health.allow('gogoanime', 'watch')
+    assert health.allow('gogoanime', 'search')  # other endpoint kinds are unaffected
+
+    clock.now = 31
+    assert health.state('gogoanime', 'watch') == HALF_OPEN
+    assert health.allow('gogoanime', 'watch')
+    assert not health.allow('gogoanime', 'watch')  # one probe at a time
+    health.record('gogoanime', 'watch', 0.2, False)
+    assert health.state('gogoanime', 'watch') == OPEN
+
+    clock.now = 62
+    assert health.allow('gogoanime', 'watch')
+    health.record('gogoanime', 'watch', 0.2, True)
+    assert health.state('gogoanime', 'watch') == CLOSED
+
+
+def test_error_rate_opens_breaker():
+    health = ProviderHealth(failure_threshold=100, error_rate=0.5, min_samples=10, clock=FakeClock())
+    for i in range(10):
+        health.record('zoro', 'info', 0.1, i % 2 == 0)
+    assert health.state('zoro', 'info') == OPEN
+
+
+def test_rank_by_latency_errors_and_state():
+    health = ProviderHealth(failure_threshold=2, clock=FakeClock())
+    for _ in range(5):
+        health.record('gogoanime', 'search', 0.9, True)
+        health.record('zoro', 'search', 0.1, True)
+        health.record('animepahe', 'search', 0.1, True)
+    health.record('animepahe', 'search', 0.1, False)
+    health.record('9anime', 'search', 0.1, False)
+    health.record('9anime', 'search', 0.1, False)
+    assert health.rank(['gogoanime', 'zoro', '9anime', 'animepahe'], 'search') == \
+        ['zoro', 'animepahe', 'gogoanime', '9anime']
+    # No samples keeps the configured order
+    assert health.rank(['a', 'b', 'c'], 'search') == ['a', 'b', 'c']
+
+
+def test_timeout_adapts_to_observed_latency():
+    health = ProviderHealth(min_samples=5, clock=FakeClock())
+    assert health.timeout('zoro', 'watch', 15) == 15
+    for _ in range(5):
+        health.record('zoro', 'watch', 0.5, True)
+    assert health.timeout('zoro', 'watch', 15, multiplier=3) == 1.5
+
+
+def test_dead_trending_provider_is_routed_around(backend, stub_upstream, monkeypatch):
+    monkeypatch.setattr(backend.Config, 'HTTP_MAX_RETRIES', 0)
+    stub_upstream.route('/anime/gogoanime/top-airing', {'error': 'down'}, status=503)
+    stub_upstream.route('/anime/zoro/top-airing', {'results': [{'id': 'frieren-18542', 'title': 'Frieren'}]})
+    client = backend.app.test_client()
+
+    data = client.get('/api/trending').get_json()
+    assert data['results'][0]['provider'] == 'zoro'
+    # The list is cached now, so refetch it the way revalidation and warming do
+    for _ in range(3):
+        assert backend.fetch_trending()['results'][0]['provider'] == 'zoro'
+    # One failure is enough to rank the healthy provider first
+    assert stub_upstream.hits['/anime/gogoanime/top-airing'] == 1
+    assert stub_upstream.hits['/anime/zoro/top-airing'] == 4
+
+
+def test_search_prefers_faster_provider(backend, stub_upstream):
+    def slow(handler):
+        time.sleep(0.3)
+        return 200, {'results': [{'id': 'naruto-slow', 'title': 'Naruto Slow'}]}, {}
+    stub_upstream.route('/anime/gogoanime/naruto', slow)
+    stub_upstream.route('/anime/gogoanime/bleach', slow)
+    stub_upstream.route('/anime/zoro/naruto', {'results': [{'id': 'naruto-fast', 'title': 'Naruto Fast'}]})
+    stub_upstream.route('/anime/zoro/bleach', {'results': [{'id': 'bleach-fast', 'title': 'Bleach Fast'}]})
+
+    assert backend.search_with_fallback('naruto')[0]['provider'] == 'gogoanime'
+    assert backend.search_with_fallback('bleach')[0]['provider'] == 'zoro'
+
+
+def test_watch_falls_back_to_alias_with_the_episode(backend, stub_upstream):
+    stub_upstream.route('/anime/gogoanime/frieren', {'results': [{'id': 'sousou-no-frieren', 'title': 'Sousou no Frieren'}]})
+    stub_upstream.route('/anime/zoro/frieren', {'results': [{'id': 'frieren-18542', 'title': 'Sousou no Frieren'}]})
+    stub_upstream.route('/anime/gogoanime/info/sousou-no-frieren', {
+        'id': 'sousou-no-frieren', 'title': 'Sousou no Frieren',
+        'episodes': [{'id': f"sousou-no-frieren-episode-{n}", 'number': n} for n in range(1, 4)]
+    })
+    stub_upstream.route('/anime/zoro/info/frieren-18542', {
+        'id': 'frieren-18542', 'title': 'Sousou no Frieren',
+        'episodes': [{'id': f"frieren-18542$ep={n}", 'number': n} for n in range(1, 4)]
+    })
+    stub_upstream.route('/anime/zoro/watch/frieren-18542$ep=2', {'sources': [{'url': 'https://cdn/zoro.m3u8'}]})
+    backend.search_with_fallback('frieren')
+    backend.get_anime_info_consumet('sousou-no-frieren', 'gogoanime')
+    client = backend.app.test_client()
+
+    data = client.get('/api/watch/gogoanime/sousou-no-frieren-episode-2').get_json()
+    assert data['provider'] == 'zoro'
+    assert data['sources'][0]['url'] == 'https://cdn/zoro.m3u8'
+    assert stub_upstream.hits['/anime/gogoanime/watch/sousou-no-frieren-episode-2'] == 1
+
+
+def test_open_circuit_skips_upstream(backend, stub_upstream, monkeypatch):
+    monkeypatch.setattr(backend.provider_health, 'failure_threshold', 2)
+    monkeypatch.setattr(backend.Config, 'HTTP_MAX_RETRIES', 0)
+    stub_upstream.route('/anime/gogoanime/info/naruto', {'error': 'down'}, status=502)
+    for _ in range(4):
+        assert backend.fetch_anime_info_consumet('info_gogoanime_naruto', 'naruto', 'gogoanime') is None
+    assert stub_upstream.hits['/anime/gogoanime/info/naruto'] == 2
+    assert backend.provider_health.state('gogoanime', 'info') == OPEN
+
+
+def test_missing_titles_do_not_open_the_circuit(backend, stub_upstream, monkeypatch):
+    monkeypatch.setattr(backend.provider_health, 'failure_threshold', 2)
+    stub_upstream.route('/anime/gogoanime/info/missing', {'error': 'not found'}, status=404)
+    for _ in range(4):
+        assert backend.fetch_anime_info_consumet('info_gogoanime_missing', 'missing', 'gogoanime') is None
+    assert stub_upstream.hits['/anime/gogoanime/info/missing'] == 4
+    assert backend.provider_health.state('gogoanime', 'info') == CLOSED
+
+
+def test_rate_limited_probe_hands_its_slot_back():
+    clock = FakeClock()
+    health = ProviderHealth(failure_threshold=1, open_seconds=30, clock=clock)
+    health.record('zoro', 'info', 1.0, False)
+    clock.now = 31
+    assert health.allow('zoro', 'info') and not health.allow('zoro', 'info')
+    health.release('zoro', 'info')
+    assert health.allow('zoro', 'info')
@@ -0,0 +1,124 @@
+"""
+Tests for hedged streaming-link requests
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from hedging import Hedger
+
+
+@pytest.fixture
+def executor():
+    pool = ThreadPoolExecutor(max_workers=4)
+    yield pool
+    pool.shutdown(wait=False)
+
+
+def after(delay, result):
+    def call():
+        time.sleep(delay)
+        return result
+    return call
+
+
+def test_slow_primary_is_hedged(executor):
+    hedger = Hedger(executor, lambda provider: (1, 5))
+    started = time.monotonic()
+    result, winner = hedger.run(('gogoanime', after(0.6, 'slow')), [('zoro', after(0, 'fast'))], delay=0.05)
+    assert (result, winner) == ('fast', 'zoro')
+    assert time.monotonic() - started < 0.4
+    stats = hedger.stats()
+    assert stats['hedges'] == 1 and stats['hedge_wins'] == 1
+
+
+def test_fast_primary_sends_no_hedge(executor):
+    hedger = Hedger(executor, lambda provider: (1, 5))
+    assert hedger.run(('gogoanime', after(0, 'fast')), [('zoro', after(0, 'backup'))], delay=0.2) == ('fast', 'gogoanime')
+    assert hedger.stats()['hedges'] == 0
+
+
+def test_hedge_budget_caps_backups(executor):
+    hedger = Hedger(executor, lambda provider: (0.001, 1))
+    for _ in range(3):
+        hedger.run(('gogoanime', after(0.1, 'slow')), [('zoro', after(0, 'fast'))], delay=0.01)
+    stats = hedger.stats()
+    assert stats['hedges'] == 1
+    assert stats['denied'] == 2
+    assert stats['providers']['gogoanime']['primary_wins'] == 2
+
+
+def test_failed_primary_fails_over_without_budget(executor):
+    hedger = Hedger(executor, lambda provider: (0.001, 1), can_send=lambda provider: False)
+    assert hedger.run(('gogoanime', after(0, None)), [('zoro', after(0, 'backup'))], delay=1) == ('backup', 'zoro')
+    assert hedger.stats()['providers']['zoro']['failovers'] == 1
+
+
+def test_async_slow_primary_is_hedged(executor):
+    hedger = Hedger(executor, lambda provider: (1, 5))
+
+    def later(delay, result):
+        async def call():
+            await asyncio.sleep(delay)
+            return result
+        return call
+
+    started = time.monotonic()
+    outcome = asyncio.run(hedger.run_async(('gogoanime', later(0.6, 'slow')), [('zoro', later(0, 'fast'))], delay=0.05))
+    assert outcome == ('fast', 'zoro')
+    assert time.monotonic() - started < 0.4
+    assert hedger.stats()['hedge_wins'] == 1
+
+
+def test_watch_hedges_to_alias(backend, stub_upstream, monkeypatch):
+    monkeypatch.setattr(backend.Config, 'WATCH_HEDGING', True)
+    monkeypatch.setattr(backend.Config, 'WATCH_HEDGE_DELAY', 0.05)
+    stub_upstream.route('/anime/gogoanime/frieren', {'results': [{'id': 'sousou-no-frieren', 'title': 'Sousou no Frieren'}]})
+    stub_upstream.route('/anime/zoro/frieren', {'results': [{'id': 'frieren-18542', 'title': 'Sousou no Frieren'}]})
+    backend.search_with_fallback('frieren')
+    for provider, anime_id, sep in (('gogoanime', 'sousou-no-frieren', '-episode-'), ('zoro', 'frieren-18542', '$ep=')):
+        stub_upstream.route(f"/anime/{provider}/info/{anime_id}", {
+            'id': anime_id, 'title': 'Sousou no Frieren',
+            'episodes': [{'id': f"{anime_id}{sep}{n}", 'number': n} for n in range(1, 4)]
+        })
+        backend.get_anime_info_consumet(anime_id, provider)
+
+    def slow(handler):
+        time.sleep(0.8)
+        return 200, {'sources': [{'url': 'https://cdn/gogo.m3u8'}]}, {}
+    stub_upstream.route('/anime/gogoanime/watch/sousou-no-frieren-episode-1', slow)
+    stub_upstream.route('/anime/zoro/watch/frieren-18542$ep=1', {'sources': [{'url': 'https://cdn/zoro.m3u8'}]})
+
+    started = time.monotonic()
+    data = backend.app.test_client().get('/api/watch/gogoanime/sousou-no-frieren-episode-1').get_json()
+    assert time.monotonic() - started < 0.6
+    assert data['provider'] == 'zoro'
+    assert backend.watch_hedger.stats()['hedge_wins'] == 1
+
+
+def test_hedged_watch_reports_stale_cache(backend, stub_upstream, monkeypatch):
+    monkeypatch.setattr(backend.Config, 'WATCH_HEDGING', True)
+    monkeypatch.setattr(backend.Config, 'WATCH_HEDGE_DELAY', 0.05)
+    stub_upstream.route('/anime/gogoanime/frieren', {'results': [{'id': 'sousou-no-frieren', 'title': 'Sousou no Frieren'}]})
+    stub_upstream.route('/anime/zoro/frieren', {'results': [{'id': 'frieren-18542', 'title': 'Sousou no Frieren'}]})
+    backend.search_with_fallback('frieren')
+    for provider, anime_id, sep in (('gogoanime', 'sousou-no-frieren', '-episode-'), ('zoro', 'frieren-18542', '$ep=')):
+        stub_upstream.route(f"/anime/{provider}/info/{anime_id}", {
+            'id': anime_id, 'title': 'Sousou no Frieren',
+            'episodes': [{'id': f"{anime_id}{sep}{n}", 'number': n} for n in range(1, 4)]
+        })
+        backend.get_anime_info_consumet(anime_id, provider)
+    backend.save_to_cache('stream_gogoanime_sousou-no-frieren-episode-1',
+                          {'sources': [{'url': 'https://cdn/gogo.m3u8'}], 'provider': 'gogoanime'},
+                          'streaming_cache', duration=-10)
+    # Revalidation fails, so the entry stays stale for both lookups
+    stub_upstream.route('/anime/gogoanime/watch/sousou-no-frieren-episode-1', {}, status=503)
+
+    with backend.app.test_request_context():
+        assert backend.resolve_streaming_links('sousou-no-frieren-episode-1', 'gogoanime')['provider'] == 'gogoanime'
+        assert backend.g.cache_status == 'stale' and backend.g.cache_updated > 0
+    response = backend.app.test_client().get('/api/watch/gogoanime/sousou-no-frieren-episode-1')
+    assert response.headers['X-Cache-Status'] == 'stale'
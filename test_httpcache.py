@@ -0,0 +1,78 @@
+"""
+Tests for ETag/Last-Modified validators and conditional API responses
+"""
+
+import time
+from email.utils import formatdate
+
+from httpcache import etag_matches, not_modified, strong_etag, validator_headers
+
+TRENDING = {'results': [{'id': 'frieren', 'title': 'Frieren'}]}
+
+
+def test_validators_and_conditions():
+    headers = validator_headers(b'{"a": 1}', 60, 300, last_modified=1700000000)
+    etag = headers['ETag']
+    assert etag == strong_etag(b'{"a": 1}') and etag.startswith('"')
+    assert headers['Cache-Control'] == 'public, max-age=60, stale-while-revalidate=300'
+    assert headers['Last-Modified'] == 'Tue, 14 Nov 2023 22:13:20 GMT'
+
+    assert etag_matches(f'"other", W/{etag}', etag) and etag_matches('*', etag)
+    assert not etag_matches('"other"', etag)
+    assert not_modified({'if-modified-since': 'Tue, 14 Nov 2023 22:13:20 GMT'}, headers)
+    assert not not_modified({'if-modified-since': 'Tue, 14 Nov 2023 22:13:19 GMT'}, headers)
+    # If-None-Match wins, even when the date would match
+    assert not not_modified({'if-none-match': '"stale"', 'if-modified-since': headers['Last-Modified']}, headers)
+    assert not not_modified({'if-modified-since': 'yesterday'}, headers)
+
+
+def test_trending_answers_304_while_unchanged(backend, stub_upstream):
+    stub_upstream.route('/anime/gogoanime/top-airing', TRENDING)
+    client = backend.app.test_client()
+
+    first = client.get('/api/trending')
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'].startswith(f"public, max-age={backend.Config.HTTP_MAX_AGE_LISTS}")
+    assert first.headers['Last-Modified']
+
+    again = client.get('/api/trending', headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.get_data() == b''
+    assert again.headers['ETag'] == etag
+    since = client.get('/api/trending', headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert since.status_code == 304
+    assert stub_upstream.hits['/anime/gogoanime/top-airing'] == 1
+
+    # A refreshed list with new content gets a new validator
+    stub_upstream.route('/anime/gogoanime/top-airing', {'results': TRENDING['results'] + [{'id': 'dandadan'}]})
+    backend.fetch_trending()
+    changed = client.get('/api/trending', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    assert changed.get_json()['total'] == 2
+
+
+def test_last_modified_is_when_the_entry_was_cached(backend, stub_upstream):
+    stub_upstream.route('/anime/gogoanime/info/frieren', {'id': 'frieren', 'title': 'Frieren', 'episodes': []})
+    client = backend.app.test_client()
+    before = time.time()
+    first = client.get('/api/anime/gogoanime/frieren')
+    assert first.headers['Cache-Control'].startswith(f"public, max-age={backend.Config.HTTP_MAX_AGE}")
+    assert first.headers['Last-Modified'] in (formatdate(before, usegmt=True), formatdate(time.time(), usegmt=True))
+
+    backend.memory_cache.clear()
+    second = client.get('/api/anime/gogoanime/frieren')
+    assert second.headers['X-Cache-Status'] == 'fresh'
+    assert second.headers['Last-Modified'] == first.headers['Last-Modified']
+    assert second.headers['ETag'] == first.headers['ETag']
+
+
+def test_jikan_fallbacks_are_cached(backend, stub_upstream):
+    stub_upstream.route('/v4/anime/52991', {'data': {'mal_id': 52991, 'title': 'Sousou no Frieren'}})
+    stub_upstream.route('/v4/anime', {'data': [{'mal_id': 52991, 'title': 'Sousou no Frieren'}]})
+    client = backend.app.test_client()
+
+    for _ in range(2):
+        assert client.get('/api/anime/jikan/52991').get_json()['title'] == 'Sousou no Frieren'
+        search = client.get('/api/search?q=frieren').get_json()
+        assert search['source'] == 'jikan' and search['total'] == 1
+    assert stub_upstream.hits['/v4/anime/52991'] == 1
+    assert stub_upstream.hits['/v4/anime'] == 1
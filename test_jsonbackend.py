@@ -0,0 +1,58 @@
+"""
+Tests for the pluggable JSON backend and the pass-through of cached bodies
+"""
+
+import datetime
+
+import pytest
+
+from jsonbackend import BACKENDS, get_backend
+
+PAYLOAD = {'id': 'sousou-no-frieren', 'title': 'Sōsō no Frieren', 'score': 9.1, 'airing': False,
+           'genres': ['Adventure', 'Fantasy'], 'next': None}
+
+
+@pytest.mark.parametrize('name', sorted(BACKENDS))
+def test_backends_emit_compact_utf8_bytes(name):
+    backend = get_backend(name)
+    body = backend.dumps(PAYLOAD)
+    assert isinstance(body, bytes) and b', ' not in body and 'Sōsō'.encode('utf-8') in body
+    assert backend.loads(body) == PAYLOAD and backend.loads(body.decode('utf-8')) == PAYLOAD
+    assert backend.loads(backend.dumps({'aired': datetime.date(2023, 9, 29)})) == {'aired': '2023-09-29'}
+
+
+def test_auto_prefers_installed_fast_backend():
+    preferred = [name for name in ('orjson', 'ujson') if name in BACKENDS] + ['json']
+    assert get_backend('auto').name == preferred[0]
+    with pytest.raises(ValueError):
+        get_backend('simdjson')
+
+
+def test_cached_lists_are_sent_without_reserializing(backend, stub_upstream, monkeypatch):
+    stub_upstream.route('/anime/gogoanime/top-airing', {'results': [{'id': 'frieren', 'title': 'Frieren'}]})
+    client = backend.app.test_client()
+    first = client.get('/api/trending')
+    assert first.get_json()['results'][0]['id'] == 'frieren'
+
+    serialized = []
+
+    class Counting:
+        def __init__(self, inner):
+            self.inner = inner
+
+        def dumps(self, obj):
+            serialized.append(obj)
+            return self.inner.dumps(obj)
+
+        def loads(self, data):
+            return self.inner.loads(data)
+
+    monkeypatch.setattr(backend, 'json_backend', Counting(backend.json_backend))
+    again = client.get('/api/trending')
+    assert again.get_data() == first.get_data() and again.headers['ETag'] == first.headers['ETag']
+    assert serialized == []
+
+    backend.memory_cache.clear()  # read back from SQLite: still the stored bytes, still no encode
+    assert client.get('/api/trending').get_data() == first.get_data() and serialized == []
+    assert client.get('/api/watchlist').get_json() == {'watchlist': [], 'total': 0}
+    assert len(serialized) == 1  # jsonify goes through the backend too
@@ -0,0 +1,65 @@
+"""
+Tests for background cache maintenance
+"""
+
+import time
+
+
+def test_expired_rows_past_retention_are_deleted(backend, monkeypatch):
+    monkeypatch.setattr(backend.Config, 'CACHE_STALE_GRACE', 60)
+    monkeypatch.setattr(backend.Config, 'CACHE_STALE_IF_ERROR', 60)
+    backend.save_to_cache('search_gogoanime_old', {'results': []}, duration=-120)
+    backend.save_to_cache('search_gogoanime_stale', {'results': []}, duration=-30)
+    backend.save_to_cache('search_gogoanime_fresh', {'results': []})
+
+    result = backend.cache_maintenance.run_once()
+
+    assert result['expired_rows'] == 1
+    with backend.get_db().connection() as conn:
+        ids = {row[0] for row in conn.execute("SELECT id FROM anime_cache")}
+    assert ids == {'search_gogoanime_stale', 'search_gogoanime_fresh'}
+
+
+def test_size_cap_evicts_least_recently_used(backend, monkeypatch):
+    monkeypatch.setattr(backend.Config, 'CACHE_CODEC', 'json')
+    payload = {'results': [{'title': 'x' * 2000}] * 10}
+    for i in range(20):
+        backend.save_to_cache(f"search_gogoanime_{i}", payload)
+    time.sleep(0.01)
+    backend.memory_cache.clear()
+    assert backend.get_from_cache('search_gogoanime_0') is not None
+
+    backend.cache_maintenance.ensure_incremental_vacuum()
+    monkeypatch.setattr(backend.cache_maintenance, 'max_bytes', 150 * 1024)
+    monkeypatch.setattr(backend.cache_maintenance, 'batch_size', 2)
+    result = backend.cache_maintenance.run_once()
+
+    assert result['evicted_rows'] > 0
+    assert result['reclaimed_bytes'] > 0
+    with backend.get_db().connection() as conn:
+        ids = {row[0] for row in conn.execute("SELECT id FROM anime_cache")}
+    assert 'search_gogoanime_0' in ids
+    assert 'search_gogoanime_1' not in ids
+
+
+def test_size_cap_ignores_tables_it_cannot_evict(backend, monkeypatch):
+    with backend.get_db().connection() as conn:
+        conn.executemany("INSERT INTO anime_catalog (provider, anime_id, title, synopsis) VALUES (?, ?, ?, ?)",
+                         [('gogoanime', f"title-{i}", f"Title {i}", 'x' * 4000) for i in range(100)])
+    for i in range(5):
+        backend.save_to_cache(f"search_gogoanime_{i}", {'results': []})
+
+    monkeypatch.setattr(backend.cache_maintenance, 'max_bytes', 150 * 1024)
+    result = backend.cache_maintenance.run_once()
+
+    assert result['evicted_rows'] == 0
+    stats = backend.cache_maintenance.stats()
+    assert stats['evictable_bytes'] < stats['max_bytes'] < stats['used_bytes']
+
+
+def test_stats_endpoint_reports_maintenance(backend):
+    backend.cache_maintenance.run_once()
+    data = backend.app.test_client().get('/api/cache/stats').get_json()
+    assert data['database']['runs'] >= 1
+    assert 'reclaimed_bytes' in data['database']
+    assert 'hits' in data['memory']
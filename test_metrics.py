@@ -0,0 +1,105 @@
+"""
+Tests for the metrics registry and the /metrics endpoint
+"""
+
+import json
+
+from metrics import EXITED_SNAPSHOT, Registry, fold_snapshot
+
+INFO_PATH = '/anime/gogoanime/info/frieren'
+
+
+def test_histograms_render_cumulative_buckets():
+    registry = Registry()
+    latency = registry.histogram('demo_seconds', 'Demo latency', ('route',), buckets=(0.1, 1.0))
+    hits = registry.counter('demo_total', 'Demo hits', ('name',))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.observe(value, '/a')
+    hits.inc('say "hi"\n')
+
+    text = registry.render()
+    assert '# TYPE demo_seconds histogram' in text and '# TYPE demo_total counter' in text
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 1\n' in text
+    assert 'demo_seconds_bucket{route="/a",le="1"} 3\n' in text
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 4\n' in text
+    assert 'demo_seconds_sum{route="/a"} 4.05\n' in text and 'demo_seconds_count{route="/a"} 4\n' in text
+    assert 'demo_total{name="say \\"hi\\"\\n"} 1\n' in text
+
+    registry.enabled = False
+    latency.observe(0.05, '/a')
+    assert latency.count('/a') == 4
+
+
+def test_worker_snapshots_are_summed(tmp_path):
+    registry = Registry()
+    latency = registry.histogram('demo_seconds', 'Demo latency', ('route',), buckets=(0.1,))
+    hits = registry.counter('demo_total', 'Demo hits')
+    latency.observe(0.05, '/a')
+    hits.inc()
+    registry.shared_dir = str(tmp_path)
+    registry.publish()  # our own snapshot is replaced by the live values, not added twice
+    (tmp_path / 'metrics-999999.json').write_text(json.dumps(
+        {'demo_seconds': [[['/a'], [0, 2, 1.5]], [['/b'], [1, 0, 0.01]]], 'demo_total': [[[], 5]]}))
+
+    text = registry.render()
+    assert 'demo_seconds_count{route="/a"} 3\n' in text and 'demo_seconds_count{route="/b"} 1\n' in text
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 1\n' in text
+    assert 'demo_total 6\n' in text
+
+
+def test_exited_workers_fold_into_one_snapshot(tmp_path):
+    registry = Registry()
+    latency = registry.histogram('demo_seconds', 'Demo latency', ('route',), buckets=(0.1,))
+    hits = registry.counter('demo_total', 'Demo hits')
+    registry.shared_dir = str(tmp_path)
+    for pid, count in ((999997, 2), (999998, 3)):
+        (tmp_path / f"metrics-{pid}.json").write_text(json.dumps(
+            {'demo_seconds': [[['/a'], [count, 0, 0.01 * count]]], 'demo_total': [[[], count]]}))
+        fold_snapshot(str(tmp_path), pid)
+    fold_snapshot(str(tmp_path), 999999)  # never published
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [EXITED_SNAPSHOT]
+    text = registry.render()
+    assert 'demo_seconds_count{route="/a"} 5\n' in text and 'demo_total 5\n' in text
+    latency.observe(0.05, '/a')
+    hits.inc()
+    assert 'demo_total 6\n' in registry.render()
+
+
+def test_requests_upstreams_and_cache_are_measured(backend, stub_upstream):
+    stub_upstream.route(INFO_PATH, {'id': 'frieren', 'title': 'Frieren', 'episodes': []})
+    client = backend.app.test_client()
+    assert client.get('/api/anime/gogoanime/frieren').status_code == 200
+    assert client.get('/api/anime/gogoanime/frieren').status_code == 200
+
+    assert backend.request_latency.count('GET', '/api/anime/<provider>/<anime_id>', '200') == 2
+    assert backend.upstream_latency.count('consumet:gogoanime', 'ok') == 1
+    assert backend.rate_limit_wait.count('consumet:gogoanime') == 1
+    assert backend.cache_lookups.value('anime_cache', 'hit') >= 1
+    assert backend.cache_lookups.value('anime_cache', 'miss') >= 1
+    assert backend.cache_read_latency.count('anime_cache', 'memory') >= 1
+    assert backend.cache_write_latency.count('anime_cache') >= 1
+
+    response = client.get('/metrics')
+    assert response.status_code == 200 and response.content_type.startswith('text/plain; version=0.0.4')
+    text = response.get_data(as_text=True)
+    assert ('animeverse_http_request_duration_seconds_count'
+            '{method="GET",route="/api/anime/<provider>/<anime_id>",status="200"} 2\n') in text
+    assert 'animeverse_upstream_request_duration_seconds_bucket{upstream="consumet:gogoanime",outcome="ok",le="+Inf"} 1\n' in text
+
+
+def test_upstream_failures_and_rate_limit_rejections_are_counted(backend, stub_upstream, monkeypatch):
+    monkeypatch.setattr(backend.Config, 'CONSUMET_RATE_LIMIT', 60)
+    monkeypatch.setattr(backend.Config, 'CONSUMET_BURST', 1)
+    monkeypatch.setattr(backend.rate_limiter, 'max_wait', 0)
+    backend.rate_limiter.reset()
+
+    assert backend.make_request(stub_upstream.url + '/anime/zoro/missing') is None
+    assert backend.make_request(stub_upstream.url + '/anime/zoro/missing') is None
+    assert backend.upstream_latency.count('consumet:zoro', 'client_error') == 1
+    assert backend.rate_limit_rejected.value('consumet:zoro') == 1
+
+    monkeypatch.setattr(backend.Config, 'METRICS_ENABLED', False)
+    assert backend.app.test_client().get('/metrics').status_code == 404
+    assert backend.make_request(stub_upstream.url + '/anime/zoro/missing') is None
+    assert backend.upstream_latency.count('consumet:zoro', 'client_error') == 1
@@ -0,0 +1,65 @@
+"""
+Tests for cache schema migrations and the streaming cache
+"""
+
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from migrations import MIGRATIONS, schema_version
+
+LEGACY_SCHEMA = """
+    CREATE TABLE anime_cache (id TEXT PRIMARY KEY, provider TEXT, data TEXT, cached_at TIMESTAMP, expires_at TIMESTAMP);
+    CREATE TABLE episode_cache (anime_id TEXT, provider TEXT, episode_number INTEGER, data TEXT,
+                                cached_at TIMESTAMP, expires_at TIMESTAMP, PRIMARY KEY (anime_id, provider, episode_number));
+    CREATE TABLE streaming_cache (episode_id TEXT PRIMARY KEY, provider TEXT, data TEXT, cached_at TIMESTAMP, expires_at TIMESTAMP);
+    CREATE TABLE user_watchlist (id INTEGER PRIMARY KEY AUTOINCREMENT, anime_id TEXT, title TEXT, image TEXT,
+                                 current_episode INTEGER DEFAULT 1, total_episodes INTEGER,
+                                 status TEXT DEFAULT 'watching', added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+"""
+
+
+def test_legacy_database_is_migrated_in_place(backend, tmp_path, monkeypatch):
+    path = str(tmp_path / 'legacy.db')
+    expires = (datetime.now() + timedelta(hours=1)).isoformat()
+    with sqlite3.connect(path) as conn:
+        conn.executescript(LEGACY_SCHEMA)
+        conn.execute("INSERT INTO anime_cache VALUES ('info_gogoanime_naruto', 'gogoanime', '{\"id\": \"naruto\"}', datetime('now'), ?)", (expires,))
+        conn.execute("INSERT INTO streaming_cache VALUES ('stream_gogoanime_naruto-1', 'gogoanime', '{\"sources\": []}', datetime('now'), ?)", (expires,))
+        conn.execute("INSERT INTO user_watchlist (anime_id, title, image) VALUES ('naruto', 'Naruto', '')")
+
+    monkeypatch.setattr(backend.Config, 'DATABASE_PATH', path)
+    backend.memory_cache.clear()
+    backend.init_database()
+
+    with sqlite3.connect(path) as conn:
+        assert schema_version(conn) == MIGRATIONS[-1][0]
+        assert [row[1] for row in conn.execute("PRAGMA table_info(streaming_cache)")][0] == 'id'
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list(anime_cache)")}
+        assert 'idx_anime_cache_expires' in indexes
+        assert conn.execute("SELECT COUNT(*) FROM user_watchlist").fetchone()[0] == 1
+        expires_at = conn.execute("SELECT expires_at FROM anime_cache").fetchone()[0]
+        assert abs(expires_at - (time.time() + 3600)) < 60
+
+    assert backend.get_from_cache('info_gogoanime_naruto')['id'] == 'naruto'
+    assert backend.get_from_cache('stream_gogoanime_naruto-1', 'streaming_cache') == {'sources': []}
+
+
+def test_migrations_are_idempotent(backend):
+    backend.init_database()
+    backend.init_database()
+    with backend.get_db().connection() as conn:
+        assert schema_version(conn) == MIGRATIONS[-1][0]
+
+
+def test_repeated_watch_request_does_not_call_upstream(backend, stub_upstream):
+    stub_upstream.route('/anime/gogoanime/watch/naruto-episode-1', {'sources': [{'url': 'http://cdn/ep1.m3u8'}]})
+    client = backend.app.test_client()
+    first = client.get('/api/watch/gogoanime/naruto-episode-1')
+    assert first.status_code == 200
+    backend.memory_cache.clear()
+    second = client.get('/api/watch/gogoanime/naruto-episode-1')
+    assert second.status_code == 200
+    assert second.headers['X-Cache-Status'] == 'fresh'
+    assert second.get_json() == first.get_json()
+    assert stub_upstream.hits['/anime/gogoanime/watch/naruto-episode-1'] == 1
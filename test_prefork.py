@@ -0,0 +1,109 @@
+"""
+Tests for the pre-fork worker manager
+"""
+
+import os
+import signal
+import socket
+import time
+
+import pytest
+import requests
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason="pre-fork serving is POSIX only")
+
+
+def pid_app(environ, start_response):
+    if environ['PATH_INFO'] == '/slow':
+        time.sleep(0.5)
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [str(os.getpid()).encode()]
+
+
+@pytest.fixture
+def prefork():
+    """Start a PreforkServer master in a child process; yields (url, master pid)"""
+    from prefork import PreforkServer
+
+    masters = []
+
+    def start(**options):
+        server = PreforkServer(pid_app, port=0, **options)
+        server.bind()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                server.run()
+            finally:
+                os._exit(0)
+        server.listener.close()
+        masters.append(pid)
+        url = f"http://127.0.0.1:{server.port}"
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            try:
+                requests.get(url, timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.05)
+        return url, pid
+
+    yield start
+    for pid in masters:
+        try:
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+
+
+def worker_pids(url, count):
+    return {requests.get(url, headers={'Connection': 'close'}, timeout=5).text for _ in range(count)}
+
+
+def test_workers_are_recycled_after_their_quota(prefork):
+    url, master = prefork(workers=1, max_requests=3)
+    pids = worker_pids(url, 10)
+    assert len(pids) >= 3
+    assert str(master) not in pids
+
+
+def test_stop_and_exit_hooks_run_for_recycled_workers(prefork, tmp_path):
+    def stopped(slot):
+        (tmp_path / f"stopped-{os.getpid()}").touch()
+
+    def exited(pid):
+        (tmp_path / f"exited-{pid}").touch()
+
+    url, _ = prefork(workers=1, max_requests=2, on_worker_stop=stopped, on_worker_exit=exited)
+    pids = worker_pids(url, 5)
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and len(list(tmp_path.glob('exited-*'))) < 2:
+        time.sleep(0.05)
+    exits = {p.name.split('-', 1)[1] for p in tmp_path.glob('exited-*')}
+    assert len(exits) >= 2 and exits <= pids
+    assert exits <= {p.name.split('-', 1)[1] for p in tmp_path.glob('stopped-*')}
+
+
+def test_reload_replaces_workers_without_dropping_requests(prefork):
+    url, master = prefork(workers=2, graceful_timeout=5)
+    before = worker_pids(url, 6)
+    with socket.create_connection(('127.0.0.1', int(url.rsplit(':', 1)[1]))) as slow:
+        slow.sendall(b"GET /slow HTTP/1.1\r\nHost: test\r\nConnection: close\r\n\r\n")
+        time.sleep(0.1)
+        os.kill(master, signal.SIGHUP)
+        # The request in flight on an old worker still completes
+        assert slow.recv(1024).startswith(b"HTTP/1.1 200")
+    time.sleep(0.5)
+    after = worker_pids(url, 6)
+    assert after and not (before & after)
+
+
+def test_sigterm_drains_and_stops(prefork):
+    url, master = prefork(workers=2, graceful_timeout=5)
+    assert worker_pids(url, 2)
+    os.kill(master, signal.SIGTERM)
+    _, status = os.waitpid(master, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    with pytest.raises(requests.ConnectionError):
+        requests.get(url, timeout=1)
@@ -0,0 +1,95 @@
+"""
+Tests for the per-upstream token-bucket rate limiter
+"""
+
+import pytest
+
+import os
+
+from ratelimit import RateLimiter, RateLimitExceeded, SharedTokenBucket, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_burst_then_queued_waits():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock, sleep=lambda s: None)
+    waits = [bucket.reserve() for _ in range(5)]
+    assert waits == [0, 0, 0.5, 1.0, 1.5]
+    assert bucket.stats()['waited'] == 3
+
+
+def test_max_wait_rejects_without_consuming():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=1, clock=clock)
+    bucket.reserve()
+    with pytest.raises(RateLimitExceeded):
+        bucket.reserve(max_wait=0.5)
+    assert bucket.reserve(max_wait=1.0) == 1.0
+    assert bucket.stats()['rejected'] == 1
+
+
+def test_upstreams_have_independent_budgets():
+    clock = FakeClock()
+    limiter = RateLimiter(lambda key: (1, 1), clock=clock, sleep=clock.sleep)
+    limiter.acquire('consumet:gogoanime')
+    limiter.acquire('consumet:zoro')
+    limiter.acquire('jikan')
+    assert clock.now == 0
+    limiter.acquire('consumet:gogoanime')
+    assert clock.now == 1
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="shared buckets are POSIX only")
+def test_shared_buckets_draw_from_one_budget(tmp_path):
+    clock = FakeClock()
+    path = str(tmp_path / 'consumet.bucket')
+    # Two handles on the same file stand in for two worker processes
+    first = SharedTokenBucket(path, rate=2, capacity=2, clock=clock)
+    second = SharedTokenBucket(path, rate=2, capacity=2, clock=clock)
+    assert [first.reserve(), second.reserve(), first.reserve(), second.reserve()] == [0, 0, 0.5, 1.0]
+    clock.now = 1.5
+    assert first.available() == 1.0
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="shared buckets are POSIX only")
+def test_shared_dir_limits_across_processes(tmp_path):
+    limiter = RateLimiter(lambda key: (1, 1), shared_dir=str(tmp_path))
+    assert isinstance(limiter.bucket('consumet:zoro'), SharedTokenBucket)
+    limiter.bucket('consumet:zoro').reserve()
+    pid = os.fork()
+    if pid == 0:
+        # A forked worker sees the parent's spent token
+        waited = RateLimiter(lambda key: (1, 1), shared_dir=str(tmp_path)).bucket('consumet:zoro').reserve()
+        os._exit(0 if waited > 0.5 else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    limiter.reset()
+
+
+def test_upstream_key(backend):
+    base = backend.Config.CONSUMET_BASE_URL
+    assert backend.upstream_key(f"{base}/anime/zoro/naruto") == 'consumet:zoro'
+    assert backend.upstream_key(f"{backend.Config.JIKAN_BASE_URL}/anime") == 'jikan'
+
+
+def test_unknown_providers_share_one_key_and_are_rejected(backend):
+    base = backend.Config.CONSUMET_BASE_URL
+    assert backend.upstream_key(f"{base}/anime/junk-1/naruto") == 'consumet:default'
+    client = backend.app.test_client()
+    for n in range(20):
+        for path in (f"/api/anime/junk-{n}/naruto", f"/api/anime/junk-{n}/naruto/episodes",
+                     f"/api/watch/junk-{n}/naruto-episode-1"):
+            assert client.get(path).status_code == 404
+    assert not [key for key in backend.rate_limiter.stats() if 'junk' in key]
+    assert not [name for name in backend.provider_health.stats() if 'junk' in str(name)]
+    assert 'junk' not in backend.metrics.render()
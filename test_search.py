@@ -0,0 +1,56 @@
+"""
+Tests for provider fan-out in search_with_fallback
+"""
+
+import time
+
+
+def slow_results(provider, delay, count=2):
+    def route(handler):
+        time.sleep(delay)
+        return 200, {'results': [{'id': f"{provider}-{i}", 'title': f"{provider} title {i}"} for i in range(count)]}, {}
+    return route
+
+
+def register(stub, delays):
+    for provider, delay in delays.items():
+        stub.route(f"/anime/{provider}/naruto", slow_results(provider, delay))
+
+
+def test_providers_are_queried_concurrently(backend, stub_upstream):
+    register(stub_upstream, {'gogoanime': 0.3, 'zoro': 0.3, '9anime': 0.3, 'animepahe': 0.3})
+    started = time.monotonic()
+    results = backend.search_with_fallback('naruto')
+    assert time.monotonic() - started < 0.9
+    assert [r['provider'] for r in results] == ['gogoanime'] * 2 + ['zoro'] * 2 + ['9anime'] * 2 + ['animepahe'] * 2
+
+
+def test_slow_provider_is_ignored_after_deadline(backend, stub_upstream, monkeypatch):
+    monkeypatch.setattr(backend.Config, 'SEARCH_PROVIDER_TIMEOUT', 0.5)
+    register(stub_upstream, {'gogoanime': 1.5, 'zoro': 0, '9anime': 0, 'animepahe': 0})
+    results = backend.search_with_fallback('naruto')
+    assert 'gogoanime' not in {r['provider'] for r in results}
+    assert len(results) == 6
+
+
+def test_early_exit_returns_first_results(backend, stub_upstream):
+    register(stub_upstream, {'gogoanime': 1.0, 'zoro': 0, '9anime': 1.0, 'animepahe': 1.0})
+    started = time.monotonic()
+    results = backend.search_with_fallback('naruto', min_results=2)
+    assert time.monotonic() - started < 0.8
+    assert {r['provider'] for r in results} == {'zoro'}
+
+
+def test_slow_provider_frees_its_worker_at_deadline(backend, stub_upstream, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    monkeypatch.setattr(backend, 'search_executor', ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(backend.Config, 'BACKUP_PROVIDERS', [])
+    monkeypatch.setattr(backend.Config, 'SEARCH_PROVIDER_TIMEOUT', 0.5)
+    monkeypatch.setattr(backend.Config, 'HTTP_MAX_RETRIES', 0)
+    stub_upstream.route('/anime/gogoanime/slow', slow_results('gogoanime', 3.0))
+    stub_upstream.route('/anime/gogoanime/fast', slow_results('gogoanime', 0))
+    assert backend.search_with_fallback('slow') == []
+    started = time.monotonic()
+    results = backend.search_with_fallback('fast')
+    assert time.monotonic() - started < 1.0
+    assert len(results) == 2
@@ -0,0 +1,52 @@
+"""
+Tests for the local full-text search index
+"""
+
+
+def cache_search(backend, provider, query, titles):
+    results = [{'id': t.lower().replace(' ', '-'), 'title': t, 'english_title': t, 'provider': provider}
+               for t in titles]
+    backend.save_to_cache(f"search_{provider}_{query}", {'results': results, 'provider': provider})
+
+
+def test_prefix_matching_and_ranking(backend):
+    cache_search(backend, 'gogoanime', 'naruto', ['Naruto', 'Naruto Shippuden', 'Boruto: Naruto Next Generations'])
+    backend.save_to_cache('info_gogoanime_bleach', {
+        'id': 'bleach', 'title': 'Bleach', 'synopsis': 'Ichigo gains the powers of a Soul Reaper to fight hollows.',
+        'genres': ['Action', 'Supernatural'], 'provider': 'gogoanime'
+    })
+
+    titles = [r['title'] for r in backend.search_index.search('naru')]
+    assert titles[0] in ('Naruto', 'Naruto Shippuden')
+    assert set(titles) == {'Naruto', 'Naruto Shippuden', 'Boruto: Naruto Next Generations'}
+    assert [r['id'] for r in backend.search_index.search('naruto ship')] == ['naruto-shippuden']
+    assert [r['id'] for r in backend.search_index.search('soul reap')] == ['bleach']
+    assert [r['id'] for r in backend.search_index.search('supernatural')] == ['bleach']
+
+
+def test_info_enriches_search_rows(backend):
+    cache_search(backend, 'gogoanime', 'bleach', ['Bleach'])
+    backend.save_to_cache('info_gogoanime_bleach', {'id': 'bleach', 'title': 'Bleach', 'synopsis': 'Hollows', 'provider': 'gogoanime'})
+    cache_search(backend, 'gogoanime', 'blea', ['Bleach'])
+    assert [r['id'] for r in backend.search_index.search('hollows')] == ['bleach']
+
+
+def test_search_answers_locally_when_upstreams_fail(backend, stub_upstream):
+    cache_search(backend, 'zoro', 'frieren', ['Frieren: Beyond Journey\'s End'])
+    backend.memory_cache.clear()
+    client = backend.app.test_client()
+
+    data = client.get('/api/search?q=frieren%20journey').get_json()
+    assert data['source'] == 'local'
+    assert data['results'][0]['provider'] == 'zoro'
+
+    data = client.get('/api/search?q=frier&source=local').get_json()
+    assert data['total'] == 1
+
+
+def test_backfill_from_existing_cache(backend):
+    cache_search(backend, 'gogoanime', 'one piece', ['One Piece'])
+    with backend.get_db().connection() as conn:
+        conn.execute("DELETE FROM anime_catalog")
+    backend.init_database()
+    assert [r['id'] for r in backend.search_index.search('one')] == ['one-piece']
@@ -0,0 +1,48 @@
+"""
+Tests for title normalization and cross-provider deduplication
+"""
+
+from similarity import canonical_title, cluster_titles, merge_results
+
+
+def test_canonical_forms():
+    assert canonical_title('Naruto Shippuden (Dub)') == canonical_title('Naruto: Shippuden')
+    assert canonical_title('Attack on Titan 2nd Season') == canonical_title('Attack on Titan Season 2')
+    assert canonical_title('Overlord II') == 'overlord season 2'
+    assert canonical_title('Overlord III') != canonical_title('Overlord II')
+
+
+def test_near_duplicates_cluster_but_sequels_do_not():
+    clusters = cluster_titles([
+        'Naruto Shippuden', 'Naruto: Shippuuden', 'Attack on Titan Season 2',
+        'Attack on Titan Season 3', 'Jujutsu Kaisen', 'Jujutsu Kaisen 0'
+    ])
+    assert clusters[0] == clusters[1]
+    assert clusters[2] != clusters[3]
+    assert clusters[4] != clusters[5]
+
+
+def test_merge_keeps_priority_order_and_all_provider_ids():
+    results = [
+        {'id': 'naruto-shippuden', 'title': 'Naruto Shippuden', 'provider': 'gogoanime', 'url': '/anime/gogoanime/naruto-shippuden'},
+        {'id': 'one-piece', 'title': 'One Piece', 'provider': 'gogoanime', 'url': '/anime/gogoanime/one-piece'},
+        {'id': 'naruto-shippuden-dub', 'title': 'Naruto Shippuden (Dub)', 'provider': 'zoro', 'url': '/anime/zoro/naruto-shippuden-dub'},
+        {'id': 'one-piece-100', 'title': 'One-Piece', 'provider': 'animepahe', 'url': '/anime/animepahe/one-piece-100'},
+    ]
+    merged = merge_results(results)
+    assert [m['id'] for m in merged] == ['naruto-shippuden', 'one-piece']
+    assert [(p['provider'], p['id'], p['dub']) for p in merged[0]['providers']] == [
+        ('gogoanime', 'naruto-shippuden', False), ('zoro', 'naruto-shippuden-dub', True)
+    ]
+    assert 'providers' not in results[0]
+
+    remerged = merge_results(merged + [{'id': 'x', 'title': 'One Piece', 'provider': 'jikan'}])
+    assert len(remerged[1]['providers']) == 3
+
+
+def test_search_merges_provider_spellings(backend, stub_upstream):
+    stub_upstream.route('/anime/gogoanime/frieren', {'results': [{'id': 'sousou-no-frieren', 'title': 'Sousou no Frieren'}]})
+    stub_upstream.route('/anime/zoro/frieren', {'results': [{'id': 'frieren-18542', 'title': 'Sousou no Frieren (Dub)'}]})
+    results = backend.search_with_fallback('frieren')
+    assert len(results) == 1
+    assert {p['provider'] for p in results[0]['providers']} == {'gogoanime', 'zoro'}
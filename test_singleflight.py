@@ -0,0 +1,82 @@
+"""
+Tests for request coalescing of identical upstream fetches
+"""
+
+import threading
+import time
+
+import pytest
+
+from singleflight import FlightTimeout, SingleFlight
+
+
+def run_concurrently(count, target):
+    results, errors = [], []
+
+    def worker():
+        try:
+            results.append(target())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'value'
+
+    results, errors = run_concurrently(10, lambda: flight.do('key', fetch))
+    assert results == ['value'] * 10 and not errors
+    assert len(calls) == 1
+    assert flight.stats()['coalesced'] == 9
+
+
+def test_leader_error_reaches_followers():
+    flight = SingleFlight()
+
+    def fetch():
+        time.sleep(0.2)
+        raise ValueError('upstream broke')
+
+    results, errors = run_concurrently(5, lambda: flight.do('key', fetch))
+    assert not results
+    assert len(errors) == 5 and all(isinstance(e, ValueError) for e in errors)
+
+
+def test_follower_timeout():
+    flight = SingleFlight(timeout=0.05)
+    started = threading.Event()
+
+    def fetch():
+        started.set()
+        time.sleep(0.3)
+        return 'late'
+
+    leader = threading.Thread(target=lambda: flight.do('key', fetch))
+    leader.start()
+    started.wait()
+    with pytest.raises(FlightTimeout):
+        flight.do('key', fetch)
+    leader.join()
+
+
+def test_concurrent_info_misses_hit_upstream_once(backend, stub_upstream):
+    def info(handler):
+        time.sleep(0.2)
+        return 200, {'id': 'one-piece', 'title': 'One Piece', 'episodes': []}, {}
+
+    stub_upstream.route('/anime/gogoanime/info/one-piece', info)
+    results, errors = run_concurrently(8, lambda: backend.get_anime_info_consumet('one-piece', 'gogoanime'))
+    assert not errors and all(r['id'] == 'one-piece' for r in results)
+    assert stub_upstream.hits['/anime/gogoanime/info/one-piece'] == 1
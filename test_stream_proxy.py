@@ -0,0 +1,208 @@
+"""
+Tests for the HLS streaming proxy and its disk segment cache
+"""
+
+import os
+import time
+from urllib.parse import parse_qs, quote, urlsplit
+
+import pytest
+
+from hlsproxy import SegmentCache, parse_range, RangeNotSatisfiable, rewrite_playlist, sign
+
+SEGMENT = bytes(range(256)) * 64  # 16 KiB
+
+MASTER = """#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=1280x720
+720/index.m3u8
+"""
+
+VARIANT = """#EXTM3U
+#EXT-X-TARGETDURATION:10
+#EXT-X-KEY:METHOD=AES-128,URI="key.bin"
+#EXTINF:10.0,
+seg0.ts
+#EXTINF:10.0,
+https://other-cdn.example/seg1.ts
+#EXT-X-ENDLIST
+"""
+
+
+def ranged(body, content_type='video/mp2t'):
+    """Route handler that honours a single Range header like a CDN"""
+    def handler(request):
+        header = request.headers.get('Range')
+        if not header:
+            return 200, body, {'Content-Type': content_type}
+        start, end = parse_range(header, len(body))
+        return 206, body[start:end + 1], {'Content-Type': content_type,
+                                         'Content-Range': f"bytes {start}-{end}/{len(body)}"}
+    return handler
+
+
+@pytest.fixture
+def hls(backend, stub_upstream, monkeypatch):
+    """A local HLS origin behind a watch response that needs a Referer"""
+    monkeypatch.setattr(backend.Config, 'STREAM_ALLOW_PRIVATE_HOSTS', True)
+    stub_upstream.route('/hls/master.m3u8', MASTER.encode(), headers={'Content-Type': 'application/vnd.apple.mpegurl'})
+    stub_upstream.route('/hls/720/index.m3u8', VARIANT.encode(), headers={'Content-Type': 'application/x-mpegURL'})
+    stub_upstream.route('/hls/720/seg0.ts', ranged(SEGMENT))
+    stub_upstream.route('/anime/gogoanime/watch/ep-1', {
+        'sources': [{'url': f"{stub_upstream.url}/hls/master.m3u8", 'isM3U8': True, 'quality': 'auto'}],
+        'headers': {'Referer': 'https://player.example/'}
+    })
+    return backend.app.test_client()
+
+
+def proxied(playlist):
+    return [line for line in playlist.splitlines() if line and not line.startswith('#')]
+
+
+def test_watch_sources_carry_signed_proxy_urls(hls, stub_upstream):
+    data = hls.get('/api/watch/gogoanime/ep-1').get_json()
+    source = data['sources'][0]
+    assert source['url'].endswith('/hls/master.m3u8')
+    query = parse_qs(urlsplit(source['proxyUrl']).query)
+    assert query['u'] == [source['url']] and query['r'] == ['https://player.example/']
+
+    forged = source['proxyUrl'].replace('master.m3u8', 'secret.m3u8')
+    assert hls.get(forged).status_code == 403
+    assert stub_upstream.hits.get('/hls/secret.m3u8', 0) == 0
+
+
+def test_playlists_are_rewritten_to_the_proxy(hls):
+    source = hls.get('/api/watch/gogoanime/ep-1').get_json()['sources'][0]
+    master = hls.get(source['proxyUrl'])
+    assert master.status_code == 200
+    assert master.headers['Content-Type'].startswith('application/vnd.apple.mpegurl')
+    variant_url, = proxied(master.get_data(as_text=True))
+    assert variant_url.startswith('/api/stream?')
+
+    variant = hls.get(variant_url).get_data(as_text=True)
+    segment_urls = proxied(variant)
+    assert [parse_qs(urlsplit(u).query)['u'][0].rsplit('/', 2)[-2:] for u in segment_urls] == \
+        [['720', 'seg0.ts'], ['other-cdn.example', 'seg1.ts']]
+    assert 'URI="/api/stream?' in variant and 'key.bin' in variant
+
+
+def test_segments_are_streamed_and_cached(hls, stub_upstream):
+    source = hls.get('/api/watch/gogoanime/ep-1').get_json()['sources'][0]
+    variant_url, = proxied(hls.get(source['proxyUrl']).get_data(as_text=True))
+    segment_url = proxied(hls.get(variant_url).get_data(as_text=True))[0]
+
+    first = hls.get(segment_url)
+    assert first.is_streamed and first.headers['X-Cache-Status'] == 'miss'
+    assert first.get_data() == SEGMENT
+    first.close()
+
+    second = hls.get(segment_url)
+    assert second.headers['X-Cache-Status'] == 'fresh'
+    assert second.get_data() == SEGMENT and second.headers['Content-Type'] == 'video/mp2t'
+    assert stub_upstream.hits['/hls/720/seg0.ts'] == 1
+
+    part = hls.get(segment_url, headers={'Range': 'bytes=100-199'})
+    assert part.status_code == 206 and part.get_data() == SEGMENT[100:200]
+    assert part.headers['Content-Range'] == f"bytes 100-199/{len(SEGMENT)}"
+    assert hls.get(segment_url, headers={'Range': f"bytes={len(SEGMENT)}-"}).status_code == 416
+
+
+def test_uncached_range_caches_the_whole_segment(backend, hls, stub_upstream):
+    seen = []
+    segment = ranged(SEGMENT)
+
+    def recording(request):
+        seen.append(request.headers.get('Range'))
+        return segment(request)
+    stub_upstream.route('/hls/720/seg0.ts', recording)
+    url = backend.stream_proxy_url(f"{stub_upstream.url}/hls/720/seg0.ts")
+
+    part = hls.get(url, headers={'Range': 'bytes=-10'})
+    assert part.status_code == 206 and part.get_data() == SEGMENT[-10:]
+    assert part.headers['X-Cache-Status'] == 'miss'
+    part.close()
+    again = hls.get(url, headers={'Range': 'bytes=0-9'})
+    assert again.get_data() == SEGMENT[:10] and again.headers['X-Cache-Status'] == 'fresh'
+    assert seen == [None]
+    assert backend.segment_cache().stats()['files'] == 1
+
+
+def test_non_public_hosts_are_never_signed_or_fetched(backend, stub_upstream, monkeypatch):
+    monkeypatch.setattr(backend.Config, 'STREAM_ALLOW_PRIVATE_HOSTS', False)
+    client = backend.app.test_client()
+    for host in ('127.0.0.1', '10.0.0.8', '169.254.169.254', 'localhost', '[::1]'):
+        assert backend.stream_proxy_url(f"http://{host}/hls/720/seg0.ts") is None
+    assert backend.stream_proxy_url('http://93.184.216.34/hls/720/seg0.ts').startswith('/api/stream?')
+    assert backend.with_proxy_urls({'sources': [{'url': f"{stub_upstream.url}/hls/master.m3u8"}]})['sources'][0] == \
+        {'url': f"{stub_upstream.url}/hls/master.m3u8"}
+
+    # A URL signed earlier (say, before the setting changed) is still refused
+    url = f"{stub_upstream.url}/hls/720/seg0.ts"
+    signed = f"/api/stream?u={quote(url)}&r=&s={sign(backend.stream_secret(), url)}"
+    assert client.get(signed).status_code == 403
+    assert stub_upstream.hits.get('/hls/720/seg0.ts', 0) == 0
+
+
+def test_segment_content_type_is_not_relayed(backend, hls, stub_upstream):
+    stub_upstream.route('/hls/720/seg5.ts', b'<script>alert(1)</script>', headers={'Content-Type': 'text/html'})
+    stub_upstream.route('/hls/720/page.html', b'<script>alert(1)</script>', headers={'Content-Type': 'text/html'})
+    segment = hls.get(backend.stream_proxy_url(f"{stub_upstream.url}/hls/720/seg5.ts"))
+    assert segment.headers['Content-Type'] == 'video/mp2t'
+    assert segment.headers['X-Content-Type-Options'] == 'nosniff'
+    segment.close()
+    page = hls.get(backend.stream_proxy_url(f"{stub_upstream.url}/hls/720/page.html"))
+    assert page.headers['Content-Type'] == 'application/octet-stream'
+    page.close()
+
+
+def test_cdn_requests_use_the_stream_client(backend, hls, stub_upstream):
+    seen = []
+
+    def busy(request):
+        seen.append(dict(request.headers))
+        return 503, b'busy', {'Content-Type': 'text/plain'}
+    stub_upstream.route('/hls/720/seg9.ts', busy)
+
+    assert hls.get(backend.stream_proxy_url(f"{stub_upstream.url}/hls/720/seg9.ts", 'https://player.example/')).status_code == 502
+    assert stub_upstream.hits['/hls/720/seg9.ts'] == 1
+    headers, = seen
+    assert headers['Accept'] == '*/*' and headers['User-Agent'] == backend.Config.STREAM_USER_AGENT
+    assert headers['Referer'] == 'https://player.example/'
+
+
+def test_segment_cache_evicts_least_recently_used(tmp_path):
+    cache = SegmentCache(str(tmp_path), max_bytes=250, max_item_bytes=120)
+    for name in ('a', 'b'):
+        writer = cache.writer(name, 100)
+        writer.write(b'x' * 100)
+        writer.commit()
+    os.utime(cache.path_for('a'), (time.time() - 60, time.time() - 60))
+    os.utime(cache.path_for('b'), (time.time() - 30, time.time() - 30))
+    f, size = cache.lookup('a')  # refreshes 'a'
+    f.close()
+
+    writer = cache.writer('c', 100)
+    writer.write(b'x' * 100)
+    writer.commit()
+    assert cache.lookup('b') is None
+    assert cache.stats()['files'] == 2 and cache.stats()['evicted'] == 1
+
+    # Oversized and truncated bodies are never published
+    assert cache.writer('big', 500) is None
+    truncated = cache.writer('short', 100)
+    truncated.write(b'x' * 50)
+    truncated.commit()
+    assert cache.lookup('short') is None
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.part')]
+
+
+def test_parse_range_and_rewrite():
+    assert parse_range('bytes=0-', 10) == (0, 9)
+    assert parse_range('bytes=5-100', 10) == (5, 9)
+    assert parse_range('bytes=-3', 10) == (7, 9)
+    assert parse_range('bytes=0-1,4-5', 10) is None
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range('bytes=10-', 10)
+    assert rewrite_playlist('#EXTM3U\nseg.ts\n', 'https://cdn/a/index.m3u8', lambda u: f"<{u}>") == \
+        '#EXTM3U\n<https://cdn/a/seg.ts>\n'
+    assert rewrite_playlist(VARIANT, 'https://cdn/a/index.m3u8', lambda u: None if 'cdn/a/' in u else u) == \
+        '#EXTM3U\n#EXT-X-TARGETDURATION:10\n#EXTINF:10.0,\nhttps://other-cdn.example/seg1.ts\n#EXT-X-ENDLIST\n'
@@ -0,0 +1,56 @@
+"""
+Tests for the in-memory typeahead index
+"""
+
+import time
+
+from suggest import SuggestIndex
+
+
+def titles(*names, provider='gogoanime'):
+    return [{'id': n.lower().replace(' ', '-'), 'title': n, 'provider': provider} for n in names]
+
+
+def test_prefix_matches_any_word_start():
+    index = SuggestIndex()
+    index.add(titles('Naruto', 'Naruto Shippuden', 'Boruto: Naruto Next Generations', 'One Piece'))
+    assert {s['title'] for s in index.suggest('naru')} == {'Naruto', 'Naruto Shippuden', 'Boruto: Naruto Next Generations'}
+    assert [s['title'] for s in index.suggest('shipp')] == ['Naruto Shippuden']
+    assert [s['title'] for s in index.suggest('naruto next')] == ['Boruto: Naruto Next Generations']
+    assert index.suggest('zzz') == []
+
+
+def test_popularity_orders_matches():
+    index = SuggestIndex()
+    index.add(titles('Naruto', 'Naruto Shippuden'))
+    index.add(titles('Naruto Shippuden'), weight=5)
+    assert [s['title'] for s in index.suggest('na')] == ['Naruto Shippuden', 'Naruto']
+
+
+def test_memory_ceiling_evicts_least_popular():
+    index = SuggestIndex(max_bytes=20000)
+    index.add(titles('Frieren'), weight=100)
+    index.add(titles(*[f"Filler Show {i}" for i in range(200)]))
+    assert index.stats()['bytes'] <= 20000
+    assert index.stats()['evictions'] > 0
+    assert index.suggest('frie')[0]['title'] == 'Frieren'
+
+
+def test_lookups_are_sub_millisecond():
+    index = SuggestIndex(max_bytes=256 * 1024 * 1024)
+    index.add(titles(*[f"Anime Title {i} Season {i % 7}" for i in range(20000)]))
+    index.suggest('warm')
+    started = time.perf_counter()
+    for prefix in ('anime title 12', 'season 3', 'a', 'an', 'anime title 1999'):
+        for _ in range(20):
+            index.suggest(prefix)
+    assert (time.perf_counter() - started) / 100 < 0.001
+
+
+def test_suggest_endpoint_uses_cached_and_trending_titles(backend, stub_upstream):
+    backend.save_to_cache('search_gogoanime_dragon', {'results': titles('Dragon Ball', 'Dragon Ball Z'), 'provider': 'gogoanime'})
+    stub_upstream.route('/anime/gogoanime/top-airing', {'results': titles('Dragon Ball Z')})
+    client = backend.app.test_client()
+    client.get('/api/trending')
+    data = client.get('/api/suggest?q=drag').get_json()
+    assert [s['title'] for s in data['suggestions']] == ['Dragon Ball Z', 'Dragon Ball']
@@ -0,0 +1,63 @@
+"""
+Tests for the pooled upstream HTTP client
+"""
+
+from upstream import UpstreamClient
+
+
+def test_connections_are_reused(stub_upstream):
+    stub_upstream.route('/ping', {'ok': True})
+    client = UpstreamClient()
+    for _ in range(10):
+        assert client.get(stub_upstream.url + '/ping').json() == {'ok': True}
+    assert stub_upstream.connections == 1
+    client.close()
+
+
+def test_client_never_retries_on_its_own(stub_upstream):
+    stub_upstream.route('/busy', {'error': 'busy'}, status=503)
+    client = UpstreamClient()
+    assert client.get(stub_upstream.url + '/busy').status_code == 503
+    assert stub_upstream.hits['/busy'] == 1
+    client.close()
+
+
+def test_make_request_retries_transient_errors_with_a_token_each(backend, stub_upstream, monkeypatch):
+    attempts = []
+
+    def flaky(handler):
+        attempts.append(1)
+        if len(attempts) < 3:
+            return 503, {'error': 'busy'}, {}
+        return 200, {'ok': True}, {}
+
+    monkeypatch.setattr(backend.Config, 'HTTP_RETRY_BACKOFF', 0)
+    stub_upstream.route('/anime/gogoanime/flaky', flaky)
+    assert backend.make_request(stub_upstream.url + '/anime/gogoanime/flaky') == {'ok': True}
+    assert len(attempts) == 3
+    assert backend.rate_limit_wait.count('consumet:gogoanime') == 3
+
+
+def test_throttling_and_client_errors_are_not_retried(backend, stub_upstream, monkeypatch):
+    monkeypatch.setattr(backend.Config, 'HTTP_RETRY_BACKOFF', 0)
+    stub_upstream.route('/anime/gogoanime/slow-down', {'error': 'too many requests'}, status=429)
+    stub_upstream.route('/anime/gogoanime/info/missing', {'error': 'not found'}, status=404)
+    assert backend.fetch_json(stub_upstream.url + '/anime/gogoanime/slow-down') == (None, 'throttled')
+    assert backend.fetch_json(stub_upstream.url + '/anime/gogoanime/info/missing') == (None, 'client_error')
+    assert stub_upstream.hits['/anime/gogoanime/slow-down'] == 1
+    assert stub_upstream.hits['/anime/gogoanime/info/missing'] == 1
+
+
+def test_retries_stop_at_the_deadline(backend, stub_upstream, monkeypatch):
+    monkeypatch.setattr(backend.Config, 'HTTP_RETRY_BACKOFF', 0.5)
+    monkeypatch.setattr(backend.Config, 'HTTP_REQUEST_DEADLINE', 0.3)
+    stub_upstream.route('/anime/gogoanime/down', {'error': 'down'}, status=502)
+    assert backend.fetch_json(stub_upstream.url + '/anime/gogoanime/down') == (None, 'server_error')
+    assert stub_upstream.hits['/anime/gogoanime/down'] == 1
+
+
+def test_make_request_uses_shared_client(backend, stub_upstream):
+    stub_upstream.route('/anime/gogoanime/info/naruto', {'id': 'naruto', 'title': 'Naruto', 'episodes': []})
+    for _ in range(3):
+        assert backend.make_request(stub_upstream.url + '/anime/gogoanime/info/naruto')['id'] == 'naruto'
+    assert stub_upstream.url in backend.http_client.hosts()
@@ -0,0 +1,132 @@
+"""
+Tests for the cache warming scheduler, its request budget and the warming jobs
+"""
+
+import pytest
+
+from warmer import CacheWarmer, WarmBudget
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+INFO = {
+    'id': 'frieren', 'title': 'Frieren', 'releaseDate': '2023',
+    'episodes': [{'id': f"frieren-episode-{n}", 'number': n} for n in range(1, 5)]
+}
+
+
+def watch(episode_id):
+    return {'sources': [{'url': f"https://cdn.example/{episode_id}.m3u8", 'isM3U8': True}]}
+
+
+@pytest.fixture
+def unlimited():
+    return WarmBudget(rate=0, burst=1)
+
+
+def test_jobs_run_on_their_own_intervals():
+    clock = FakeClock()
+    warmer = CacheWarmer(WarmBudget(rate=0, burst=1, clock=clock), clock=clock)
+    calls = []
+    warmer.add_job('fast', 10, lambda budget: calls.append('fast') or 1)
+    warmer.add_job('slow', 30, lambda budget: calls.append('slow') or 2, delay=5)
+
+    assert warmer.run_pending() == {'fast': 1}
+    clock.now += 5
+    assert warmer.run_pending() == {'slow': 2}
+    clock.now += 4
+    assert warmer.run_pending() == {}
+    clock.now += 1
+    assert warmer.run_pending() == {'fast': 1}
+    assert calls == ['fast', 'slow', 'fast']
+
+    def broken(budget):
+        raise RuntimeError('upstream exploded')
+
+    warmer.add_job('broken', 10, broken)
+    warmer.run_pending()
+    stats = warmer.stats()['jobs']
+    assert stats['broken']['errors'] == 1 and stats['fast']['warmed'] == 2
+    assert stats['slow']['due_in'] == 25
+
+
+def test_budget_skips_instead_of_waiting():
+    clock = FakeClock()
+    spare = {'consumet:gogoanime': True, 'consumet:zoro': False}
+    budget = WarmBudget(rate=1, burst=2, headroom=spare.get, clock=clock)
+
+    assert budget.take('consumet:zoro') is False  # no headroom on that upstream
+    assert budget.take('consumet:gogoanime') and budget.take('consumet:gogoanime')
+    assert budget.take('consumet:gogoanime') is False  # budget spent
+    clock.now += 1
+    assert budget.take('consumet:gogoanime')
+    assert budget.stats()['spent'] == 3 and budget.stats()['skipped'] == 2
+
+
+def test_lists_are_warmed_before_they_expire(backend, stub_upstream, unlimited, monkeypatch):
+    stub_upstream.route('/anime/gogoanime/top-airing', {'results': [{'id': 'frieren', 'title': 'Frieren'}]})
+    stub_upstream.route('/anime/gogoanime/recent-episodes', {'results': [{'id': 'frieren', 'episodeNumber': 4}]})
+    client = backend.app.test_client()
+
+    assert backend.warm_lists(unlimited) == 2
+    trending = client.get('/api/trending')
+    assert trending.headers['X-Cache-Status'] == 'fresh'
+    assert trending.get_json()['results'][0]['provider'] == 'gogoanime'
+    assert client.get('/api/recent').get_json()['total'] == 1
+    assert stub_upstream.hits['/anime/gogoanime/top-airing'] == 1
+
+    # Still far from expiry: nothing to do
+    assert backend.warm_lists(unlimited) == 0
+    monkeypatch.setattr(backend.Config, 'WARM_AHEAD', backend.Config.LIST_CACHE_DURATION + 1)
+    assert backend.warm_lists(unlimited) == 2
+    assert stub_upstream.hits['/anime/gogoanime/recent-episodes'] == 2
+
+
+def test_watchlist_titles_get_info_and_next_episode_links(backend, stub_upstream, unlimited):
+    stub_upstream.route('/anime/gogoanime/info/frieren', INFO)
+    for n in range(1, 5):
+        stub_upstream.route(f"/anime/gogoanime/watch/frieren-episode-{n}", watch(f"frieren-episode-{n}"))
+    backend.add_to_watchlist({'anime_id': 'frieren', 'title': 'Frieren', 'image': ''})
+    with backend.get_db().connection() as conn:
+        conn.execute("UPDATE user_watchlist SET current_episode = 2 WHERE anime_id = 'frieren'")
+
+    assert backend.warm_watchlist(unlimited) == 3
+    assert [n for n in range(1, 5) if stub_upstream.hits.get(f"/anime/gogoanime/watch/frieren-episode-{n}")] == [2, 3]
+
+    client = backend.app.test_client()
+    response = client.get('/api/watch/gogoanime/frieren-episode-3')
+    assert response.headers['X-Cache-Status'] == 'fresh'
+    assert backend.warm_watchlist(unlimited) == 0
+
+
+def test_trending_titles_warm_latest_episode_within_budget(backend, stub_upstream):
+    stub_upstream.route('/anime/gogoanime/top-airing', {'results': [{'id': 'frieren', 'title': 'Frieren'},
+                                                                    {'id': 'dandadan', 'title': 'Dandadan'}]})
+    stub_upstream.route('/anime/gogoanime/info/frieren', INFO)
+    stub_upstream.route('/anime/gogoanime/watch/frieren-episode-4', watch('frieren-episode-4'))
+    clock = FakeClock()
+    budget = WarmBudget(rate=1, burst=4, clock=clock)
+
+    assert backend.warm_lists(budget) == 1  # recent-episodes 404s
+    assert backend.warm_trending_titles(budget) == 2  # frieren info and episode 4, then out of budget
+    assert stub_upstream.hits.get('/anime/gogoanime/info/dandadan', 0) == 0
+    assert budget.stats()['skipped'] == 1
+
+
+def test_warming_leaves_rate_limit_headroom_for_users(backend, stub_upstream, monkeypatch):
+    stub_upstream.route('/anime/gogoanime/recent-episodes', {'results': [{'id': 'frieren'}]})
+    monkeypatch.setattr(backend.Config, 'CONSUMET_RATE_LIMIT', 60)
+    monkeypatch.setattr(backend.Config, 'CONSUMET_BURST', 2)
+    backend.rate_limiter.reset()
+    budget = WarmBudget(rate=0, burst=1, headroom=backend.warm_headroom)
+
+    backend.rate_limiter.acquire('consumet:gogoanime')  # a user request took one of the two tokens
+    assert backend.warm_lists(budget) == 0
+    assert stub_upstream.hits.get('/anime/gogoanime/recent-episodes', 0) == 0
+    assert backend.rate_limiter.bucket('consumet:gogoanime').available() == pytest.approx(1, abs=0.01)